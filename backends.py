@@ -0,0 +1,556 @@
+# backends.py - 网络操作后端
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+
+import tracing
+
+from netsh_commands import (
+    CommandResult, OP_PHASES, OP_ENABLE, OP_DISABLE, OP_STATIC_ADDRESS, OP_DNS_RESET, OP_DNS_ADD,
+    OP_DHCP_ADDRESS, OP_DHCP_DNS, OP_ROUTE_ADD, OP_ROUTE_DELETE, OP_QUERY_INTERFACES, OP_QUERY_CONFIG,
+    OP_QUERY_ROUTES, QUERY_INTERFACES_COMMAND, QUERY_CONFIG_COMMAND, QUERY_ROUTES_COMMAND,
+    static_ip_commands, dhcp_commands, enable_command, disable_command, parse_dns_list
+)
+from netsh_parser import (
+    AdapterConfig, InterfaceState, RouteEntry, parse_show_config, parse_interface_table, parse_route_table
+)
+from netsh_session import (
+    NetshSessionPool, MARK_TEMPLATE, MARK_PATTERN, PROMPT_PATTERN, CREATE_NO_WINDOW,
+    is_success_output, start_netsh
+)
+
+
+class NetworkBackend:
+    """
+    网络操作后端接口：读取网卡清单和IP配置，设置静态IP/DHCP，启用/禁用网卡，批量执行操作
+    批处理中的每条命令为(说明, netsh命令, 操作元组)，操作元组的格式见netsh_commands
+    """
+    name = "base"
+    # 是否操作真实网络，模拟后端的地址不可达，不做切换后的连通性检查
+    live = True
+
+    def interface_states(self):
+        """:return: InterfaceState列表"""
+        raise NotImplementedError
+
+    def adapter_configs(self):
+        """:return: AdapterConfig列表"""
+        raise NotImplementedError
+
+    def read_state(self):
+        """一次读取网卡状态和IP配置，:return: (InterfaceState列表, AdapterConfig列表)"""
+        return self.interface_states(), self.adapter_configs()
+
+    def read_state_raw(self):
+        """
+        读取网卡状态和IP配置的原始输出，解析推迟到调用parse时进行
+        :return: (原始输出文本, parse)，parse()返回与read_state()相同的结果
+        """
+        states, configs = self.read_state()
+        return repr((states, configs)), lambda: (states, configs)
+
+    def read_routes(self):
+        """一次读取完整的IPv4路由表，:return: RouteEntry列表"""
+        raise NotImplementedError
+
+    def read_state_and_routes(self):
+        """
+        一次读取网卡状态、IP配置和路由表
+        :return: (InterfaceState列表, AdapterConfig列表, RouteEntry列表)
+        """
+        states, configs = self.read_state()
+        return states, configs, self.read_routes()
+
+    def set_static_ip(self, interface, ip, mask, gateway, dns):
+        raise NotImplementedError
+
+    def set_dhcp(self, interface):
+        raise NotImplementedError
+
+    def enable_interface(self, interface):
+        raise NotImplementedError
+
+    def disable_interface(self, interface):
+        raise NotImplementedError
+
+    def run_commands(self, commands, on_result=None, cancel_event=None):
+        """
+        按顺序执行一组命令
+        :param commands: [(说明, netsh命令, 操作元组)]
+        :param on_result: 每条命令完成时的回调，参数为(序号, CommandResult)
+        :param cancel_event: threading.Event，置位后停止执行，未执行的命令记为失败
+        :return: 与commands一一对应的CommandResult列表
+        """
+        raise NotImplementedError
+
+    def run(self, command, capture=False):
+        """直接执行一条netsh子命令，仅netsh后端支持"""
+        raise NotImplementedError(f"{self.name} 后端不支持直接执行netsh命令")
+
+    def use_session(self, enabled=True, timeout=10.0):
+        """启用或关闭常驻会话，不支持的后端忽略"""
+        return None
+
+
+class NetshBackend(NetworkBackend):
+    """通过Windows netsh命令操作网络"""
+    name = "netsh"
+
+    def __init__(self):
+        # 常驻netsh会话，启用后单条命令和批处理都经由它执行
+        self._session = None
+
+    def use_session(self, enabled=True, timeout=10.0):
+        if enabled and self._session is None:
+            # 各网卡的批处理并发执行，每个批处理使用一个空闲的会话
+            self._session = NetshSessionPool(timeout)
+        elif not enabled and self._session is not None:
+            self._session.close()
+            self._session = None
+        return self._session
+
+    def run(self, command, capture=False):
+        with tracing.span("netsh", "netsh", command=command) as s:
+            result = self._run(command, capture)
+            s.set(exit_code=result.returncode, output_size=len(result.stdout or ""))
+            return result
+
+    def _run(self, command, capture):
+        session = self._session
+        if session is not None:
+            try:
+                output, ok = session.execute(command)
+                return subprocess.CompletedProcess(command, 0 if ok else 1, output if capture else None, "")
+            except RuntimeError:
+                # 会话无响应时退回到单独启动netsh进程
+                pass
+        return subprocess.run(f"netsh {command}", capture_output=capture, text=True,
+                              creationflags=CREATE_NO_WINDOW)
+
+    def interface_states(self):
+        return parse_interface_table(self.run(QUERY_INTERFACES_COMMAND, capture=True).stdout)
+
+    def adapter_configs(self):
+        return parse_show_config(self.run(QUERY_CONFIG_COMMAND, capture=True).stdout)
+
+    def read_state(self):
+        table, config = self.run_commands([
+            ("读取网卡状态", QUERY_INTERFACES_COMMAND, (OP_QUERY_INTERFACES,)),
+            ("读取IP配置", QUERY_CONFIG_COMMAND, (OP_QUERY_CONFIG,)),
+        ])
+        return parse_interface_table(table.output), parse_show_config(config.output)
+
+    def read_state_raw(self):
+        table, config = self.run_commands([
+            ("读取网卡状态", QUERY_INTERFACES_COMMAND, (OP_QUERY_INTERFACES,)),
+            ("读取IP配置", QUERY_CONFIG_COMMAND, (OP_QUERY_CONFIG,)),
+        ])
+        return (f"{table.output}\n{config.output}",
+                lambda: (parse_interface_table(table.output), parse_show_config(config.output)))
+
+    def read_routes(self):
+        return parse_route_table(self.run(QUERY_ROUTES_COMMAND, capture=True).stdout)
+
+    def read_state_and_routes(self):
+        table, config, routes = self.run_commands([
+            ("读取网卡状态", QUERY_INTERFACES_COMMAND, (OP_QUERY_INTERFACES,)),
+            ("读取IP配置", QUERY_CONFIG_COMMAND, (OP_QUERY_CONFIG,)),
+            ("读取路由表", QUERY_ROUTES_COMMAND, (OP_QUERY_ROUTES,)),
+        ])
+        return (parse_interface_table(table.output), parse_show_config(config.output),
+                parse_route_table(routes.output))
+
+    def set_static_ip(self, interface, ip, mask, gateway, dns):
+        for command in static_ip_commands(interface, ip, mask, gateway, dns):
+            self.run(command)
+
+    def set_dhcp(self, interface):
+        for command in dhcp_commands(interface):
+            self.run(command)
+
+    def enable_interface(self, interface):
+        self.run(enable_command(interface))
+
+    def disable_interface(self, interface):
+        self.run(disable_command(interface))
+
+    def run_commands(self, commands, on_result=None, cancel_event=None):
+        """
+        所有命令经标准输入送入同一个netsh进程，每条命令后跟一个分隔标记，
+        据此把输出切分到每条命令；启用常驻会话时在会话中执行，不启动新进程
+        指定cancel_event时逐条送入命令，取消后不再送入新命令，正在执行的命令不会被中断
+        """
+        if not commands:
+            return []
+        session = self._session
+        if session is not None:
+            return self._run_in_session(session, commands, on_result, cancel_event)
+        return self._run_in_process(commands, on_result, cancel_event)
+
+    def _run_in_session(self, session, commands, on_result, cancel_event):
+        results = [None] * len(commands)
+        batch_start = time.perf_counter_ns()
+        last = [batch_start]
+
+        def report(index, output):
+            label, command, _ = commands[index]
+            results[index] = CommandResult(command, label, is_success_output(output), output)
+            now = time.perf_counter_ns()
+            tracing.record_span(label, "netsh", last[0], now, {
+                "command": command, "exit_code": 0 if results[index].ok else 1, "output_size": len(output)})
+            last[0] = now
+            if on_result:
+                on_result(index, results[index])
+
+        try:
+            session.execute_many([command for _, command, _ in commands], report, cancel_event)
+        except RuntimeError as e:
+            # 无响应的命令是否已执行无法确定，记为失败，其后的命令退回到单独启动的netsh进程执行
+            failed = results.index(None)
+            label, command, _ = commands[failed]
+            results[failed] = CommandResult(command, label, False, str(e))
+            if on_result:
+                on_result(failed, results[failed])
+            rest = commands[failed + 1:]
+            if rest and not (cancel_event is not None and cancel_event.is_set()):
+                def shifted(index, result):
+                    if on_result:
+                        on_result(failed + 1 + index, result)
+
+                results[failed + 1:] = self._run_in_process(rest, shifted, cancel_event)
+        tracing.record_span("netsh batch", "netsh", batch_start, time.perf_counter_ns(), {
+            "commands": len(commands), "session": True})
+        return _fill_missing(commands, results)
+
+    def _run_in_process(self, commands, on_result, cancel_event):
+        results = [None] * len(commands)
+        batch_start = last = time.perf_counter_ns()
+        proc = start_netsh()
+        # 上一条命令完成后才允许送入下一条
+        step = threading.Semaphore(1) if cancel_event is not None else None
+        # 单独线程写入，避免输出缓冲区写满造成死锁
+        writer = threading.Thread(target=self._feed, args=(proc, commands, step, cancel_event), daemon=True)
+        writer.start()
+
+        buffer = []
+        for line in proc.stdout:
+            match = MARK_PATTERN.search(line)
+            if match:
+                index = int(match.group(1))
+                if 0 <= index < len(results):
+                    output = "\n".join(buffer).strip("\n")
+                    label, command, _ = commands[index]
+                    results[index] = CommandResult(command, label, is_success_output(output), output)
+                    # 两个分隔标记之间的时间即为该命令的耗时
+                    now = time.perf_counter_ns()
+                    tracing.record_span(label, "netsh", last, now, {
+                        "command": command, "exit_code": 0 if results[index].ok else 1, "output_size": len(output)})
+                    last = now
+                    if on_result:
+                        on_result(index, results[index])
+                    if step is not None:
+                        step.release()
+                buffer = []
+                continue
+            buffer.append(PROMPT_PATTERN.sub("", line.rstrip("\r\n")))
+        proc.wait()
+        writer.join(timeout=1)
+        tracing.record_span("netsh batch", "netsh", batch_start, time.perf_counter_ns(), {
+            "commands": len(commands), "exit_code": proc.returncode})
+        return _fill_missing(commands, results)
+
+    @staticmethod
+    def _feed(proc, commands, step=None, cancel_event=None):
+        try:
+            if step is None:
+                lines = []
+                for i, (_, command, _) in enumerate(commands):
+                    lines.append(command)
+                    lines.append(MARK_TEMPLATE.format(i))
+                proc.stdin.write("\n".join(lines) + "\n")
+            else:
+                for i, (_, command, _) in enumerate(commands):
+                    step.acquire()
+                    if cancel_event.is_set():
+                        break
+                    proc.stdin.write(f"{command}\n{MARK_TEMPLATE.format(i)}\n")
+                    proc.stdin.flush()
+            proc.stdin.write("exit\n")
+            proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+
+# 未得到结果的命令记为未执行
+def _fill_missing(commands, results):
+    for index, result in enumerate(results):
+        if result is None:
+            label, command, _ = commands[index]
+            results[index] = CommandResult(command, label, False, "未执行")
+    return results
+
+
+class SimulatedAdapter:
+    """模拟网卡的内部状态"""
+    __slots__ = ("name", "type", "admin_enabled", "cable", "enabled_at",
+                 "dhcp", "ip", "mask", "gateway", "dns", "dns_dhcp", "lease")
+
+    def __init__(self, name, lease, enabled=True, cable=True, dhcp=True, type="专用"):
+        self.name = name
+        self.type = type
+        self.admin_enabled = enabled
+        self.cable = cable
+        self.enabled_at = 0.0
+        self.lease = lease
+        self.dhcp = dhcp
+        self.dns_dhcp = dhcp
+        self.ip, self.mask, self.gateway = lease[:3] if dhcp else ('', '', '')
+        self.dns = list(lease[3]) if dhcp else []
+
+
+class SimulatedBackend(NetworkBackend):
+    """
+    内存中的模拟后端，不执行任何系统命令，用于在非Windows环境下运行和测量切换逻辑
+    :param adapters: 网卡名称列表
+    :param latency: 各类操作的耗时(秒)，键为 spawn/read/enable/disable/address/dns/route/up/link，
+                    spawn为每启动一个进程的开销，up为启用网卡后到可以设置地址的时间，
+                    link为启用网卡后到连接成功的时间
+    :param failures: 各类操作的失败概率(0~1)，键同latency
+    :param seed: 随机数种子，用于复现失败注入
+    """
+    name = "simulated"
+    live = False
+
+    def __init__(self, adapters=(), latency=None, failures=None, seed=None):
+        self.latency = dict(latency or {})
+        self.failures = dict(failures or {})
+        self.processes = 0
+        self.op_counts = Counter()
+        # 各阶段累计耗时(秒)，并发执行时为各网卡耗时之和
+        self.phase_time = Counter()
+        self._random = random.Random(seed)
+        self._forced = Counter()
+        self._lock = threading.Lock()
+        self._adapters = {}
+        # 手动添加的路由{(前缀, 下一跳): (网卡名称, 跃点数)}
+        self._routes = {}
+        for name in adapters:
+            self.add_adapter(name)
+
+    def add_adapter(self, name, enabled=True, cable=True, dhcp=True, type="专用"):
+        index = len(self._adapters) + 1
+        lease = (f"192.168.{index}.100", "255.255.255.0", f"192.168.{index}.1", [f"192.168.{index}.1"])
+        with self._lock:
+            self._adapters[name] = SimulatedAdapter(name, lease, enabled, cable, dhcp, type)
+
+    def inject_failure(self, kind, count=1):
+        """让接下来count次指定类型的操作失败"""
+        with self._lock:
+            self._forced[kind] += count
+
+    def reset_stats(self):
+        with self._lock:
+            self.processes = 0
+            self.op_counts.clear()
+            self.phase_time.clear()
+
+    def _sleep(self, key):
+        delay = self.latency.get(key, 0.0)
+        if delay:
+            time.sleep(delay)
+
+    def _should_fail(self, key):
+        with self._lock:
+            if self._forced[key] > 0:
+                self._forced[key] -= 1
+                return True
+        rate = self.failures.get(key, 0.0)
+        return rate > 0 and self._random.random() < rate
+
+    def _spawn(self):
+        start = time.perf_counter()
+        self._sleep("spawn")
+        with self._lock:
+            self.processes += 1
+            self.phase_time["spawn"] += time.perf_counter() - start
+
+    def _up(self, adapter):
+        return adapter.admin_enabled and time.monotonic() - adapter.enabled_at >= self.latency.get("up", 0.0)
+
+    def _connected(self, adapter):
+        if not adapter.admin_enabled or not adapter.cable:
+            return False
+        return time.monotonic() - adapter.enabled_at >= self.latency.get("link", 0.0)
+
+    def _apply(self, op):
+        """执行一个操作元组，:return: (是否成功, 输出)"""
+        kind = op[0]
+        key = OP_PHASES[kind]
+        start = time.perf_counter_ns()
+        self._sleep(key)
+        with self._lock:
+            self.op_counts[kind] += 1
+            self.phase_time[key] += (time.perf_counter_ns() - start) / 1e9
+        failed = self._should_fail(key)
+        tracing.record_span(kind, "simulated", start, time.perf_counter_ns(), {
+            "interface": op[1] if len(op) > 1 else None, "exit_code": 1 if failed else 0, "output_size": 0})
+        if failed:
+            return False, f"模拟失败: {kind}"
+        if kind in (OP_QUERY_INTERFACES, OP_QUERY_CONFIG, OP_QUERY_ROUTES):
+            return True, ""
+        if kind == OP_ROUTE_DELETE:
+            with self._lock:
+                if self._routes.pop((op[2], op[3]), None) is None:
+                    return False, "找不到元素。"
+            return True, ""
+        with self._lock:
+            adapter = self._adapters.get(op[1])
+            if adapter is None:
+                return False, "找不到元素。"
+            if kind not in (OP_ENABLE, OP_DISABLE) and not self._up(adapter):
+                # 与真实网卡一致，启用尚未完成时设置地址会失败
+                return False, "接口未就绪。"
+            if kind == OP_ENABLE:
+                if not adapter.admin_enabled:
+                    adapter.admin_enabled = True
+                    adapter.enabled_at = time.monotonic()
+            elif kind == OP_DISABLE:
+                adapter.admin_enabled = False
+            elif kind == OP_STATIC_ADDRESS:
+                adapter.dhcp = False
+                adapter.ip, adapter.mask, adapter.gateway = op[2:5]
+            elif kind == OP_DHCP_ADDRESS:
+                adapter.dhcp = True
+                adapter.ip, adapter.mask, adapter.gateway = adapter.lease[:3]
+            elif kind == OP_DNS_RESET:
+                adapter.dns_dhcp = False
+                adapter.dns = []
+            elif kind == OP_DNS_ADD:
+                adapter.dns_dhcp = False
+                if op[3] == 0:
+                    adapter.dns.insert(0, op[2])
+                else:
+                    adapter.dns.append(op[2])
+            elif kind == OP_DHCP_DNS:
+                adapter.dns_dhcp = True
+                adapter.dns = list(adapter.lease[3])
+            elif kind == OP_ROUTE_ADD:
+                if (op[2], op[3]) in self._routes:
+                    return False, "对象已存在。"
+                self._routes[(op[2], op[3])] = (op[1], op[4])
+        return True, ""
+
+    def _snapshot_states(self):
+        with self._lock:
+            return [
+                InterfaceState(a.name, a.admin_enabled, self._connected(a), a.type)
+                for a in self._adapters.values()
+            ]
+
+    def _snapshot_configs(self):
+        configs = []
+        with self._lock:
+            for a in self._adapters.values():
+                # 与netsh一致，已禁用或尚未启用完成的网卡不出现在IP配置中
+                if not self._up(a):
+                    continue
+                config = AdapterConfig(a.name)
+                config.dhcp = a.dhcp
+                if a.ip and self._connected(a):
+                    config.ips.append(a.ip)
+                    config.masks.append(a.mask)
+                    config.prefixes.append(_prefix_length(a.mask))
+                if a.gateway:
+                    config.gateways.append(a.gateway)
+                config.dns = list(a.dns)
+                config.dns_dhcp = a.dns_dhcp
+                configs.append(config)
+        return configs
+
+    def interface_states(self):
+        self._spawn()
+        self._apply((OP_QUERY_INTERFACES,))
+        return self._snapshot_states()
+
+    def adapter_configs(self):
+        self._spawn()
+        self._apply((OP_QUERY_CONFIG,))
+        return self._snapshot_configs()
+
+    def read_state(self):
+        self._spawn()
+        self._apply((OP_QUERY_INTERFACES,))
+        self._apply((OP_QUERY_CONFIG,))
+        return self._snapshot_states(), self._snapshot_configs()
+
+    def read_routes(self):
+        self._spawn()
+        return self._route_table()
+
+    def read_state_and_routes(self):
+        states, configs = self.read_state()
+        return states, configs, self._route_table()
+
+    def _route_table(self):
+        self._apply((OP_QUERY_ROUTES,))
+        with self._lock:
+            index = {name: str(i + 1) for i, name in enumerate(self._adapters)}
+            # 与Windows一致，已禁用网卡的路由不在活动路由表中
+            return [
+                RouteEntry(prefix, next_hop, index[name], metric, True)
+                for (prefix, next_hop), (name, metric) in self._routes.items()
+                if self._up(self._adapters[name])
+            ]
+
+    def _run_ops(self, ops):
+        for op in ops:
+            self._spawn()
+            self._apply(op)
+
+    def set_static_ip(self, interface, ip, mask, gateway, dns):
+        ops = [(OP_STATIC_ADDRESS, interface, ip, mask, gateway), (OP_DNS_RESET, interface)]
+        ops += [(OP_DNS_ADD, interface, d, i) for i, d in enumerate(parse_dns_list(dns))]
+        self._run_ops(ops)
+
+    def set_dhcp(self, interface):
+        self._run_ops([(OP_DHCP_ADDRESS, interface), (OP_DHCP_DNS, interface)])
+
+    def enable_interface(self, interface):
+        self._run_ops([(OP_ENABLE, interface)])
+
+    def disable_interface(self, interface):
+        self._run_ops([(OP_DISABLE, interface)])
+
+    def run_commands(self, commands, on_result=None, cancel_event=None):
+        results = [None] * len(commands)
+        if not commands:
+            return []
+        self._spawn()
+        for index, (label, command, op) in enumerate(commands):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            ok, output = self._apply(op)
+            results[index] = CommandResult(command, label, ok, output)
+            if on_result:
+                on_result(index, results[index])
+        return _fill_missing(commands, results)
+
+
+# 子网掩码转换为前缀长度
+def _prefix_length(mask):
+    return sum(bin(int(part)).count("1") for part in mask.split(".")) if mask else 0
+
+
+# 当前使用的后端
+_backend = NetshBackend()
+
+def get_backend():
+    return _backend
+
+# 切换后端，返回原来的后端
+def set_backend(backend):
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
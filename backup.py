@@ -0,0 +1,96 @@
+# backup.py - 切换前的网络状态备份
+# 每次应用配置前记录全部网卡的启用状态和IP/DNS配置(来自切换开始时的同一次读取，不额外执行命令)，
+# 切换出错时可以一次批量恢复到切换前的状态；备份保存在配置文件旁，只保留最近几份
+import json
+import os
+import threading
+import time
+
+from snapshot import encode_network_state, decode_network_state
+
+BACKUP_FILE = "network_backups.json"
+BACKUP_VERSION = 1
+MAX_BACKUPS = 10
+
+
+# 备份文件与配置文件放在同一目录
+def backup_path(config_file):
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), BACKUP_FILE)
+
+
+class NetworkBackup:
+    """
+    一次切换前的全部网卡状态
+    profile为随后应用的配置名称，states为InterfaceState列表，configs为{网卡名称: AdapterConfig}
+    """
+    __slots__ = ("taken_at", "profile", "states", "configs")
+
+    def __init__(self, profile, states, configs, taken_at=None):
+        self.taken_at = time.time() if taken_at is None else taken_at
+        self.profile = profile
+        self.states = list(states)
+        self.configs = dict(configs)
+
+    def describe(self):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.taken_at))
+        return f"{when} 应用 {self.profile} 之前"
+
+    def __repr__(self):
+        return f"NetworkBackup({self.describe()!r}, adapters={len(self.states)})"
+
+
+def _encode(backup):
+    data = encode_network_state(backup.states, backup.configs)
+    data.update(taken_at=backup.taken_at, profile=backup.profile)
+    return data
+
+
+def _decode(data):
+    states, configs = decode_network_state(data)
+    return NetworkBackup(data["profile"], states, configs, data["taken_at"])
+
+
+class BackupHistory:
+    """
+    保存在文件中的最近limit份备份，按时间从新到旧排列
+    可在多个线程中同时使用，写入时先写临时文件再替换
+    """
+
+    def __init__(self, path, limit=MAX_BACKUPS):
+        self.path = path
+        self.limit = limit
+        self._lock = threading.Lock()
+
+    def load(self):
+        """:return: NetworkBackup列表，文件不存在或已损坏时返回空列表"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != BACKUP_VERSION:
+                return []
+            return [_decode(item) for item in data["backups"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def latest(self):
+        backups = self.load()
+        return backups[0] if backups else None
+
+    def record(self, profile, states, configs):
+        """
+        记录一份备份，超出数量的旧备份被丢弃
+        :return: NetworkBackup
+        """
+        backup = NetworkBackup(profile, states, configs)
+        with self._lock:
+            backups = [backup] + self.load()[:self.limit - 1]
+            data = {"version": BACKUP_VERSION, "backups": [_encode(item) for item in backups]}
+            temp = self.path + ".tmp"
+            try:
+                with open(temp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp, self.path)
+            except OSError:
+                # 备份失败不影响切换
+                pass
+        return backup
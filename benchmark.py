@@ -0,0 +1,614 @@
+# benchmark.py - 切换耗时基准测试
+# 用法:
+#   python benchmark.py switch <配置名称> [--keep-others]   需管理员权限，会真实应用配置
+#   python benchmark.py parse [网卡数量]                      解析show config输出的微基准
+#   python benchmark.py session [次数]                        比较独立进程与常驻会话的单条命令延迟
+#   python benchmark.py suite [--scale 0.05] [--output 文件]   在模拟后端上运行全部场景，输出JSON
+#   python benchmark.py startup [--simulate]                  测量主窗口首次绘制和自动选择配置的耗时
+#   python benchmark.py imports [次数]                        比较命令行入口与图形界面的导入耗时
+#   python benchmark.py multi [网卡数量] [--scale 0.2]         比较多网卡配置并发应用与逐个应用的耗时
+#   python benchmark.py routes [路由数量...] [--scale 0.05]    测量静态路由表的编译、比较和批量安装耗时(默认1000和10000条)
+#   python benchmark.py store [配置数量]                      比较配置库与整体重写配置文件的打开、查找和保存耗时(默认5000个)
+#   python benchmark.py search [配置数量]                     测量配置列表逐字输入过滤的耗时(默认5000个)
+#   python benchmark.py daemon <配置名称...> [--count 5]       需管理员权限，统计常驻服务轮流切换到各配置时启动的进程数
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import utils
+from backends import SimulatedBackend
+from backup import NetworkBackup
+from netsh_batch import read_network_state
+from netsh_parser import parse_show_config
+from plans import compile_profile, compile_profiles, profile_adapters, profile_interfaces
+from profile_search import ProfileIndex
+from profile_store import ProfileStore
+from profiles import create_simulated_backend, open_store
+from interface_executor import InterfaceExecutor
+from switcher import (
+    build_switch_batches, build_route_batches, managed_routes, run_batches, apply_profile, set_dhcp_all,
+    restore_backup, detect_active_profile
+)
+
+
+# 单次netsh操作的典型耗时(秒)，suite按--scale缩放后作为模拟后端的延迟
+TYPICAL_LATENCY = {
+    "spawn": 0.15,
+    "read": 0.12,
+    "enable": 0.35,
+    "disable": 0.3,
+    "address": 0.25,
+    "dns": 0.06,
+    "route": 0.004,
+    "up": 0.5,
+    "link": 1.2,
+}
+SUITE_ADAPTERS = (2, 10, 50)
+SUITE_DNS = (1, 4, 8)
+PHASES = ("spawn", "read", "disable", "enable", "address", "dns", "route")
+
+
+class SpawnCounter:
+    """统计代码块内启动的子进程数量"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = None
+
+    def __enter__(self):
+        counter = self
+        self._original = original = subprocess.Popen
+
+        class CountingPopen(original):
+            def __init__(self, *args, **kwargs):
+                counter.count += 1
+                super().__init__(*args, **kwargs)
+
+        subprocess.Popen = CountingPopen
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen = self._original
+        return False
+
+
+# 逐条调用utils函数的原始切换方式
+def switch_sequential(name, configs, disable_others=True):
+    if disable_others:
+        for profile, cfg in configs.items():
+            if profile != name:
+                for iface in profile_interfaces(cfg):
+                    utils.disable_interface(iface)
+    for config in profile_adapters(configs[name]):
+        utils.enable_interface(config['interface'])
+        if config.get('dhcp'):
+            utils.set_dhcp(config['interface'])
+        else:
+            utils.set_static_ip(config['interface'], config['ip'], config['mask'], config['gateway'], config['dns'])
+
+
+# 按网卡分组批量并发执行的切换方式
+def switch_batched(name, configs, disable_others=True):
+    executor = InterfaceExecutor()
+    try:
+        results = run_batches(build_switch_batches(name, configs, disable_others), executor)
+    finally:
+        executor.shutdown()
+    return [{"label": r.label, "ok": r.ok} for r in results]
+
+
+# 使用指定切换策略应用配置，记录断网时长
+def switch_strategy(name, configs, disable_others=True, make_before_break=True):
+    executor = InterfaceExecutor()
+    try:
+        report = apply_profile(name, configs, executor, disable_others, make_before_break=make_before_break)
+    finally:
+        executor.shutdown()
+    return {
+        "strategy": report.strategy,
+        "ready": report.ready,
+        "gap_ms": round(report.gap * 1000, 1) if report.gap is not None else None,
+        "enable_wait_ms": round(report.enable_wait * 1000, 1),
+        "ready_wait_ms": round(report.ready_wait * 1000, 1),
+    }
+
+
+# 测量一次切换的进程数和耗时
+def measure(func, *args):
+    with SpawnCounter() as counter:
+        start = time.perf_counter()
+        detail = func(*args)
+        elapsed = time.perf_counter() - start
+    return {"processes": counter.count, "wall_ms": round(elapsed * 1000, 1), "detail": detail}
+
+
+# 生成包含count个网卡的show config输出样本
+def sample_show_config(count, language="zh"):
+    if language == "zh":
+        header, dhcp, ip, prefix, gateway, dns = (
+            '接口 "{}" 的配置', "DHCP 已启用", "IP 地址", "子网前缀", "默认网关", "静态配置的 DNS 服务器")
+        mask_word, no = "掩码", "否"
+    else:
+        header, dhcp, ip, prefix, gateway, dns = (
+            'Configuration for interface "{}"', "DHCP enabled", "IP Address", "Subnet Prefix",
+            "Default Gateway", "Statically Configured DNS Servers")
+        mask_word, no = "mask", "No"
+    blocks = []
+    for i in range(count):
+        subnet = f"10.{i // 250}.{i % 250}"
+        blocks.append("\n".join([
+            "",
+            header.format(f"VMware Network Adapter VMnet{i}"),
+            f"    {dhcp}:                          {no}",
+            f"    {ip}:                           {subnet}.10",
+            f"    {prefix}:                        {subnet}.0/24 ({mask_word} 255.255.255.0)",
+            f"    {gateway}:                         {subnet}.1",
+            "    InterfaceMetric:                      25",
+            f"    {dns}:            {subnet}.53",
+            "                                          114.114.114.114",
+            "                                          8.8.8.8",
+        ]))
+    return "\n".join(blocks) + "\n"
+
+
+# 测量解析show config输出的耗时
+def bench_parse(count=60, repeat=200):
+    report = {"adapters": count}
+    for language in ("zh", "en"):
+        text = sample_show_config(count, language)
+        adapters = parse_show_config(text)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse_show_config(text)
+        elapsed = (time.perf_counter() - start) / repeat
+        report[language] = {
+            "parsed": len(adapters),
+            "per_dump_us": round(elapsed * 1e6, 1),
+            "per_adapter_us": round(elapsed * 1e6 / count, 2),
+        }
+    return report
+
+
+# 比较每条命令启动netsh进程与常驻会话两种方式的延迟
+def bench_session(count=20, command="interface show interface"):
+    report = {"command": command, "count": count}
+    for mode in ("process", "session"):
+        utils.use_netsh_session(mode == "session")
+        try:
+            if mode == "session":
+                utils.run_netsh(command, capture=True)  # 预热
+            samples = []
+            with SpawnCounter() as counter:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    utils.run_netsh(command, capture=True)
+                    samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            report[mode] = {
+                "processes": counter.count,
+                "mean_ms": round(sum(samples) / count, 2),
+                "p50_ms": round(samples[count // 2], 2),
+                "max_ms": round(samples[-1], 2),
+            }
+        finally:
+            utils.use_netsh_session(False)
+    return report
+
+
+# 生成场景所需的网卡和配置，p0为切换目标
+def scenario_configs(count, dhcp, dns_count):
+    names = [f"Ethernet {i}" for i in range(count)]
+    configs = {f"p{i}": {"interface": name, "dhcp": True} for i, name in enumerate(names)}
+    if not dhcp:
+        configs["p0"] = {
+            "interface": names[0],
+            "dhcp": False,
+            "ip": "10.10.0.5",
+            "mask": "255.255.255.0",
+            "gateway": "10.10.0.1",
+            "dns": ", ".join(f"10.10.0.{53 + i}" for i in range(dns_count)),
+        }
+    bindings = {profile: cfg["interface"] for profile, cfg in configs.items()}
+    return names, configs, bindings
+
+
+# 在模拟后端上测量一个代码路径的耗时、进程数和各阶段耗时
+def measure_simulated(backend, func):
+    backend.reset_stats()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {
+        "wall_ms": round(elapsed * 1000, 1),
+        "processes": backend.processes,
+        "phases_ms": {phase: round(backend.phase_time[phase] * 1000, 1) for phase in PHASES},
+    }
+
+
+# 运行一个场景：启动时识别配置、切换、读取当前配置、恢复到切换前的状态、所有网卡自动获取IP
+def run_scenario(count, dhcp, dns_count, scale):
+    names, configs, bindings = scenario_configs(count, dhcp, dns_count)
+    latency = {key: value * scale for key, value in TYPICAL_LATENCY.items()}
+    backend = SimulatedBackend(names, latency=latency)
+    previous = utils.use_backend(backend)
+    executor = InterfaceExecutor()
+    try:
+        backup = NetworkBackup("p0", *read_network_state())
+        return {
+            "adapters": count,
+            "mode": "dhcp" if dhcp else "static",
+            "dns": 0 if dhcp else dns_count,
+            "startup": measure_simulated(backend, lambda: detect_active_profile(bindings, refresh=True)),
+            "switch": measure_simulated(backend, lambda: apply_profile("p0", configs, executor)),
+            "read_current_config": measure_simulated(
+                backend, lambda: utils.inventory.interface_config(names[0], refresh=True)),
+            "restore": measure_simulated(backend, lambda: restore_backup(backup, executor)),
+            "dhcp_all": measure_simulated(backend, lambda: set_dhcp_all(executor)),
+        }
+    finally:
+        executor.shutdown()
+        utils.use_backend(previous)
+
+
+# 运行全部场景
+def bench_suite(scale=0.05):
+    scenarios = []
+    for count in SUITE_ADAPTERS:
+        scenarios.append(run_scenario(count, True, 0, scale))
+        for dns_count in SUITE_DNS:
+            scenarios.append(run_scenario(count, False, dns_count, scale))
+    return {
+        "backend": "simulated",
+        "scale": scale,
+        "latency": TYPICAL_LATENCY,
+        "scenarios": scenarios,
+    }
+
+
+# 比较一个多网卡配置与逐个应用各网卡的单网卡配置的耗时
+def bench_multi(count=4, scale=0.2):
+    names = [f"Ethernet {i}" for i in range(count)]
+    adapters = [{"interface": name, "dhcp": True} for name in names]
+    adapters[0] = {"interface": names[0], "dhcp": False, "ip": "10.10.0.5", "mask": "255.255.255.0",
+                   "gateway": "10.10.0.1", "dns": "10.10.0.53, 10.10.0.54"}
+    configs = {f"p{i}": adapter for i, adapter in enumerate(adapters)}
+    configs["multi"] = {"adapters": adapters}
+    latency = {key: value * scale for key, value in TYPICAL_LATENCY.items()}
+    result = {"adapters": count, "scale": scale}
+    for mode in ("sequential", "concurrent"):
+        # 全部网卡从禁用状态开始，每个网卡都需要启用、等待就绪和设置地址
+        backend = SimulatedBackend(latency=latency)
+        for name in names:
+            backend.add_adapter(name, enabled=False)
+        previous = utils.use_backend(backend)
+        executor = InterfaceExecutor()
+        try:
+            if mode == "sequential":
+                # 每次只应用一个网卡，不禁用其他网卡
+                func = lambda: [apply_profile(f"p{i}", configs, executor, disable_others=False)
+                                for i in range(count)]
+            else:
+                func = lambda: apply_profile("multi", configs, executor)
+            result[mode] = measure_simulated(backend, func)
+        finally:
+            executor.shutdown()
+            utils.use_backend(previous)
+    return result
+
+
+# 生成count条互不重叠的/24路由
+def sample_routes(count, offset=0):
+    return [f"10.{(i + offset) // 256 % 256}.{(i + offset) % 256}.0/24" for i in range(count)]
+
+
+# 测量一个路由表规模的编译、比较和安装耗时
+def run_route_scenario(count, scale):
+    base = {"interface": "Ethernet 0", "dhcp": False, "ip": "172.16.0.5", "mask": "255.255.255.0",
+            "gateway": "172.16.0.1", "dns": "172.16.0.53"}
+    # 当前已安装一半目标路由和一些过时路由，切换后需要补齐另一半并删除过时的部分
+    stale = count // 10
+    configs = {
+        "old": dict(base, routes=sample_routes(count // 2) + sample_routes(stale, offset=count)),
+        "new": dict(base, routes=sample_routes(count)),
+    }
+    start = time.perf_counter()
+    plans = compile_profile(configs["new"])
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    latency = {key: value * scale for key, value in TYPICAL_LATENCY.items()}
+    backend = SimulatedBackend(["Ethernet 0"], latency=latency)
+    previous = utils.use_backend(backend)
+    executor = InterfaceExecutor()
+    try:
+        apply_profile("old", configs, executor, disable_others=False)
+        start = time.perf_counter()
+        table = backend.read_routes()
+        batches = build_route_batches(plans, table, managed_routes(configs))
+        diff_ms = (time.perf_counter() - start) * 1000
+        commands = sum(len(batch) for batch in batches.values())
+        switch = measure_simulated(backend, lambda: apply_profile("new", configs, executor, disable_others=False))
+        installed = len(backend.read_routes())
+    finally:
+        executor.shutdown()
+        utils.use_backend(previous)
+    return {
+        "routes": count,
+        "compile_ms": round(compile_ms, 1),
+        "read_and_diff_ms": round(diff_ms, 1),
+        "commands": commands,
+        "installed": installed,
+        "switch": switch,
+        # 逐条启动netsh进程时的估算耗时
+        "one_process_per_route_ms": round(commands * (latency["spawn"] + latency["route"]) * 1000, 1),
+    }
+
+
+def bench_routes(counts=(1000, 10000), scale=0.05):
+    return {"scale": scale, "latency": TYPICAL_LATENCY,
+            "scenarios": [run_route_scenario(count, scale) for count in counts]}
+
+
+# 生成count个站点配置，每个站点一个静态子网
+def sample_profiles(count):
+    configs, bindings = {}, {}
+    for i in range(count):
+        iface = f"Ethernet {i % 8}"
+        net = f"10.{i // 256 % 256}.{i % 256}"
+        configs[f"site{i}"] = {"interface": iface, "dhcp": False, "ip": f"{net}.10", "mask": "255.255.255.0",
+                               "gateway": f"{net}.1", "dns": "114.114.114.114"}
+        # 少数站点带有静态路由
+        if i % 50 == 0:
+            configs[f"site{i}"]["routes"] = [f"192.168.{i // 50 % 256}.0/24"]
+        bindings[f"site{i}"] = iface
+    return configs, bindings
+
+
+def _elapsed_ms(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return round((time.perf_counter() - start) * 1000 / repeat, 3)
+
+
+# 比较旧的整体配置文件与配置库在打开、查找和保存一个配置时的耗时
+def bench_store(count=5000):
+    configs, bindings = sample_profiles(count)
+    changed = dict(configs["site7"], dns="223.5.5.5")
+    with tempfile.TemporaryDirectory() as folder:
+        legacy = os.path.join(folder, "network_config.json")
+        data = {"configs": configs, "bindings": bindings}
+
+        def legacy_save():
+            with open(legacy, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+
+        def legacy_load():
+            with open(legacy, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        # 旧版本启动时读取配置文件并编译全部配置
+        def legacy_startup():
+            compile_profiles(legacy_load()["configs"])
+
+        def legacy_find_interface():
+            return [name for name, cfg in configs.items() if "Ethernet 3" in profile_interfaces(cfg)]
+
+        legacy_save()
+        path = os.path.join(folder, "network_profiles")
+        import_ms = _elapsed_ms(lambda: ProfileStore(path).import_profiles(configs, bindings))
+        store = ProfileStore(path)
+        reopened = []
+        result = {
+            "profiles": count,
+            "legacy": {
+                "file_kb": round(os.path.getsize(legacy) / 1024, 1),
+                "load_ms": _elapsed_ms(legacy_load, 5),
+                "load_and_compile_ms": _elapsed_ms(legacy_startup),
+                "save_one_ms": _elapsed_ms(legacy_save, 5),
+                "find_interface_ms": _elapsed_ms(legacy_find_interface, 5),
+            },
+            "store": {
+                "import_ms": import_ms,
+                "open_ms": _elapsed_ms(lambda: reopened.append(ProfileStore(path)), 5),
+                "first_read_ms": _elapsed_ms(lambda: reopened[-1]["site4321"]),
+                "find_interface_ms": _elapsed_ms(lambda: store.find_by_interface("Ethernet 3"), 5),
+                "find_subnet_ms": _elapsed_ms(lambda: store.find_by_subnet("10.3.7.99"), 5),
+                "save_one_ms": _elapsed_ms(lambda: store.put("site7", changed, bindings["site7"])),
+                "refresh_ms": _elapsed_ms(reopened[0].refresh),
+                "route_keys_ms": _elapsed_ms(store.route_keys),
+            },
+        }
+    return result
+
+
+# 模拟在配置列表的搜索框中逐字输入，测量每次过滤的耗时
+def bench_search(count=5000, queries=("site4321", "s4321", "内网")):
+    names = list(sample_profiles(count)[0]) + ["消防内网", "财政内网", "财政专网"]
+    index = ProfileIndex()
+    result = {"profiles": len(names), "build_ms": _elapsed_ms(lambda: index.rebuild(names)), "queries": []}
+    for query in queries:
+        keystrokes = []
+        for i in range(1, len(query) + 1):
+            start = time.perf_counter()
+            matches = index.search(query[:i])
+            keystrokes.append(round((time.perf_counter() - start) * 1000, 3))
+        result["queries"].append({"query": query, "matches": len(matches), "keystroke_ms": keystrokes,
+                                  "max_ms": max(keystrokes)})
+    return result
+
+
+# 测量主窗口从创建到首次绘制、到自动选中当前配置的耗时
+def bench_startup(simulate=False, timeout=30.0):
+    # 需要图形界面，按需导入
+    from main_window import SimpleNetworkSwitcher
+
+    previous = utils.use_backend(create_simulated_backend()) if simulate else None
+    try:
+        app = SimpleNetworkSwitcher()
+        deadline = time.perf_counter() + timeout
+        times = app.startup_times
+        while "selection" not in times and time.perf_counter() < deadline:
+            app.update()
+            time.sleep(0.005)
+        start = times["start"]
+        result = {
+            "backend": "simulated" if simulate else "netsh",
+            "first_paint_ms": round((times["first_paint"] - start) * 1000, 1) if "first_paint" in times else None,
+            "snapshot_ms": round((times["snapshot"] - start) * 1000, 1) if "snapshot" in times else None,
+            "selection_ms": round((times["selection"] - start) * 1000, 1) if "selection" in times else None,
+            "selected": app.selected_profile.get() or None,
+        }
+        app.destroy()
+        return result
+    finally:
+        if simulate:
+            utils.use_backend(previous)
+
+
+# 在新进程中测量导入模块的耗时，并检查是否加载了tkinter
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start, 'tkinter' in sys.modules)\n"
+)
+
+
+def bench_imports(repeat=5, modules=("cli", "main_window")):
+    report = {}
+    for module in modules:
+        samples = []
+        loads_tk = False
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+                                 capture_output=True, text=True, check=True).stdout.split()
+            samples.append(float(out[0]))
+            loads_tk = out[1] == "True"
+        samples.sort()
+        report[module] = {
+            "median_ms": round(samples[len(samples) // 2] * 1000, 1),
+            "min_ms": round(samples[0] * 1000, 1),
+            "imports_tkinter": loads_tk,
+        }
+    return report
+
+
+# 在常驻服务中轮流切换到各配置，预热后的切换只使用常驻会话，不应启动任何进程
+def bench_daemon(names, count=5):
+    from daemon import NetworkDaemon
+
+    utils.use_netsh_session()
+    daemon = NetworkDaemon()
+    try:
+        def switch(name):
+            with SpawnCounter() as counter:
+                start = time.perf_counter()
+                reply = daemon.handle({"command": "apply", "profile": name}, lambda message: None)
+                elapsed = (time.perf_counter() - start) * 1000
+            if not reply["ok"]:
+                raise RuntimeError(reply["error"])
+            return {"profile": name, "ms": round(elapsed, 1), "processes": counter.count}
+
+        # 第一次切换时按需启动会话
+        warmup = switch(names[0])
+        switches = [switch(names[(i + 1) % len(names)]) for i in range(count)]
+        return {
+            "warmup": warmup,
+            "switches": switches,
+            "processes": sum(s["processes"] for s in switches),
+            "mean_ms": round(sum(s["ms"] for s in switches) / count, 1),
+        }
+    finally:
+        daemon.close()
+        utils.use_netsh_session(False)
+
+
+def bench_switch(argv):
+    if not argv:
+        print("用法: python benchmark.py switch <配置名称> [--keep-others]")
+        return 1
+    name = argv[0]
+    disable_others = "--keep-others" not in argv
+    configs = open_store()
+    if name not in configs:
+        print(f"未找到 {name} 配置")
+        return 1
+
+    report = {
+        "profile": name,
+        "before": measure(switch_sequential, name, configs, disable_others),
+        "after": measure(switch_batched, name, configs, disable_others),
+        "break_before_make": measure(switch_strategy, name, configs, disable_others, False),
+        "make_before_break": measure(switch_strategy, name, configs, disable_others, True),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv):
+    if argv and argv[0] == "switch":
+        return bench_switch(argv[1:])
+    if argv and argv[0] == "parse":
+        count = int(argv[1]) if len(argv) > 1 else 60
+        print(json.dumps(bench_parse(count), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "session":
+        count = int(argv[1]) if len(argv) > 1 else 20
+        print(json.dumps(bench_session(count), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "suite":
+        scale = float(argv[argv.index("--scale") + 1]) if "--scale" in argv else 0.05
+        text = json.dumps(bench_suite(scale), ensure_ascii=False, indent=2)
+        if "--output" in argv:
+            with open(argv[argv.index("--output") + 1], 'w', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            print(text)
+        return 0
+    if argv and argv[0] == "imports":
+        repeat = int(argv[1]) if len(argv) > 1 else 5
+        print(json.dumps(bench_imports(repeat), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "multi":
+        count = int(argv[1]) if len(argv) > 1 and not argv[1].startswith("--") else 4
+        scale = float(argv[argv.index("--scale") + 1]) if "--scale" in argv else 0.2
+        print(json.dumps(bench_multi(count, scale), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "routes":
+        scale = float(argv[argv.index("--scale") + 1]) if "--scale" in argv else 0.05
+        counts = [int(arg) for arg in argv[1:] if arg.isdigit()] or [1000, 10000]
+        print(json.dumps(bench_routes(counts, scale), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "store":
+        count = int(argv[1]) if len(argv) > 1 else 5000
+        print(json.dumps(bench_store(count), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "search":
+        count = int(argv[1]) if len(argv) > 1 else 5000
+        print(json.dumps(bench_search(count), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "daemon":
+        names, count = argv[1:], 5
+        if "--count" in names:
+            index = names.index("--count")
+            count = int(names[index + 1])
+            del names[index:index + 2]
+        configs = open_store()
+        missing = [name for name in names if name not in configs]
+        if not names or missing:
+            print(f"未找到 {'、'.join(missing)} 配置" if missing else "用法: python benchmark.py daemon <配置名称...>")
+            return 1
+        print(json.dumps(bench_daemon(names, count), ensure_ascii=False, indent=2))
+        return 0
+    if argv and argv[0] == "startup":
+        print(json.dumps(bench_startup("--simulate" in argv), ensure_ascii=False, indent=2))
+        return 0
+    print("用法: python benchmark.py switch <配置名称> [--keep-others] | parse [网卡数量] | session [次数] | suite | startup | imports | multi | routes | store | search | daemon")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,400 @@
+# cli.py - 命令行入口，不加载任何图形界面模块，适合登录脚本和计划任务
+# 用法: python -m cli [--simulate] [--local] [--trace 文件] <命令> [参数]
+#   后台服务运行时，list、status、apply、dhcp-all、backups、restore 默认交给服务执行，--local 强制在本进程执行，
+#   --simulate和--trace同样只作用于本进程，使用时不交给服务执行
+#   list                                         列出全部配置
+#   find --interface <网卡名称> | --subnet <IP地址或子网>
+#                                                查找设置或绑定了该网卡、静态IP与该子网重叠的配置
+#   apply <配置名称> [--keep-others] [--full] [--break-before-make] [--no-verify]
+#                                                应用配置，默认只执行与当前状态不同的更改，完成后检查网络连通性
+#   dhcp-all                                     所有网卡启用并自动获取IP
+#   backups                                      列出每次应用配置前自动保存的网络状态备份
+#   restore [编号]                                一次恢复到指定备份(默认最近一次)时的网络状态
+#   status                                       显示当前配置和各网卡状态
+#   show <网卡名称>                               显示网卡的IP配置
+#   serve                                        启动常驻后台服务
+import sys
+import threading
+
+import tracing
+from daemon import DaemonClient, DaemonError
+from profiles import CONFIG_FILE, open_store, create_simulated_backend
+from utils import is_admin, inventory, use_backend, use_netsh_session
+
+USAGE = ("用法: python -m cli [--simulate] [--local] [--trace 文件] "
+         "list | find --interface <网卡名称> | find --subnet <IP地址或子网> | apply <配置名称> [--keep-others] [--full] [--break-before-make] [--no-verify] | dhcp-all | "
+         "backups | restore [编号] | status | "
+         "show <网卡名称> | serve")
+
+
+_print_lock = threading.Lock()
+
+
+# 进度输出到标准错误，标准输出只保留结果；可能在多个工作线程中同时调用
+def print_progress(text, done=None, total=None):
+    if total:
+        text = f"{text} ({done}/{total})"
+    with _print_lock:
+        print(text, file=sys.stderr)
+
+
+def describe_config(cfg):
+    from plans import ProfileError, compile_profile
+
+    try:
+        plans = compile_profile(cfg)
+    except ProfileError as e:
+        return f"无效: {e}"
+    return "; ".join(describe_plan(plan, len(plans) > 1) for plan in plans)
+
+
+def describe_plan(plan, with_interface):
+    prefix = f"{plan.interface}: " if with_interface else ""
+    routes = f" 路由 {len(plan.routes)} 条" if plan.routes else ""
+    if plan.dhcp:
+        return f"{prefix}DHCP{routes}"
+    return f"{prefix}{plan.ip}/{plan.mask} 网关 {plan.gateway} DNS {','.join(plan.dns)}{routes}"
+
+
+def print_configs(configs):
+    if not configs:
+        print("没有已保存的配置")
+        return 0
+    from plans import profile_interfaces
+
+    for name, cfg in configs.items():
+        print(f"{name}\t{','.join(profile_interfaces(cfg))}\t{describe_config(cfg)}")
+    return 0
+
+
+def cmd_list(store, argv):
+    return print_configs(store)
+
+
+def cmd_find(store, argv):
+    if len(argv) != 2 or argv[0] not in ("--interface", "--subnet"):
+        print(USAGE, file=sys.stderr)
+        return 2
+    if argv[0] == "--interface":
+        names = store.find_by_interface(argv[1])
+    else:
+        try:
+            names = store.find_by_subnet(argv[1])
+        except ValueError:
+            print(f"IP地址或子网格式不正确: {argv[1]}", file=sys.stderr)
+            return 2
+    if not names:
+        print("没有找到配置", file=sys.stderr)
+        return 1
+    return print_configs({name: store[name] for name in names})
+
+
+def remote_list(client, argv):
+    return print_configs(client.list())
+
+
+def print_status(profile, interfaces):
+    """:param interfaces: [(名称, 是否启用, 是否连接, IP列表)]"""
+    print(f"当前配置: {profile or '未识别'}")
+    for name, admin_enabled, connected, ips in interfaces:
+        enabled = "已启用" if admin_enabled else "已禁用"
+        linked = "已连接" if connected else "未连接"
+        print(f"{name}\t{enabled}\t{linked}\t{', '.join(ips)}")
+    return 0
+
+
+def cmd_status(store, argv):
+    from netsh_batch import read_network_state
+    from switcher import detect_active_profile
+
+    states, adapters = read_network_state()
+    profile = detect_active_profile(store.bindings())
+    return print_status(profile, [
+        (state.name, state.admin_enabled, state.connected,
+         adapters[state.name].ips if state.name in adapters else [])
+        for state in states
+    ])
+
+
+def remote_status(client, argv):
+    status = client.status()
+    return print_status(status["active_profile"], [
+        (item["name"], item["admin_enabled"], item["connected"], item["ips"])
+        for item in status["interfaces"]
+    ])
+
+
+def cmd_show(store, argv):
+    if not argv:
+        print(USAGE, file=sys.stderr)
+        return 2
+    adapter = inventory.interface_config(argv[0])
+    if adapter is None:
+        print(f"未找到网卡 {argv[0]} 或网卡未启用", file=sys.stderr)
+        return 1
+    print(f"网卡: {adapter.name}")
+    print(f"DHCP: {'是' if adapter.dhcp else '否'}")
+    print(f"IP地址: {', '.join(adapter.ips)}")
+    print(f"子网掩码: {', '.join(adapter.masks)}")
+    print(f"默认网关: {', '.join(adapter.gateways)}")
+    print(f"DNS: {adapter.dns_string()}{' (DHCP)' if adapter.dns_dhcp else ''}")
+    return 0
+
+
+def cmd_apply(store, argv):
+    if not argv:
+        print(USAGE, file=sys.stderr)
+        return 2
+    from interface_executor import InterfaceExecutor
+    from backup import BackupHistory, backup_path
+    from plans import ProfileError
+    from switcher import apply_profile
+
+    name = argv[0]
+    if name not in store:
+        print(f"未找到 {name} 配置", file=sys.stderr)
+        return 1
+    executor = InterfaceExecutor()
+    try:
+        report = apply_profile(
+            name, store, executor,
+            disable_others="--keep-others" not in argv,
+            reconcile="--full" not in argv,
+            make_before_break="--break-before-make" not in argv,
+            verify="--no-verify" not in argv,
+            on_progress=print_progress,
+            backups=BackupHistory(backup_path(CONFIG_FILE)),
+        )
+    except ProfileError as e:
+        print(f"{name} 配置无效: {e}", file=sys.stderr)
+        return 1
+    finally:
+        executor.shutdown()
+    return print_report(name, report)
+
+
+def remote_apply(client, argv):
+    if not argv:
+        print(USAGE, file=sys.stderr)
+        return 2
+    report = client.apply(
+        argv[0],
+        disable_others="--keep-others" not in argv,
+        reconcile="--full" not in argv,
+        make_before_break="--break-before-make" not in argv,
+        verify="--no-verify" not in argv,
+        on_progress=print_progress,
+    )
+    return print_report(argv[0], report)
+
+
+def print_report(name, report):
+    from switcher import format_failures, format_gap
+
+    if report.superseded:
+        print(f"应用 {name} 配置已被之后的切换请求取代", file=sys.stderr)
+        return 1
+    failures = format_failures(report.results)
+    if failures:
+        print(f"应用 {name} 配置时以下命令执行失败:\n{failures}", file=sys.stderr)
+        return 1
+    if not report.changed:
+        print(f"{name} 配置已生效，无需更改")
+        return print_connectivity(report)
+    if not report.ready:
+        lost = f"，{format_gap(None)}" if report.gap is None else ""
+        print(f"已应用 {name} 配置，但目标网卡未能在限定时间内连接{lost}", file=sys.stderr)
+        return 1
+    wait = report.enable_wait + report.ready_wait
+    print(f"已应用 {name} 配置，{format_gap(report.gap)}，等待就绪 {wait:.1f} 秒，耗时 {report.elapsed:.1f} 秒")
+    return print_connectivity(report)
+
+
+def print_connectivity(report):
+    from verify import format_check
+
+    if report.connectivity is None:
+        return 0
+    if report.connectivity.ok:
+        print(f"网络连通性检查通过，切换开始后 {report.time_to_connectivity:.1f} 秒网络可用")
+        return 0
+    print("网络连通性检查未通过:", file=sys.stderr)
+    for check in report.connectivity.failures():
+        print(f"  {format_check(check)}", file=sys.stderr)
+    return 1
+
+
+def cmd_dhcp_all(store, argv):
+    from interface_executor import InterfaceExecutor
+    from switcher import set_dhcp_all
+
+    executor = InterfaceExecutor()
+    try:
+        results = set_dhcp_all(executor, print_progress)
+    finally:
+        executor.shutdown()
+    return print_dhcp_results(results)
+
+
+def remote_dhcp_all(client, argv):
+    return print_dhcp_results(client.dhcp_all(print_progress))
+
+
+def print_dhcp_results(results):
+    from switcher import format_failures
+
+    failures = format_failures(results)
+    if failures:
+        print(f"以下命令执行失败:\n{failures}", file=sys.stderr)
+        return 1
+    print("所有网卡已设置为自动获取IP")
+    return 0
+
+
+def cmd_backups(store, argv):
+    from backup import BackupHistory, backup_path
+
+    return print_backups([(b.profile, b.taken_at) for b in BackupHistory(backup_path(CONFIG_FILE)).load()])
+
+
+def remote_backups(client, argv):
+    return print_backups([(b["profile"], b["taken_at"]) for b in client.backups()])
+
+
+def print_backups(backups):
+    import time
+
+    if not backups:
+        print("没有网络状态备份")
+        return 0
+    for index, (profile, taken_at) in enumerate(backups):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(taken_at))
+        print(f"{index}\t{when}\t应用 {profile} 之前")
+    return 0
+
+
+def parse_backup_index(argv):
+    if not argv:
+        return 0
+    if not argv[0].isdigit():
+        print(USAGE, file=sys.stderr)
+        return None
+    return int(argv[0])
+
+
+def cmd_restore(store, argv):
+    from backup import BackupHistory, backup_path
+    from interface_executor import InterfaceExecutor
+    from switcher import restore_backup
+
+    index = parse_backup_index(argv)
+    if index is None:
+        return 2
+    backups = BackupHistory(backup_path(CONFIG_FILE)).load()
+    if index >= len(backups):
+        print("没有可恢复的备份" if not backups else f"备份编号超出范围: {index}", file=sys.stderr)
+        return 1
+    executor = InterfaceExecutor()
+    try:
+        report = restore_backup(backups[index], executor, print_progress)
+    finally:
+        executor.shutdown()
+    return print_restore_report(report)
+
+
+def remote_restore(client, argv):
+    index = parse_backup_index(argv)
+    if index is None:
+        return 2
+    return print_restore_report(client.restore(index, print_progress))
+
+
+def print_restore_report(report):
+    from switcher import format_failures
+
+    failures = format_failures(report.results)
+    if failures:
+        print(f"恢复网络时以下命令执行失败:\n{failures}", file=sys.stderr)
+        return 1
+    if not report.changed:
+        print("网络状态与备份一致，无需恢复")
+        return 0
+    print(f"已恢复网络状态，执行 {len(report.results)} 条命令，耗时 {report.elapsed:.1f} 秒")
+    return 0
+
+
+def cmd_serve(store, argv):
+    from daemon import NetworkDaemon
+
+    server = NetworkDaemon()
+    print(f"后台服务已启动，端口 {server.port}", file=sys.stderr)
+    server.serve_forever()
+    return 0
+
+
+# 命令名称: (本地处理函数, 经后台服务执行的处理函数, 是否修改网络配置)
+COMMANDS = {
+    "list": (cmd_list, remote_list, False),
+    "find": (cmd_find, None, False),
+    "status": (cmd_status, remote_status, False),
+    "show": (cmd_show, None, False),
+    "apply": (cmd_apply, remote_apply, True),
+    "dhcp-all": (cmd_dhcp_all, remote_dhcp_all, True),
+    "backups": (cmd_backups, remote_backups, False),
+    "restore": (cmd_restore, remote_restore, True),
+    "serve": (cmd_serve, None, True),
+}
+
+
+def main(argv):
+    argv = list(argv)
+    simulate = "--simulate" in argv
+    if simulate:
+        argv.remove("--simulate")
+    local = "--local" in argv
+    if local:
+        argv.remove("--local")
+    trace_path = None
+    if "--trace" in argv:
+        index = argv.index("--trace")
+        trace_path = argv[index + 1] if index + 1 < len(argv) else None
+        del argv[index:index + 2]
+        if trace_path:
+            tracing.enable_tracing()
+    if not argv or argv[0] not in COMMANDS:
+        print(USAGE, file=sys.stderr)
+        return 2
+
+    func, remote, mutating = COMMANDS[argv[0]]
+    # 模拟后端和跟踪记录都只作用于本进程，此时不交给后台服务执行
+    local = local or simulate or bool(trace_path)
+    client = DaemonClient.find() if remote and not local else None
+    if client is not None:
+        try:
+            return remote(client, argv[1:])
+        except DaemonError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    try:
+        store = open_store()
+    except (OSError, ValueError) as e:
+        print(f"加载配置文件出错: {e}", file=sys.stderr)
+        return 1
+    if simulate:
+        use_backend(create_simulated_backend())
+    elif mutating and not is_admin():
+        print("请以管理员身份运行此命令", file=sys.stderr)
+        return 1
+    elif argv[0] == "serve":
+        # 常驻服务保持netsh会话，单条命令无需每次启动进程
+        use_netsh_session()
+    try:
+        return func(store, argv[1:])
+    finally:
+        if trace_path:
+            tracing.export_chrome_trace(trace_path)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,9 +1,9 @@
 # config_window.py - 配置窗口类
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import os
-import re
-from utils import get_network_interfaces, get_interface_ip, enable_interface, center_window
+from plans import ProfileError, compile_profile, profile_adapters, binding_interfaces
+from utils import inventory, center_window
 
 class ConfigWindow(tk.Toplevel):
     def __init__(self, parent, title, save_callback, binding):
@@ -26,10 +26,25 @@ class ConfigWindow(tk.Toplevel):
         self.text_color = parent.text_color
         
         # 其他属性
+        self.worker = parent.worker
+        self.detector = parent.detector
+        self.snapshot = parent.snapshot
         self.save_callback = save_callback
         self.binding = binding
         self.network_name = title
-        self.geometry("440x520")
+        # 各网卡的设置{网卡名称: 设置}，沿用已保存的配置；一个配置可以绑定多个网卡
+        try:
+            saved = parent.store.get(title)
+        except ValueError:
+            saved = None
+        self.adapter_settings = {
+            adapter['interface']: dict(adapter)
+            for adapter in (profile_adapters(saved) if saved else [])
+            if isinstance(adapter, dict) and adapter.get('interface')
+        }
+        # 输入框中显示的是哪个网卡的设置
+        self.shown_interface = None
+        self.geometry("440x640")
           # 设置窗口样式
         self.configure(bg=self.bg_color)
         self.interface_var = tk.StringVar()
@@ -63,7 +78,14 @@ class ConfigWindow(tk.Toplevel):
         ttk.Label(card_frame, text="选择网卡:").grid(row=0, column=0, sticky='w', pady=(5, 0))
         self.interface_list = ttk.Combobox(card_frame, textvariable=self.interface_var, state="readonly", width=30)
         self.interface_list.grid(row=1, column=0, sticky='ew', padx=5, pady=5)
-        self.interface_list['values'] = get_network_interfaces()
+        self.interface_list.bind("<<ComboboxSelected>>", lambda e: self.show_settings())
+        if self.snapshot is not None:
+            # 先显示快照中的网卡列表，后台读取后再更新
+            self.interface_list['values'] = self.snapshot.names()
+            self.detector.submit("读取网卡列表", lambda task: inventory.names(),
+                                 on_done=self.update_interfaces, on_error=lambda e: None)
+        else:
+            self.interface_list['values'] = inventory.names()
         
         bind_frame = ttk.Frame(card_frame)
         bind_frame.grid(row=2, column=0, sticky='ew', padx=5, pady=5)
@@ -104,15 +126,34 @@ class ConfigWindow(tk.Toplevel):
             self.entries.append(entry)
             self.fields_frame.grid_columnconfigure(1, weight=1)
         
+        # 连通性检查部分
+        check_frame = ttk.LabelFrame(main_frame, text="连通性检查与静态路由", padding=(10, 5))
+        check_frame.pack(fill='x', padx=5, pady=(15, 5))
+        
+        ttk.Label(check_frame, text="检查地址 (如 http://内网主页/ 或 tcp://10.0.0.5:445，多个用逗号分隔)",
+                  wraplength=360).pack(anchor='w')
+        self.checks_entry = ttk.Entry(check_frame)
+        self.checks_entry.pack(fill='x', padx=5, pady=5)
+        
+        # 静态路由部分，路由较多时从文本文件导入，每行一条: 前缀 [下一跳] [跃点数]
+        route_frame = ttk.Frame(check_frame)
+        route_frame.pack(fill='x', padx=5, pady=5)
+        
+        self.routes_label = ttk.Label(route_frame, text="静态路由: 无")
+        self.routes_label.pack(side='left')
+        ttk.Button(route_frame, text="清空", command=self.clear_routes).pack(side='right')
+        ttk.Button(route_frame, text="从文件导入", command=self.import_routes).pack(side='right', padx=5)
+        
         # 操作按钮区
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill='x', padx=5, pady=15)
         
-        ttk.Button(
+        self.read_btn = ttk.Button(
             button_frame, 
             text="读取当前配置", 
             command=self.read_current_config
-        ).pack(side='left', padx=5, fill='x', expand=True)
+        )
+        self.read_btn.pack(side='left', padx=5, fill='x', expand=True)
         
         ttk.Button(
             button_frame, 
@@ -123,31 +164,110 @@ class ConfigWindow(tk.Toplevel):
 
         self.load_binding()
 
+    def bound_interfaces(self):
+        return binding_interfaces(self.binding.get(self.network_name))
+
     def load_binding(self):
-        bound = self.binding.get(self.network_name)
+        bound = self.bound_interfaces()
+        values = list(self.interface_list['values'])
         if bound:
-            try:
-                index = self.interface_list['values'].index(bound)
-                self.interface_list.current(index)
-            except ValueError:
-                self.interface_list.current(0)
-            self.bound_label.config(text=f"已绑定网卡: {bound}")
-            self.bind_btn.config(text="解绑网卡")
-        elif self.interface_list['values']:
+            self.interface_list.current(values.index(bound[0]) if bound[0] in values else 0)
+        elif values:
             self.interface_list.current(0)
-            self.bound_label.config(text="未绑定网卡")
-            self.bind_btn.config(text="绑定到此网卡")
-        self.toggle_fields()
+        self.show_settings()
+
+    def show_binding(self):
+        bound = self.bound_interfaces()
+        self.bound_label.config(text=f"已绑定网卡: {'、'.join(bound)}" if bound else "未绑定网卡")
+        self.bind_btn.config(text="解绑此网卡" if self.interface_var.get() in bound else "绑定到此网卡")
+
+    def update_interfaces(self, names):
+        if not self.winfo_exists() or list(self.interface_list['values']) == names:
+            return
+        current = self.interface_var.get()
+        self.interface_list['values'] = names
+        if current in names:
+            self.interface_list.current(names.index(current))
+        else:
+            self.load_binding()
 
     def toggle_binding(self):
         current = self.interface_var.get()
-        if self.binding.get(self.network_name) == current:
-            del self.binding[self.network_name]
-            messagebox.showinfo("解绑成功", f"{self.network_name} 网卡解绑成功")
+        bound = self.bound_interfaces()
+        if current in bound:
+            bound.remove(current)
+            messagebox.showinfo("解绑成功", f"{self.network_name} 已解绑网卡：{current}")
         else:
-            self.binding[self.network_name] = current
+            bound.append(current)
             messagebox.showinfo("绑定成功", f"{self.network_name} 已绑定到网卡：{current}")
-        self.load_binding()
+        # 只绑定一个网卡时保存为名称，兼容旧的配置文件
+        if not bound:
+            self.binding.pop(self.network_name, None)
+        else:
+            self.binding[self.network_name] = bound[0] if len(bound) == 1 else bound
+        self.show_binding()
+
+    def store_settings(self):
+        """把输入框中的内容保存到当前显示的网卡的设置"""
+        iface = self.shown_interface
+        if not iface:
+            return
+        values = [entry.get().strip() for entry in self.entries]
+        routes = self.adapter_settings.get(iface, {}).get('routes')
+        settings = {'interface': iface, 'dhcp': self.use_dhcp_var.get()}
+        if routes:
+            settings['routes'] = routes
+        if not settings['dhcp'] or any(values):
+            settings.update(zip(('ip', 'mask', 'gateway', 'dns'), values))
+        checks = [url.strip() for url in self.checks_entry.get().split(',') if url.strip()]
+        if checks:
+            settings['checks'] = checks
+        self.adapter_settings[iface] = settings
+
+    def show_settings(self):
+        """切换网卡后显示该网卡的设置"""
+        self.store_settings()
+        iface = self.interface_var.get()
+        self.shown_interface = iface or None
+        settings = self.adapter_settings.get(iface, {})
+        self.use_dhcp_var.set(bool(settings.get('dhcp')))
+        values = [settings.get(key, '') for key in ('ip', 'mask', 'gateway', 'dns')]
+        for entry, val in zip(self.entries, values):
+            entry.config(state="normal")
+            entry.delete(0, tk.END)
+            entry.insert(0, val)
+        self.checks_entry.delete(0, tk.END)
+        self.checks_entry.insert(0, ", ".join(settings.get('checks', [])))
+        self.show_routes()
+        self.show_binding()
+        self.toggle_fields()
+
+    def show_routes(self):
+        routes = self.adapter_settings.get(self.shown_interface, {}).get('routes')
+        self.routes_label.config(text=f"静态路由: {len(routes)} 条" if routes else "静态路由: 无")
+
+    def import_routes(self):
+        iface = self.shown_interface
+        if not iface:
+            return
+        path = filedialog.askopenfilename(parent=self, title="导入静态路由",
+                                          filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")])
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                routes = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("导入失败", f"无法读取文件: {e}")
+            return
+        self.store_settings()
+        self.adapter_settings[iface]['routes'] = routes
+        self.show_routes()
+
+    def clear_routes(self):
+        if self.shown_interface in self.adapter_settings:
+            self.adapter_settings[self.shown_interface].pop('routes', None)
+        self.show_routes()
 
     def toggle_fields(self):
         state = "disabled" if self.use_dhcp_var.get() else "normal"
@@ -155,74 +275,82 @@ class ConfigWindow(tk.Toplevel):
             entry.config(state=state)
 
     def read_current_config(self):
-        iface = self.binding.get(self.network_name)
-        if not iface:
-            messagebox.showwarning("未绑定", "请先绑定一个网卡")
+        iface = self.interface_var.get()
+        if iface not in self.bound_interfaces():
+            messagebox.showwarning("未绑定", "请先绑定此网卡")
             return
-        info = get_interface_ip(iface)
-        is_dhcp = "DHCP 已启用: 是" in info
-        self.use_dhcp_var.set(is_dhcp)
-        self.toggle_fields()
-        ip, mask, gateway = '', '', ''
-        dns_list = []
-        lines = info.splitlines()
-        for i, line in enumerate(lines):
-            if "IP 地址" in line and not ip:
-                ip = line.split(":", 1)[-1].strip()
-            elif "子网前缀" in line and not mask:
-                if "掩码" in line:
-                # 提取括号中的掩码
-                    start = line.find("掩码")
-                    if start != -1:
-                        mask = line[start + 3:].replace(")", "").strip()
-            elif "默认网关" in line:
-                gateway = line.split(":", 1)[-1].strip()
-            elif "DNS 服务器" in line:
-            # 提取主行 DNS
-                dns_line = line.split(":", 1)[-1]
-                dns_list += re.findall(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', dns_line)
-                # 提取后续 DNS 行
-                j = i + 1
-                while j < len(lines):
-                    potential = lines[j].strip()
-                    if potential == "":
-                        break
-                    matches = re.findall(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', potential)
-                    if matches:
-                        dns_list.extend(matches)
-                    else:
-                        break
-                    j += 1
-        dns = ", ".join(dns_list)
-        values = [ip, mask, gateway, dns]
+        if self.worker.busy:
+            messagebox.showwarning("提示", "正在执行其他操作，请稍候")
+            return
+        self.read_btn.config(text="读取中...", state='disabled')
+        self.worker.submit(
+            "读取当前配置",
+            lambda task: inventory.interface_config(iface, refresh=True),
+            on_done=self.fill_config,
+            on_error=self.on_read_error
+        )
+
+    def fill_config(self, adapter):
+        # 窗口可能已在读取期间关闭
+        if not self.winfo_exists():
+            return
+        self.read_btn.config(text="读取当前配置", state='normal')
+        if adapter is None:
+            messagebox.showwarning("读取失败", "未找到该网卡的IP配置")
+            return
+        if adapter.name != self.shown_interface:
+            # 读取期间已切换到其他网卡
+            self.adapter_settings.setdefault(adapter.name, {'interface': adapter.name}).update(
+                dhcp=adapter.dhcp, ip=adapter.ip, mask=adapter.mask, gateway=adapter.gateway, dns=adapter.dns_string())
+            return
+        self.use_dhcp_var.set(adapter.dhcp)
+        values = [adapter.ip, adapter.mask, adapter.gateway, adapter.dns_string()]
         for entry, val in zip(self.entries, values):
             entry.config(state="normal")
             entry.delete(0, tk.END)
             entry.insert(0, val)
         self.toggle_fields()
 
+    def on_read_error(self, e):
+        if not self.winfo_exists():
+            return
+        self.read_btn.config(text="读取当前配置", state='normal')
+        messagebox.showerror("读取失败", f"无法读取当前配置: {e}")
+
     def on_save(self):
-        iface = self.binding.get(self.network_name)
-        if not iface:
+        bound = self.bound_interfaces()
+        if not bound:
             messagebox.showerror("错误", "请先绑定网卡")
             return
 
-        config = {
-            'interface': iface,
-            'dhcp': self.use_dhcp_var.get()
-        }
-
-        if not config['dhcp']:
-            values = [entry.get() for entry in self.entries]
-            if not all(values):
-                messagebox.showerror("错误", "所有字段都不能为空")
+        self.store_settings()
+        adapters = []
+        for iface in bound:
+            settings = self.adapter_settings.get(iface)
+            if settings is None:
+                messagebox.showerror("错误", f"请设置网卡 {iface} 的IP")
                 return
-            config.update({
-                'ip': values[0],
-                'mask': values[1],
-                'gateway': values[2],
-                'dns': values[3]
-            })
-
-        self.save_callback(self.network_name, config)
+            adapter = {'interface': iface, 'dhcp': settings.get('dhcp', False)}
+            if not adapter['dhcp']:
+                values = [settings.get(key, '') for key in ('ip', 'mask', 'gateway', 'dns')]
+                if not all(values):
+                    messagebox.showerror("错误", f"网卡 {iface} 的所有字段都不能为空")
+                    return
+                adapter.update(zip(('ip', 'mask', 'gateway', 'dns'), values))
+            if settings.get('checks'):
+                adapter['checks'] = settings['checks']
+            if settings.get('routes'):
+                adapter['routes'] = settings['routes']
+            adapters.append(adapter)
+        # 只有一个网卡时保存为单网卡配置，兼容旧的配置文件
+        config = adapters[0] if len(adapters) == 1 else {'adapters': adapters}
+
+        # 保存前校验，无效时保留窗口以便修改
+        try:
+            compile_profile(config)
+        except ProfileError as e:
+            messagebox.showerror("配置无效", str(e))
+            return
+
+        self.save_callback(self.network_name, config, self.binding.get(self.network_name))
         self.destroy()
@@ -0,0 +1,401 @@
+# daemon.py - 常驻后台服务
+# 服务进程常驻内存，保存已加载的配置、网卡清单缓存、常驻netsh会话和执行器，
+# 图形界面和命令行通过本机TCP连接发送请求，切换时只剩网络操作本身的耗时
+#
+# 协议: 每个连接发送一行JSON请求，如 {"token": "...", "command": "apply", "profile": "外网"}
+# 服务端逐行返回JSON，进度为 {"progress": 说明, "done": n, "total": m}，
+# 最后一行为 {"ok": true, "result": ...} 或 {"ok": false, "error": 说明}
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from netsh_commands import CommandResult
+from profiles import CONFIG_FILE, open_store
+
+# 服务地址和口令写在配置文件旁，只有能读取该文件的用户才能连接
+ADDRESS_FILE = "network_daemon.json"
+CONNECT_TIMEOUT = 1.0
+COMMANDS = ("apply", "dhcp_all", "restore", "backups", "status", "list", "shutdown")
+
+
+class DaemonError(Exception):
+    """服务端返回的错误"""
+
+
+class DaemonUnavailable(DaemonError):
+    """服务未运行或无法连接"""
+
+
+def address_path(config_file=CONFIG_FILE):
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), ADDRESS_FILE)
+
+
+# SwitchReport与JSON之间的转换
+def encode_report(report):
+    return {
+        "strategy": report.strategy,
+        "results": encode_results(report.results),
+        "ready": report.ready,
+        "enable_wait": report.enable_wait,
+        "ready_wait": report.ready_wait,
+        "gap": report.gap,
+        "elapsed": report.elapsed,
+        "superseded": report.superseded,
+        "connectivity": encode_connectivity(report.connectivity),
+        "time_to_connectivity": report.time_to_connectivity,
+    }
+
+
+def decode_report(data):
+    from switcher import SwitchReport
+
+    report = SwitchReport(data["strategy"])
+    report.results = decode_results(data["results"])
+    report.ready = data["ready"]
+    report.enable_wait = data.get("enable_wait", 0.0)
+    report.ready_wait = data["ready_wait"]
+    report.gap = data["gap"]
+    report.elapsed = data["elapsed"]
+    report.superseded = data.get("superseded", False)
+    report.connectivity = decode_connectivity(data.get("connectivity"))
+    report.time_to_connectivity = data.get("time_to_connectivity")
+    return report
+
+
+def encode_connectivity(connectivity):
+    if connectivity is None:
+        return None
+    return {
+        "checks": [{"kind": c.kind, "target": c.target, "ok": c.ok, "latency": c.latency, "error": c.error}
+                   for c in connectivity.checks],
+        "elapsed": connectivity.elapsed,
+        "attempts": connectivity.attempts,
+    }
+
+
+def decode_connectivity(data):
+    from verify import CheckResult, ConnectivityReport
+
+    if data is None:
+        return None
+    connectivity = ConnectivityReport()
+    connectivity.checks = [CheckResult(c["kind"], c["target"], c["ok"], c["latency"], c["error"])
+                           for c in data["checks"]]
+    connectivity.elapsed = data["elapsed"]
+    connectivity.attempts = data["attempts"]
+    return connectivity
+
+
+def encode_results(results):
+    return [{"command": r.command, "label": r.label, "ok": r.ok, "output": r.output} for r in results]
+
+
+def decode_results(data):
+    return [CommandResult(r["command"], r["label"], r["ok"], r["output"]) for r in data]
+
+
+# 生成把进度发送给客户端的回调，客户端断开连接视为取消
+def _progress_sender(send, cancel_event):
+    lock = threading.Lock()
+
+    def on_progress(text, done=None, total=None):
+        with lock:
+            if cancel_event.is_set():
+                return
+            try:
+                send({"progress": text, "done": done, "total": total})
+            except OSError:
+                cancel_event.set()
+
+    return on_progress
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        if not isinstance(request, dict) or not hmac.compare_digest(str(request.get("token", "")),
+                                                                      self.server.owner.token):
+            self._send({"ok": False, "error": "口令错误"})
+            return
+        reply = self.server.owner.handle(request, self._send)
+        try:
+            self._send(reply)
+        except OSError:
+            # 客户端已断开
+            pass
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8'))
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = False
+
+
+class NetworkDaemon:
+    """
+    常驻服务：同时到达的请求逐个执行，切换请求由调度器以最后一次为准，
+    切换、全部自动获取IP和恢复备份共用调度器的锁，不会同时修改网络配置；
+    其他进程保存的配置在下一次请求时读入
+    """
+
+    def __init__(self, config_file=CONFIG_FILE, port=0):
+        from functools import partial
+
+        from backup import BackupHistory, backup_path
+        from interface_executor import InterfaceExecutor
+        from scheduler import SwitchScheduler
+        from switcher import apply_profile
+
+        self.config_file = config_file
+        self.token = secrets.token_hex(16)
+        self.executor = InterfaceExecutor()
+        self.backups = BackupHistory(backup_path(config_file))
+        self.scheduler = SwitchScheduler(self.executor, partial(apply_profile, backups=self.backups))
+        self._lock = threading.Lock()
+        # 修改网络配置的命令持有该锁，与调度器中的切换互斥
+        self._network_lock = self.scheduler.run_lock
+        self._store = None
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.owner = self
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _profiles(self):
+        """返回配置库，并读入其他进程追加的修改"""
+        if self._store is None:
+            self._store = open_store(self.config_file)
+        else:
+            self._store.refresh()
+        return self._store
+
+    def handle(self, request, send):
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True, "result": os.getpid()}
+        handler = getattr(self, f"do_{command}", None) if command in COMMANDS else None
+        if handler is None:
+            return {"ok": False, "error": f"未知命令: {command}"}
+        try:
+            if command == "apply":
+                # 切换请求不加锁，新请求可以取代正在执行的切换
+                return {"ok": True, "result": handler(request, send)}
+            if command in ("dhcp_all", "restore"):
+                # 等待正在执行的切换完成，期间不阻塞查询请求
+                with self._network_lock:
+                    return {"ok": True, "result": handler(request, send)}
+            with self._lock:
+                return {"ok": True, "result": handler(request, send)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def do_list(self, request, send):
+        store = self._profiles()
+        return {name: store[name] for name in store}
+
+    def do_status(self, request, send):
+        from netsh_batch import read_network_state
+        from switcher import detect_active_profile
+
+        states, adapters = read_network_state()
+        return {
+            "active_profile": detect_active_profile(self._profiles().bindings()),
+            "interfaces": [
+                {
+                    "name": state.name,
+                    "admin_enabled": state.admin_enabled,
+                    "connected": state.connected,
+                    "ips": adapters[state.name].ips if state.name in adapters else [],
+                }
+                for state in states
+            ],
+        }
+
+    def do_apply(self, request, send):
+        with self._lock:
+            store = self._profiles()
+        name = request.get("profile", "")
+        if name not in store:
+            raise DaemonError(f"未找到 {name} 配置")
+        cancel_event = threading.Event()
+        options = request.get("options", {})
+        future = self.scheduler.submit(
+            name, store, _progress_sender(send, cancel_event),
+            disable_others=options.get("disable_others", True),
+            reconcile=options.get("reconcile", True),
+            make_before_break=options.get("make_before_break", True),
+            verify=options.get("verify", False),
+        )
+        # 客户端断开连接时取消
+        while True:
+            try:
+                return encode_report(future.result(timeout=0.5))
+            except FutureTimeout:
+                if cancel_event.is_set():
+                    self.scheduler.cancel(future)
+                    cancel_event.clear()
+
+    def do_dhcp_all(self, request, send):
+        from switcher import set_dhcp_all
+
+        cancel_event = threading.Event()
+        return encode_results(set_dhcp_all(self.executor, _progress_sender(send, cancel_event), cancel_event))
+
+    def do_backups(self, request, send):
+        return [{"profile": backup.profile, "taken_at": backup.taken_at} for backup in self.backups.load()]
+
+    def do_restore(self, request, send):
+        from switcher import restore_backup
+
+        backups = self.backups.load()
+        index = request.get("index", 0)
+        if not isinstance(index, int) or not 0 <= index < len(backups):
+            raise DaemonError("没有可恢复的备份" if not backups else f"备份编号超出范围: {index}")
+        cancel_event = threading.Event()
+        report = restore_backup(backups[index], self.executor, _progress_sender(send, cancel_event), cancel_event)
+        return encode_report(report)
+
+    def do_shutdown(self, request, send):
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return None
+
+    def serve_forever(self):
+        """写入地址文件并处理请求，直到收到shutdown请求"""
+        path = address_path(self.config_file)
+        # 口令只允许当前用户读取
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump({"port": self.port, "token": self.token, "pid": os.getpid()}, f)
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        """关闭监听端口和执行器"""
+        self._server.server_close()
+        self.executor.shutdown()
+
+
+class DaemonClient:
+    """常驻服务的客户端，每个请求使用一个新连接，可在多个线程中同时使用"""
+
+    def __init__(self, port, token):
+        self.port = port
+        self.token = token
+
+    @classmethod
+    def find(cls, config_file=CONFIG_FILE):
+        """
+        :return: 服务正在运行时返回DaemonClient，否则返回None
+        """
+        try:
+            with open(address_path(config_file), 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            client = cls(info["port"], info["token"])
+            client.request("ping")
+            return client
+        except (OSError, ValueError, KeyError, DaemonError):
+            return None
+
+    def request(self, command, on_progress=None, cancel_event=None, **params):
+        """
+        发送请求并等待结果
+        :param on_progress: 进度回调，参数为(说明, 已完成数, 总数)
+        :param cancel_event: threading.Event，置位后断开连接，服务端随之取消操作
+        :return: 服务端返回的result
+        :raises DaemonUnavailable: 无法连接服务
+        :raises DaemonError: 服务端返回错误
+        """
+        try:
+            sock = socket.create_connection(("127.0.0.1", self.port), timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            raise DaemonUnavailable(f"无法连接后台服务: {e}")
+        with sock:
+            sock.settimeout(0.2)
+            message = dict(params, token=self.token, command=command)
+            sock.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8'))
+            buffer = b""
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DaemonError("已取消")
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    raise DaemonUnavailable(f"与后台服务的连接中断: {e}")
+                if not chunk:
+                    raise DaemonUnavailable("后台服务关闭了连接")
+                buffer += chunk
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    reply = json.loads(line)
+                    if "progress" in reply:
+                        if on_progress:
+                            on_progress(reply["progress"], reply["done"], reply["total"])
+                        continue
+                    if not reply.get("ok"):
+                        raise DaemonError(reply.get("error", "未知错误"))
+                    return reply.get("result")
+
+    def apply(self, profile, disable_others=True, reconcile=True, make_before_break=True,
+              verify=False, on_progress=None, cancel_event=None):
+        """:return: SwitchReport，取消时返回None"""
+        options = {"disable_others": disable_others, "reconcile": reconcile,
+                   "make_before_break": make_before_break, "verify": verify}
+        try:
+            data = self.request("apply", on_progress, cancel_event, profile=profile, options=options)
+        except DaemonError:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            raise
+        return decode_report(data)
+
+    def dhcp_all(self, on_progress=None, cancel_event=None):
+        """:return: 全部CommandResult，取消时返回空列表"""
+        try:
+            return decode_results(self.request("dhcp_all", on_progress, cancel_event))
+        except DaemonError:
+            if cancel_event is not None and cancel_event.is_set():
+                return []
+            raise
+
+    def restore(self, index=0, on_progress=None, cancel_event=None):
+        """:return: SwitchReport，取消时返回None"""
+        try:
+            data = self.request("restore", on_progress, cancel_event, index=index)
+        except DaemonError:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            raise
+        return decode_report(data)
+
+    def backups(self):
+        """:return: [{"profile": 配置名称, "taken_at": 时间戳}]，从新到旧"""
+        return self.request("backups")
+
+    def status(self):
+        return self.request("status")
+
+    def list(self):
+        return self.request("list")
+
+    def shutdown(self):
+        return self.request("shutdown")
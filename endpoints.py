@@ -0,0 +1,18 @@
+# endpoints.py - 检查地址的解析，不依赖asyncio，校验配置时无需加载连通性检查模块
+from urllib.parse import urlsplit
+
+
+# 解析检查地址，如 tcp://10.0.0.5:445、http://intranet/、https://example.com/health
+def parse_endpoint(url):
+    """
+    :return: (协议, 主机, 端口, 路径)
+    :raises ValueError: 地址格式不正确
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("tcp", "http", "https") or not parts.hostname:
+        raise ValueError(f"不支持的检查地址: {url}")
+    port = parts.port or {"http": 80, "https": 443}.get(scheme)
+    if port is None:
+        raise ValueError(f"TCP检查地址需要端口: {url}")
+    return scheme, parts.hostname, port, parts.path or "/"
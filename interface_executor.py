@@ -0,0 +1,50 @@
+# interface_executor.py - 按网卡并行的执行器
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class InterfaceExecutor:
+    """
+    以网卡名称为键调度操作：
+    不同网卡的操作在有界线程池中并发执行，同一网卡的操作严格按提交顺序串行执行
+    """
+
+    def __init__(self, max_workers=8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="iface")
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def submit(self, interface, func, *args, **kwargs):
+        """
+        提交一个针对指定网卡的操作
+        :return: concurrent.futures.Future
+        """
+        future = Future()
+        with self._lock:
+            pending = self._queues.get(interface)
+            if pending is None:
+                # 该网卡当前空闲，启动一个串行消费者
+                self._queues[interface] = deque([(future, func, args, kwargs)])
+                self._pool.submit(self._drain, interface)
+            else:
+                pending.append((future, func, args, kwargs))
+        return future
+
+    def _drain(self, interface):
+        while True:
+            with self._lock:
+                pending = self._queues[interface]
+                if not pending:
+                    del self._queues[interface]
+                    return
+                future, func, args, kwargs = pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -1,16 +1,36 @@
 # main.py - 程序入口点
+# 用法: python main.py [--simulate] [--trace 文件]
+#   --simulate 使用内存中的模拟后端，不修改真实网络，可在非Windows环境运行
+#   --trace    记录各项操作的耗时，退出时导出为Chrome trace-event JSON
+#   后台服务(python -m cli serve)运行时，切换操作交给服务执行，无需以管理员身份运行界面；
+#   使用--simulate或--trace时操作在本进程执行
+import sys
 import tkinter as tk
 from tkinter import messagebox
 
-from utils import is_admin
+import tracing
+from daemon import DaemonClient
+from profiles import create_simulated_backend
+from utils import is_admin, use_netsh_session, use_backend
 from main_window import SimpleNetworkSwitcher
 
 if __name__ == "__main__":
-    if not is_admin():
+    trace_path = sys.argv[sys.argv.index("--trace") + 1] if "--trace" in sys.argv else None
+    if trace_path:
+        tracing.enable_tracing()
+    if "--simulate" in sys.argv:
+        use_backend(create_simulated_backend())
+        app = SimpleNetworkSwitcher()
+        app.mainloop()
+    elif not is_admin() and (trace_path or DaemonClient.find() is None):
         root = tk.Tk()
         root.withdraw()
         messagebox.showerror("权限错误", "请以管理员身份运行此程序")
         root.destroy()
     else:
+        use_netsh_session()
         app = SimpleNetworkSwitcher()
         app.mainloop()
+        use_netsh_session(False)
+    if trace_path:
+        tracing.export_chrome_trace(trace_path)
@@ -2,25 +2,47 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, font
 import os
-import json
+import queue
+import time
 from functools import partial
 
+import tracing
+
+from backup import BackupHistory, backup_path
 from config_window import ConfigWindow
+from backends import get_backend
+from daemon import DaemonClient
+from profile_list import ProfileListView
+from profile_search import ProfileIndex
 from rename_dialog import RenameDialog
+from scheduler import SwitchScheduler
+from interface_executor import InterfaceExecutor
+from plans import ProfileError, compile_profile
+from profile_store import ProfileStore
+from profiles import CONFIG_FILE, open_store, store_path
+from snapshot import StartupSnapshot, snapshot_path, load_snapshot, save_snapshot
+from switcher import (
+    apply_profile, set_dhcp_all, restore_backup, read_startup_snapshot, match_active_profile, format_failures,
+    format_gap
+)
 from utils import (
-    is_admin, get_active_interfaces, get_network_interfaces,
-    set_static_ip, set_dhcp, enable_interface, disable_interface,
+    is_admin,
     center_window
 )
-
-CONFIG_FILE = "network_config.json"
+from watcher import NetworkWatcher
+from verify import format_check
+from worker import BackgroundWorker
 
 class SimpleNetworkSwitcher(tk.Tk):
     def __init__(self):
+        # 启动各阶段的时间点(perf_counter)，用于测量首次绘制和自动选择耗时
+        self.startup_times = {"start": time.perf_counter()}
         super().__init__()
         self.title("网络一键切换器")
-        self.resizable(False,False)
-        self.geometry("450x380")
+        # 高度可调，配置列表随之显示更多行
+        self.resizable(False, True)
+        self.geometry("450x660")
+        self.minsize(450, 560)
         
         # 设置窗口图标
         icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "network.ico")
@@ -38,10 +60,31 @@ class SimpleNetworkSwitcher(tk.Tk):
         
         self.configure(bg=self.bg_color)
         self.selected_profile = tk.StringVar()
-        self.profile_names = {"内网": "内网", "外网": "外网", "专网": "专网"}
-        self.network_configs = {}
-        self.network_bindings = {}
+        # 配置库，启动时只读取索引，配置内容在使用时才读取
+        self.store = None
+        self.config_hash = ""
+        # 配置名称索引，用于输入时过滤配置列表
+        self.profile_index = ProfileIndex()
+        self.search_var = tk.StringVar()
+        # 上次保存的网卡清单和当前配置，启动时先用它绘制界面
+        self.snapshot = None
+        # 根据网络状态自动选中的配置，用户手动选择后不再自动更改
+        self.auto_selected = None
         self.disable_others_var = tk.BooleanVar(value=True)
+        self.reconcile_var = tk.BooleanVar(value=True)
+        self.make_before_break_var = tk.BooleanVar(value=True)
+        self.verify_var = tk.BooleanVar(value=True)
+        self.worker = BackgroundWorker(self)
+        # 只读查询使用单独的后台线程，不阻塞用户操作
+        self.detector = BackgroundWorker(self)
+        self.executor = InterfaceExecutor()
+        # 每次应用配置前自动备份全部网卡的状态，出错时可一键恢复
+        self.backups = BackupHistory(backup_path(CONFIG_FILE))
+        self.scheduler = SwitchScheduler(self.executor, partial(apply_profile, backups=self.backups))
+        # 监视网卡变化，变化事件经队列交给Tk线程处理
+        self.watcher = NetworkWatcher(self.on_network_change)
+        self.network_events = queue.Queue()
+        self.watching = False
         
         # 配置样式
         self.style = ttk.Style()
@@ -100,14 +143,23 @@ class SimpleNetworkSwitcher(tk.Tk):
         # 配置面板样式
         self.style.configure("TFrame", background=self.bg_color)
                           
-        self.load_configurations()
-        self.create_widgets()
-        self.auto_select_active_profile()
+        with tracing.span("load_configurations", "startup"):
+            self.load_configurations()
+        with tracing.span("create_widgets", "startup"):
+            self.create_widgets()
         
         # 窗口创建完成后居中显示
         self.update_idletasks()  # 确保窗口尺寸已更新
         center_window(self)
         
+        # 先用快照显示窗口，再在后台识别当前网络
+        self.bind("<Map>", self.on_first_map, add="+")
+        self.auto_select_active_profile()
+        
+    def on_first_map(self, event):
+        if event.widget is self and "first_paint" not in self.startup_times:
+            self.startup_times["first_paint"] = time.perf_counter()
+        
     def create_widgets(self):
         # 创建主框架
         main_frame = ttk.Frame(self)
@@ -118,8 +170,8 @@ class SimpleNetworkSwitcher(tk.Tk):
         header_frame.pack(fill='x', pady=(0, 15))
         
         ttk.Label(header_frame, text="网络一键切换", style="Header.TLabel").pack(side='left')
-        status_label = ttk.Label(header_frame, text="运行中...", foreground='green')
-        status_label.pack(side='right')
+        self.status_label = ttk.Label(header_frame, text="运行中...", foreground='green')
+        self.status_label.pack(side='right')
         
         # 分隔线
         separator = ttk.Separator(main_frame, orient='horizontal')
@@ -129,24 +181,18 @@ class SimpleNetworkSwitcher(tk.Tk):
         config_frame = ttk.Frame(main_frame)
         config_frame.pack(fill='x', pady=10)
         
-        ttk.Label(config_frame, text="选择网络配置:").pack(anchor='w')
-        
-        # 网络配置按钮容器
-        button_frame = ttk.Frame(main_frame)
-        button_frame.pack(fill='x', pady=10)
-        
-        # 使用更大、更现代的按钮
-        for i, key in enumerate(self.profile_names):
-            b = ttk.Button(
-                button_frame, 
-                text=self.profile_names[key], 
-                style="Profile.TButton",
-                width=10,
-                command=partial(self.select_profile, key)
-            )
-            b.grid(row=0, column=i, padx=5, pady=5, sticky='ew')
-            button_frame.grid_columnconfigure(i, weight=1)
-            setattr(self, f"btn_{key}", b)
+        ttk.Label(config_frame, text="选择网络配置:").pack(side='left')
+        search_entry = ttk.Entry(config_frame, textvariable=self.search_var)
+        search_entry.pack(side='right', fill='x', expand=True, padx=(10, 0))
+        search_entry.bind("<Down>", lambda event: self.profile_list.move(1))
+        search_entry.bind("<Up>", lambda event: self.profile_list.move(-1))
+        search_entry.bind("<Return>", lambda event: self.profile_list.move(0))
+        self.search_var.trace_add("write", lambda *args: self.filter_profiles())
+        
+        # 网络配置列表，只为可见的行创建按钮
+        self.profile_list = ProfileListView(main_frame, self.select_profile)
+        self.profile_list.pack(fill='both', expand=True, pady=5)
+        self.show_profile_list()
         
         # 分隔线
         separator = ttk.Separator(main_frame, orient='horizontal')
@@ -191,6 +237,32 @@ class SimpleNetworkSwitcher(tk.Tk):
             command=self.set_dhcp_all
         ).pack(side='right', padx=5, fill='x', expand=True)
         
+        # 新建和删除配置
+        profile_row = ttk.Frame(action_frame)
+        profile_row.pack(fill='x', pady=5)
+        
+        ttk.Button(
+            profile_row, 
+            text="新建配置",
+            command=self.new_profile
+        ).pack(side='left', padx=5, fill='x', expand=True)
+        
+        ttk.Button(
+            profile_row, 
+            text="删除配置",
+            command=self.delete_profile
+        ).pack(side='right', padx=5, fill='x', expand=True)
+        
+        # 第三行操作按钮
+        third_row = ttk.Frame(action_frame)
+        third_row.pack(fill='x', pady=5)
+        
+        ttk.Button(
+            third_row, 
+            text="恢复到上次切换前的网络",
+            command=self.restore_last_backup
+        ).pack(fill='x', padx=5, expand=True)
+        
         # 底部选项区
         bottom_frame = ttk.Frame(main_frame)
         bottom_frame.pack(fill='x', pady=(10, 0))
@@ -199,14 +271,59 @@ class SimpleNetworkSwitcher(tk.Tk):
             bottom_frame, 
             text="应用配置时禁用其他网卡",
             variable=self.disable_others_var
-        ).pack(side='left')
+        ).pack(anchor='w')
+        
+        ttk.Checkbutton(
+            bottom_frame, 
+            text="仅执行与当前状态不同的更改",
+            variable=self.reconcile_var
+        ).pack(anchor='w')
+        
+        ttk.Checkbutton(
+            bottom_frame, 
+            text="先连接目标网卡再禁用其他网卡",
+            variable=self.make_before_break_var
+        ).pack(anchor='w')
+        
+        ttk.Checkbutton(
+            bottom_frame, 
+            text="应用后检查网络连通性",
+            variable=self.verify_var
+        ).pack(anchor='w')
+        
+        # 进度显示区
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill='x', pady=(10, 0))
         
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress_bar.pack(side='left', padx=5, fill='x', expand=True)
+        
+        self.cancel_btn = ttk.Button(
+            progress_frame,
+            text="取消",
+            state='disabled',
+            command=self.cancel_task
+        )
+        self.cancel_btn.pack(side='right', padx=5)
+        
+    # 配置增删或改名后重建名称索引并刷新列表
+    def show_profile_list(self):
+        self.profile_index.rebuild(self.store)
+        if self.selected_profile.get() not in self.store:
+            self.clear_selection()
+        self.filter_profiles()
+
+    # 按搜索框中的内容过滤配置列表
+    def filter_profiles(self):
+        self.profile_list.set_items(self.profile_index.search(self.search_var.get()))
+
     def select_profile(self, name):
         self.selected_profile.set(name)
-        for key in self.profile_names:
-            btn = getattr(self, f"btn_{key}")
-            btn.configure(style="Profile.TButton")
-        getattr(self, f"btn_{name}").configure(style="Selected.TButton")
+        self.profile_list.select(name)
+
+    def clear_selection(self):
+        self.selected_profile.set("")
+        self.profile_list.select(None)
         
     # 重命名网络名称
     def rename_profile(self):
@@ -216,92 +333,347 @@ class SimpleNetworkSwitcher(tk.Tk):
             return
             
         # 使用自定义对话框而不是simpledialog
-        dialog = RenameDialog(self, "重命名配置", self.profile_names[name])
+        dialog = RenameDialog(self, "重命名配置", name)
         new_name = dialog.result
         
-        if new_name:
-            # 如果名称没有改变，则忽略操作
-            if new_name == self.profile_names[name]:
-                return
-                
-            # 检查是否与其他配置名称重复
-            for key, value in self.profile_names.items():
-                if key != name and value == new_name:
-                    messagebox.showerror("错误", f"名称 '{new_name}' 已被使用")
-                    return
-                    
-            # 应用新名称
-            self.profile_names[name] = new_name
-            getattr(self, f"btn_{name}").configure(text=new_name)
+        # 如果名称没有改变，则忽略操作
+        if not new_name or new_name == name:
+            return
             
-            # 保存更改到配置文件
-            self.save_to_file()
-            messagebox.showinfo("重命名成功", f"已将配置名称更改为 '{new_name}'")
+        # 配置库检查名称是否重复，绑定关系随配置一起改名
+        try:
+            self.store.rename(name, new_name)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        except OSError as e:
+            messagebox.showerror("保存失败", f"无法保存配置: {e}")
+            return
+        self.config_hash = self.store.revision
+        if self.auto_selected == name:
+            self.auto_selected = new_name
+        self.selected_profile.set(new_name)
+        self.show_profile_list()
+        self.select_profile(new_name)
+        messagebox.showinfo("重命名成功", f"已将配置名称更改为 '{new_name}'")
+
+    def new_profile(self):
+        name = RenameDialog(self, "新建配置", "").result
+        if not name:
+            return
+        if name in self.store:
+            messagebox.showerror("错误", f"名称 '{name}' 已被使用")
+            return
+        # 保存后才加入配置库
+        ConfigWindow(self, name, self.save_config, {})
+
+    def delete_profile(self):
+        name = self.selected_profile.get()
+        if not name:
+            messagebox.showwarning("提示", "请先选择一个网络")
+            return
+        if not messagebox.askyesno("删除配置", f"确定要删除 {name} 配置吗？"):
+            return
+        try:
+            self.store.delete(name)
+        except OSError as e:
+            messagebox.showerror("保存失败", f"无法保存配置: {e}")
+            return
+        self.config_hash = self.store.revision
+        self.show_profile_list()
 
     def open_config_window(self):
         name = self.selected_profile.get()
         if not name:
             messagebox.showwarning("提示", "请先选择一个网络")
             return
-        ConfigWindow(self, self.profile_names[name], self.save_config, self.network_bindings)
+        binding = self.store.binding(name)
+        ConfigWindow(self, name, self.save_config, {name: binding} if binding else {})
 
-    def save_config(self, name, config):
-        self.network_configs[name] = config
-        self.save_to_file()
+    def save_config(self, name, config, binding):
+        try:
+            compile_profile(config)
+        except ProfileError as e:
+            messagebox.showerror("配置无效", f"{name} 配置无效: {e}")
+            return
+        created = name not in self.store
+        try:
+            self.store.put(name, config, binding)
+        except OSError as e:
+            messagebox.showerror("保存失败", f"无法保存配置: {e}")
+            return
+        self.config_hash = self.store.revision
+        if created:
+            self.show_profile_list()
+            self.select_profile(name)
         messagebox.showinfo("保存成功", f"已保存 {name} 配置")
 
+    # 后台服务运行时返回其客户端；模拟后端和跟踪记录只作用于本进程，此时不交给服务执行
+    def daemon_client(self):
+        if not get_backend().live or tracing.is_enabled():
+            return None
+        return DaemonClient.find()
+
+    # 在后台执行任务，并在界面上显示进度
+    def run_task(self, title, func, on_done, supersede=False):
+        """
+        :param supersede: 为True时允许在切换进行中提交，由调度器取代正在执行的切换
+        """
+        if self.worker.busy and not (supersede and self.scheduler.busy):
+            messagebox.showwarning("提示", "正在执行其他操作，请稍候")
+            return None
+        self.status_label.config(text=f"{title}...", foreground='blue')
+        self.progress_bar.config(value=0, maximum=1)
+        self.cancel_btn.config(state='normal')
+        # 操作期间不轮询，结束后立即读取一次并从最短间隔开始
+        self.watcher.pause()
+
+        task = None
+
+        def finish():
+            # 被更新的切换取代时，界面状态由新任务负责
+            if self.worker.busy:
+                return
+            self.cancel_btn.config(state='disabled')
+            self.watcher.resume()
+            if task.cancelled:
+                self.status_label.config(text="已取消", foreground='orange')
+            else:
+                self.show_idle_status()
+
+        def done(result):
+            finish()
+            on_done(task, result)
+
+        def error(e):
+            finish()
+            self.status_label.config(text="执行出错", foreground='red')
+            messagebox.showerror("错误", f"{title}失败: {e}")
+
+        task = self.worker.submit(title, func, self.show_progress, done, error)
+        return task
+
+    def cancel_task(self):
+        self.worker.cancel()
+        self.scheduler.cancel()
+
+    def show_progress(self, text, done=None, total=None):
+        if total:
+            self.progress_bar.config(value=done or 0, maximum=total)
+            text = f"{text} ({done}/{total})"
+        self.status_label.config(text=text, foreground='blue')
+
     def apply_selected_config(self):
         name = self.selected_profile.get()
-        config = self.network_configs.get(name)
-        if not config:
+        if name not in self.store:
             messagebox.showerror("错误", f"未找到 {name} 配置")
             return
+        # 配置在第一次应用时才读取和编译
+        try:
+            compile_profile(self.store[name])
+        except ValueError as e:
+            messagebox.showerror("配置无效", f"{name} 配置无效: {e}")
+            return
 
-        if self.disable_others_var.get():
-            for profile, cfg in self.network_configs.items():
-                if profile != name and cfg.get('interface'):
-                    disable_interface(cfg['interface'])
+        configs = self.store
+        disable_others = self.disable_others_var.get()
+        reconcile = self.reconcile_var.get()
+        make_before_break = self.make_before_break_var.get()
+        verify = self.verify_var.get()
 
-        enable_interface(config['interface'])
+        def run(task):
+            # 后台服务运行时交给服务执行
+            client = self.daemon_client()
+            if client is not None:
+                return client.apply(name, disable_others, reconcile, make_before_break, verify,
+                                    task.progress, task.cancel_event)
+            # 连续点击时以最后一次为准，相同的请求合并为一次
+            future = self.scheduler.submit(name, configs, task.progress, disable_others=disable_others,
+                                           reconcile=reconcile, make_before_break=make_before_break,
+                                           verify=verify)
+            return future.result()
 
-        if config.get('dhcp'):
-            set_dhcp(config['interface'])
-        else:
-            set_static_ip(config['interface'], config['ip'], config['mask'], config['gateway'], config['dns'])
+        self.run_task(f"正在应用 {name}", run, partial(self.on_apply_done, name), supersede=True)
 
+    def on_apply_done(self, name, task, report):
+        # 已有更新的切换请求时由它汇报结果
+        if not task.cancelled and (self.worker.busy or report.superseded):
+            return
+        if task.cancelled:
+            messagebox.showwarning("已取消", f"应用 {name} 配置已取消，部分命令未执行")
+            return
+        failures = format_failures(report.results)
+        if failures:
+            messagebox.showwarning("部分失败", f"应用 {name} 配置时以下命令执行失败:\n{failures}")
+            return
+        if report.connectivity is not None and not report.connectivity.ok:
+            checks = "\n".join(format_check(check) for check in report.connectivity.failures())
+            messagebox.showwarning("网络不通", f"已应用 {name} 配置，但以下连通性检查未通过:\n{checks}")
+            return
+        if not report.changed:
+            messagebox.showinfo("完成", f"{name} 配置已生效，无需更改")
+            return
+        if not report.ready:
+            kept = "，其他网卡保持不变" if report.strategy == "make-before-break" else ""
+            lost = f"，{format_gap(None)}" if report.gap is None else ""
+            messagebox.showwarning("未就绪", f"已应用 {name} 配置，但目标网卡未能在限定时间内连接{lost}{kept}")
+            return
+
+        wait = report.enable_wait + report.ready_wait
+        text = f"{format_gap(report.gap)}，等待就绪 {wait:.1f} 秒，耗时 {report.elapsed:.1f} 秒"
+        if report.time_to_connectivity is not None:
+            text += f"，{report.time_to_connectivity:.1f} 秒后网络可用"
+        self.status_label.config(text=text, foreground='green')
         messagebox.showinfo("完成", f"已应用 {name} 配置")
 
     def set_dhcp_all(self):
-        for iface in get_network_interfaces():
-            enable_interface(iface)
-            set_dhcp(iface)
+        def run(task):
+            client = self.daemon_client()
+            if client is not None:
+                return client.dhcp_all(task.progress, task.cancel_event)
+            return set_dhcp_all(self.executor, task.progress, task.cancel_event)
+
+        self.run_task("正在设置自动获取IP", run, self.on_dhcp_all_done)
+
+    def restore_last_backup(self):
+        backup = self.backups.latest()
+        if backup is None:
+            messagebox.showinfo("提示", "还没有网络状态备份，应用配置前会自动备份")
+            return
+        if not messagebox.askyesno("恢复网络", f"将全部网卡恢复到 {backup.describe()} 的状态，是否继续？"):
+            return
+
+        def run(task):
+            client = self.daemon_client()
+            if client is not None:
+                return client.restore(0, task.progress, task.cancel_event)
+            return restore_backup(backup, self.executor, task.progress, task.cancel_event)
+
+        self.run_task("正在恢复网络", run, self.on_restore_done)
+
+    def on_restore_done(self, task, report):
+        if task.cancelled or report is None:
+            return
+        failures = format_failures(report.results)
+        if failures:
+            messagebox.showwarning("部分失败", f"恢复网络时以下命令执行失败:\n{failures}")
+            return
+        if not report.changed:
+            messagebox.showinfo("完成", "网络状态与备份一致，无需恢复")
+            return
+        self.status_label.config(text=f"已恢复网络，耗时 {report.elapsed:.1f} 秒", foreground='green')
+        messagebox.showinfo("完成", "已恢复到上次切换前的网络状态")
+
+    def on_dhcp_all_done(self, task, results):
+        if task.cancelled:
+            return
+        failures = format_failures(results)
+        if failures:
+            messagebox.showwarning("部分失败", f"以下命令执行失败:\n{failures}")
+            return
         messagebox.showinfo("完成", "所有网卡已设置为自动获取IP")
 
-    def save_to_file(self):
+    def load_configurations(self):
         try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "configs": self.network_configs,
-                    "bindings": self.network_bindings,
-                    "profile_names": self.profile_names
-                }, f, ensure_ascii=False, indent=4)
+            self.store = open_store()
         except Exception as e:
-            messagebox.showerror("保存失败", f"无法保存配置文件: {e}")
-
-    def load_configurations(self):
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.network_configs = data.get("configs", {})
-                    self.network_bindings = data.get("bindings", {})
-                    self.profile_names = data.get("profile_names", self.profile_names)
-            except Exception as e:
-                messagebox.showwarning("读取配置失败", f"加载配置文件出错: {e}")
+            messagebox.showwarning("读取配置失败", f"加载配置出错: {e}")
+            # 旧的配置文件无法导入时从空的配置库开始
+            self.store = ProfileStore(store_path())
+        self.config_hash = self.store.revision
     
     def auto_select_active_profile(self):
-        active_ifaces = get_active_interfaces()
-        for profile, iface in self.network_bindings.items():
-            if iface in active_ifaces:
-                self.select_profile(profile)
+        with tracing.span("load_snapshot", "startup"):
+            self.snapshot = load_snapshot(snapshot_path(CONFIG_FILE), self.config_hash)
+        if self.snapshot is not None:
+            self.startup_times["snapshot"] = time.perf_counter()
+            self.select_detected_profile(self.snapshot.active_profile)
+        self.status_label.config(text="正在识别当前网络...", foreground='blue')
+        self.revalidate_snapshot()
+
+    # 在后台重新读取网络状态，保存快照后只更新有变化的部分
+    def revalidate_snapshot(self):
+        bindings = self.store.bindings()
+        digest = self.config_hash
+        path = snapshot_path(CONFIG_FILE)
+        # 在后台读取、在界面线程中结束，起止时间分别记录
+        start = time.perf_counter_ns()
+
+        def run(task):
+            snapshot = read_startup_snapshot(bindings, digest)
+            save_snapshot(path, snapshot)
+            return snapshot
+
+        def done(snapshot):
+            tracing.record_span("revalidate_snapshot", "startup", start, time.perf_counter_ns(),
+                                {"active_profile": snapshot.active_profile})
+            self.on_snapshot_revalidated(snapshot)
+
+        def error(e):
+            tracing.record_span("revalidate_snapshot", "startup", start, time.perf_counter_ns(),
+                                {"error": repr(e)})
+            self.startup_times.setdefault("selection", time.perf_counter())
+            self.show_idle_status()
+            self.start_watching()
+
+        self.detector.submit("识别当前网络", run, on_done=done, on_error=error)
+
+    def on_snapshot_revalidated(self, snapshot):
+        self.startup_times.setdefault("selection", time.perf_counter())
+        self.start_watching()
+        previous, self.snapshot = self.snapshot, snapshot
+        if previous is None or previous.active_profile != snapshot.active_profile:
+            self.select_detected_profile(snapshot.active_profile)
+        self.show_idle_status()
+
+    # 空闲时在状态栏显示当前网络
+    def show_idle_status(self):
+        if self.worker.busy:
+            return
+        profile = self.snapshot.active_profile if self.snapshot is not None else None
+        if profile:
+            self.status_label.config(text=f"当前网络: {profile}", foreground='green')
+        else:
+            self.status_label.config(text="运行中...", foreground='green')
+
+    def start_watching(self):
+        if not self.watching:
+            self.watching = True
+            self.watcher.start()
+            self.after(250, self.drain_network_events)
+
+    # 在监视线程中调用：生成新的快照并交给Tk线程
+    def on_network_change(self, states, adapters):
+        bindings = self.store.bindings()
+        snapshot = StartupSnapshot(self.config_hash, states, adapters, match_active_profile(bindings, adapters))
+        save_snapshot(snapshot_path(CONFIG_FILE), snapshot)
+        self.network_events.put(snapshot)
+
+    def drain_network_events(self):
+        snapshot = None
+        while True:
+            try:
+                snapshot = self.network_events.get_nowait()
+            except queue.Empty:
                 break
+        if snapshot is not None:
+            self.on_snapshot_revalidated(snapshot)
+        self.after(250, self.drain_network_events)
+
+    def select_detected_profile(self, profile):
+        current = self.selected_profile.get()
+        # 用户已手动选择时不覆盖
+        if current and current != self.auto_selected:
+            return
+        key = self.profile_key(profile) if profile else None
+        if key == (current or None):
+            return
+        self.auto_selected = key
+        if key:
+            self.select_profile(key)
+        else:
+            self.clear_selection()
+
+    # 快照中的配置可能已被删除或改名
+    def profile_key(self, name):
+        return name if name in self.store else None
@@ -0,0 +1,162 @@
+# netsh_batch.py - netsh批量执行模块
+import tracing
+from backends import get_backend
+from netsh_commands import (
+    CommandResult, READ_ONLY_OPS, OP_ENABLE, OP_DISABLE, OP_STATIC_ADDRESS, OP_DNS_RESET,
+    OP_DNS_ADD, OP_DHCP_ADDRESS, OP_DHCP_DNS, OP_ROUTE_DELETE,
+    static_address_command, dns_reset_command, dns_add_command, dhcp_address_command,
+    dhcp_dns_command, enable_command, disable_command, route_delete_command, parse_dns_list
+)
+from utils import inventory, wait_until, is_interface_up
+
+# 启用网卡后等待其可以接受地址设置的最长时间(秒)
+ENABLE_TIMEOUT = 10.0
+
+
+class NetshBatch:
+    """
+    收集一次切换中的全部netsh操作，并交给当前后端一次执行
+    netsh后端把命令经标准输入逐条送入单个netsh进程，每条命令后跟一个分隔标记，
+    据此把输出切分到每条命令，从而得到逐条的执行结果
+    """
+
+    def __init__(self):
+        self.commands = []
+        self.mutating = False
+        # 执行时等待网卡启用就绪的总时长(秒)
+        self.ready_wait = 0.0
+
+    def __len__(self):
+        return len(self.commands)
+
+    def add(self, command, label, op):
+        """
+        :param command: netsh子命令
+        :param label: 显示给用户的说明
+        :param op: 操作元组，见netsh_commands
+        """
+        self.commands.append((label, command, op))
+        self.mutating = self.mutating or op[0] not in READ_ONLY_OPS
+
+    def extend(self, steps):
+        """加入预编译的命令，:param steps: ((说明, netsh命令, 操作元组), ...)"""
+        for label, command, op in steps:
+            self.add(command, label, op)
+
+    def enable(self, interface):
+        self.add(enable_command(interface), f"启用 {interface}", (OP_ENABLE, interface))
+
+    def disable(self, interface):
+        self.add(disable_command(interface), f"禁用 {interface}", (OP_DISABLE, interface))
+
+    def delete_route(self, index, prefix, next_hop):
+        self.add(route_delete_command(index, prefix, next_hop), f"删除路由 {prefix}",
+                 (OP_ROUTE_DELETE, index, prefix, next_hop))
+
+    def set_dhcp_address(self, interface):
+        self.add(dhcp_address_command(interface), f"DHCP {interface}", (OP_DHCP_ADDRESS, interface))
+
+    def set_dhcp_dns(self, interface):
+        self.add(dhcp_dns_command(interface), f"DHCP DNS {interface}", (OP_DHCP_DNS, interface))
+
+    def set_dhcp(self, interface):
+        self.set_dhcp_address(interface)
+        self.set_dhcp_dns(interface)
+
+    def set_static_address(self, interface, ip, mask, gateway):
+        self.add(static_address_command(interface, ip, mask, gateway), f"设置地址 {interface}",
+                 (OP_STATIC_ADDRESS, interface, ip, mask, gateway))
+
+    def set_static_dns(self, interface, dns):
+        label = f"设置DNS {interface}"
+        self.add(dns_reset_command(interface), label, (OP_DNS_RESET, interface))
+        for i, d in enumerate(parse_dns_list(dns)):
+            self.add(dns_add_command(interface, d, i), label, (OP_DNS_ADD, interface, d, i))
+
+    def set_static_ip(self, interface, ip, mask, gateway, dns):
+        self.set_static_address(interface, ip, mask, gateway)
+        self.set_static_dns(interface, dns)
+
+    def run(self, on_result=None, cancel_event=None, states=None):
+        """
+        执行批处理
+        :param on_result: 每条命令完成时的回调，参数为(序号, CommandResult)
+        :param cancel_event: threading.Event，置位后停止执行，未执行的命令记为失败
+        :param states: 切换开始时读取的网卡状态(InterfaceState列表)，为None时使用网卡清单中未过期的状态
+        :return: 与commands一一对应的CommandResult列表
+        """
+        segments = self._segments(states)
+        if len(segments) == 1:
+            results = get_backend().run_commands(self.commands, on_result, cancel_event)
+        else:
+            results = self._run_segments(segments, on_result, cancel_event)
+        if self.mutating:
+            inventory.invalidate()
+        return results
+
+    def _segments(self, states=None):
+        """
+        在启用网卡的命令之后切分批处理，后续命令需等待该网卡就绪后再执行，
+        否则设置地址的命令可能因网卡尚未启用完成而失败；已启用的网卡不切分
+        :return: [(命令列表, 执行后需等待就绪的网卡名称或None)]
+        """
+        if states is None:
+            states = inventory.cached_states()
+        enabled = {state.name for state in states if state.admin_enabled} if states is not None else set()
+        segments = []
+        start = 0
+        for index, (_, _, op) in enumerate(self.commands):
+            if op[0] == OP_ENABLE and op[1] not in enabled and index + 1 < len(self.commands):
+                segments.append((self.commands[start:index + 1], op[1]))
+                start = index + 1
+        segments.append((self.commands[start:], None))
+        return segments
+
+    def _run_segments(self, segments, on_result, cancel_event):
+        backend = get_backend()
+        results = []
+        for commands, interface in segments:
+            offset = len(results)
+
+            def report(index, result, offset=offset):
+                if on_result:
+                    on_result(offset + index, result)
+
+            if cancel_event is not None and cancel_event.is_set():
+                results.extend(CommandResult(command, label, False, "未执行") for label, command, _ in commands)
+                continue
+            results.extend(backend.run_commands(commands, report, cancel_event))
+            if interface is None or (cancel_event is not None and cancel_event.is_set()):
+                continue
+            with tracing.span("wait_enabled", "switch", interface=interface) as s:
+                ready, waited = wait_until(lambda: is_interface_up(interface), ENABLE_TIMEOUT,
+                                           cancel_event=cancel_event)
+                s.set(ready=ready)
+            self.ready_wait += waited
+        return results
+
+
+# 一次读取全部网卡的状态和IP配置，并更新网卡清单缓存
+def read_network_state():
+    """
+    :return: (InterfaceState列表, {网卡名称: AdapterConfig})
+    """
+    states, configs = get_backend().read_state()
+    inventory.update(states, configs)
+    return states, {adapter.name: adapter for adapter in configs}
+
+
+# 在同一批命令中读取全部网卡的状态、IP配置和路由表，并更新网卡清单缓存
+def read_network_state_and_routes():
+    """
+    :return: (InterfaceState列表, {网卡名称: AdapterConfig}, RouteEntry列表)
+    """
+    states, configs, routes = get_backend().read_state_and_routes()
+    inventory.update(states, configs)
+    return states, {adapter.name: adapter for adapter in configs}, routes
+
+
+# 一次读取完整的IPv4路由表
+def read_routes():
+    """:return: RouteEntry列表"""
+    return get_backend().read_routes()
@@ -0,0 +1,112 @@
+# netsh_commands.py - netsh命令生成
+# 每条命令都对应一个操作元组(类型, 网卡, 参数...)，netsh后端执行命令文本，模拟后端解释操作元组
+
+# 操作类型
+OP_ENABLE = "enable"
+OP_DISABLE = "disable"
+OP_STATIC_ADDRESS = "static_address"
+OP_DNS_RESET = "dns_reset"
+OP_DNS_ADD = "dns_add"
+OP_DHCP_ADDRESS = "dhcp_address"
+OP_DHCP_DNS = "dhcp_dns"
+OP_ROUTE_ADD = "route_add"
+OP_ROUTE_DELETE = "route_delete"
+OP_QUERY_INTERFACES = "query_interfaces"
+OP_QUERY_CONFIG = "query_config"
+OP_QUERY_ROUTES = "query_routes"
+
+# 不修改网络配置的操作
+READ_ONLY_OPS = (OP_QUERY_INTERFACES, OP_QUERY_CONFIG, OP_QUERY_ROUTES)
+
+# 操作所属的切换阶段
+OP_PHASES = {
+    OP_ENABLE: "enable",
+    OP_DISABLE: "disable",
+    OP_STATIC_ADDRESS: "address",
+    OP_DHCP_ADDRESS: "address",
+    OP_DNS_RESET: "dns",
+    OP_DNS_ADD: "dns",
+    OP_DHCP_DNS: "dns",
+    OP_ROUTE_ADD: "route",
+    OP_ROUTE_DELETE: "route",
+    OP_QUERY_INTERFACES: "read",
+    OP_QUERY_CONFIG: "read",
+    OP_QUERY_ROUTES: "read",
+}
+
+
+class CommandResult:
+    """单条netsh命令的执行结果"""
+    __slots__ = ("command", "label", "ok", "output")
+
+    def __init__(self, command, label, ok, output):
+        self.command = command
+        self.label = label
+        self.ok = ok
+        self.output = output
+
+    def __repr__(self):
+        return f"CommandResult({self.label!r}, ok={self.ok})"
+
+
+# 拆分逗号分隔的DNS字符串
+def parse_dns_list(dns):
+    return [d.strip() for d in dns.split(",") if d.strip()]
+
+# 生成设置静态地址的netsh子命令
+def static_address_command(interface, ip, mask, gateway):
+    return f"interface ip set address name=\"{interface}\" static {ip} {mask} {gateway}"
+
+# 生成清空静态DNS的netsh子命令
+def dns_reset_command(interface):
+    return f"interface ip set dns name=\"{interface}\" source=static addr=none register=none"
+
+# 生成添加一个DNS服务器的netsh子命令
+def dns_add_command(interface, addr, index):
+    return f"interface ip add dns name=\"{interface}\" addr={addr}{' index=1' if index == 0 else ''}"
+
+# 生成设置静态DNS的netsh子命令
+def static_dns_commands(interface, dns):
+    commands = [dns_reset_command(interface)]
+    for i, d in enumerate(parse_dns_list(dns)):
+        commands.append(dns_add_command(interface, d, i))
+    return commands
+
+# 生成设置静态IP的netsh子命令
+def static_ip_commands(interface, ip, mask, gateway, dns):
+    return [static_address_command(interface, ip, mask, gateway)] + static_dns_commands(interface, dns)
+
+# 生成自动获取IP的netsh子命令
+def dhcp_address_command(interface):
+    return f"interface ip set address name=\"{interface}\" source=dhcp"
+
+# 生成自动获取DNS的netsh子命令
+def dhcp_dns_command(interface):
+    return f"interface ip set dnsservers name=\"{interface}\" source=dhcp"
+
+# 生成自动获取IP和DNS的netsh子命令
+def dhcp_commands(interface):
+    return [dhcp_address_command(interface), dhcp_dns_command(interface)]
+
+# 生成启用网卡的netsh子命令
+def enable_command(interface):
+    return f"interface set interface name=\"{interface}\" admin=enable"
+
+# 生成禁用网卡的netsh子命令
+def disable_command(interface):
+    return f"interface set interface name=\"{interface}\" admin=disable"
+
+# 生成添加静态路由的netsh子命令
+def route_add_command(interface, prefix, next_hop, metric):
+    return f"interface ipv4 add route prefix={prefix} interface=\"{interface}\" nexthop={next_hop} metric={metric}"
+
+# 生成删除静态路由的netsh子命令，路由表中只有网卡索引，按索引删除
+def route_delete_command(index, prefix, next_hop):
+    return f"interface ipv4 delete route prefix={prefix} interface={index} nexthop={next_hop}"
+
+# 读取网卡列表的netsh子命令
+QUERY_INTERFACES_COMMAND = "interface show interface"
+# 读取全部网卡IP配置的netsh子命令
+QUERY_CONFIG_COMMAND = "interface ip show config"
+# 读取IPv4路由表的netsh子命令
+QUERY_ROUTES_COMMAND = "interface ipv4 show route"
@@ -0,0 +1,196 @@
+# netsh_parser.py - netsh输出解析模块
+import re
+
+IPV4_PATTERN = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+# 网卡配置段的标题行，如: 接口 "以太网" 的配置 / 配置接口 "以太网" / Configuration for interface "Ethernet"
+HEADER_PATTERN = re.compile(r'^\S.*?"(.+)"')
+# 子网前缀行，如: 192.168.1.0/24 (掩码 255.255.255.0) / 192.168.1.0/24 (mask 255.255.255.0)
+PREFIX_PATTERN = re.compile(r"/(\d{1,2})\s*\((?:掩码|mask)\s*((?:\d{1,3}\.){3}\d{1,3})", re.IGNORECASE)
+
+# 字段名关键字(中英文)，按顺序匹配
+FIELD_KEYWORDS = (
+    ("dhcp", ("dhcp 已启用", "dhcp enabled")),
+    ("ips", ("ip 地址", "ip address")),
+    ("prefixes", ("子网前缀", "subnet prefix")),
+    ("gateways", ("默认网关", "default gateway")),
+    ("dns", ("dns 服务器", "dns servers")),
+)
+YES_VALUES = ("是", "yes")
+
+
+class AdapterConfig:
+    """单个网卡的IP配置"""
+    __slots__ = ("name", "dhcp", "ips", "masks", "prefixes", "gateways", "dns", "dns_dhcp")
+
+    def __init__(self, name):
+        self.name = name
+        self.dhcp = False
+        self.ips = []
+        self.masks = []
+        self.prefixes = []
+        self.gateways = []
+        self.dns = []
+        self.dns_dhcp = False
+
+    @property
+    def ip(self):
+        return self.ips[0] if self.ips else ''
+
+    @property
+    def mask(self):
+        return self.masks[0] if self.masks else ''
+
+    @property
+    def gateway(self):
+        return self.gateways[0] if self.gateways else ''
+
+    def dns_string(self):
+        return ", ".join(self.dns)
+
+    def __repr__(self):
+        return (f"AdapterConfig({self.name!r}, dhcp={self.dhcp}, ips={self.ips}, "
+                f"masks={self.masks}, gateways={self.gateways}, dns={self.dns})")
+
+
+class InterfaceState:
+    """网卡的管理状态和连接状态"""
+    __slots__ = ("name", "admin_enabled", "connected", "type")
+
+    def __init__(self, name, admin_enabled, connected, type):
+        self.name = name
+        self.admin_enabled = admin_enabled
+        self.connected = connected
+        self.type = type
+
+    def __repr__(self):
+        return f"InterfaceState({self.name!r}, admin_enabled={self.admin_enabled}, connected={self.connected})"
+
+
+class RouteEntry:
+    """
+    路由表中的一条IPv4路由
+    next_hop为下一跳地址，直连路由为网卡名称；index为网卡索引；manual表示手动添加的路由
+    """
+    __slots__ = ("prefix", "next_hop", "index", "metric", "manual")
+
+    def __init__(self, prefix, next_hop, index, metric, manual):
+        self.prefix = prefix
+        self.next_hop = next_hop
+        self.index = index
+        self.metric = metric
+        self.manual = manual
+
+    @property
+    def key(self):
+        return self.prefix, self.next_hop
+
+    def __repr__(self):
+        return f"RouteEntry({self.prefix} via {self.next_hop}, if={self.index}, manual={self.manual})"
+
+
+# 解析show interface输出的网卡表格(支持中英文)
+def parse_interface_table(text):
+    states = []
+    in_table = False
+    for line in text.splitlines():
+        if line.startswith("---"):
+            in_table = True
+            continue
+        parts = line.split(None, 3)
+        if not in_table or len(parts) < 4:
+            continue
+        states.append(InterfaceState(
+            parts[3].strip(),
+            parts[0] in ("已启用", "Enabled"),
+            parts[1] in ("已连接", "Connected"),
+            parts[2]
+        ))
+    return states
+
+
+# 根据字段名判断字段类型
+def _classify(key):
+    key = key.lower()
+    for field, keywords in FIELD_KEYWORDS:
+        for keyword in keywords:
+            if keyword in key:
+                return field
+    return None
+
+
+# 解析netsh interface ip show config的完整输出
+def parse_show_config(text):
+    """
+    一次解析全部网卡的IP配置，支持中英文netsh输出
+    :param text: netsh interface ip show config 的输出
+    :return: AdapterConfig列表，顺序与输出一致
+    """
+    adapters = []
+    current = None
+    continuation = None
+    for line in text.splitlines():
+        if not line.strip():
+            continuation = None
+            continue
+        if not line[0].isspace():
+            match = HEADER_PATTERN.match(line)
+            current = AdapterConfig(match.group(1)) if match else None
+            if current is not None:
+                adapters.append(current)
+            continuation = None
+            continue
+        if current is None:
+            continue
+
+        key, sep, value = line.partition(":")
+        if not sep:
+            # 没有字段名的续行，如多个DNS服务器或网关
+            if continuation is not None:
+                continuation.extend(IPV4_PATTERN.findall(line))
+            continue
+
+        field = _classify(key)
+        continuation = None
+        if field == "dhcp":
+            current.dhcp = value.strip().lower() in YES_VALUES
+        elif field == "ips":
+            current.ips.extend(IPV4_PATTERN.findall(value))
+        elif field == "prefixes":
+            match = PREFIX_PATTERN.search(value)
+            if match:
+                current.prefixes.append(int(match.group(1)))
+                current.masks.append(match.group(2))
+        elif field == "gateways":
+            current.gateways.extend(IPV4_PATTERN.findall(value))
+            continuation = current.gateways
+        elif field == "dns":
+            # 如: 通过 DHCP 配置的 DNS 服务器 / DNS servers configured through DHCP
+            current.dns_dhcp = "dhcp" in key.lower()
+            current.dns.extend(IPV4_PATTERN.findall(value))
+            continuation = current.dns
+    return adapters
+
+
+# 解析netsh interface ipv4 show route输出的路由表(支持中英文)
+def parse_route_table(text):
+    """
+    表格列依次为: 发布、类型、跃点数、前缀、索引、网关/接口名称
+    :return: RouteEntry列表
+    """
+    routes = []
+    in_table = False
+    for line in text.splitlines():
+        if line.startswith("---"):
+            in_table = True
+            continue
+        parts = line.split(None, 5)
+        if not in_table or len(parts) < 6 or not parts[2].isdigit() or "/" not in parts[3]:
+            continue
+        routes.append(RouteEntry(
+            parts[3],
+            parts[5].strip(),
+            parts[4],
+            int(parts[2]),
+            parts[1] in ("Manual", "手动")
+        ))
+    return routes
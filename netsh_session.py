@@ -0,0 +1,226 @@
+# netsh_session.py - 常驻netsh会话
+import queue
+import re
+import subprocess
+import threading
+import time
+
+# 每条命令后插入一个不存在的命令作为分隔标记，netsh会在报错信息中原样回显该标记
+MARK_TEMPLATE = "__netswitcher_mark_{}__"
+MARK_PATTERN = re.compile(r"__netswitcher_mark_(\d+)__")
+PROMPT_PATTERN = re.compile(r"^(?:netsh[^>]*>)+")
+
+# 视为成功的输出内容
+OK_LINES = ("Ok.", "确定。", "确定.")
+BENIGN_PATTERNS = ("DHCP is already enabled", "已在此接口上启用 DHCP", "此接口上已启用 DHCP",
+                   "The object already exists", "对象已存在")
+
+# 会话空闲超过该时长(秒)后，复用前先检查进程是否仍能响应
+IDLE_CHECK = 60.0
+HEALTH_CHECK_TIMEOUT = 2.0
+
+# 在Windows上启动netsh时不弹出控制台窗口
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+# 根据命令输出判断是否执行成功
+def is_success_output(output):
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    if not lines:
+        return True
+    if all(line in OK_LINES for line in lines):
+        return True
+    return any(pattern in output for pattern in BENIGN_PATTERNS)
+
+
+# 启动一个从标准输入读取命令的netsh进程
+def start_netsh():
+    return subprocess.Popen(
+        ["netsh"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        creationflags=CREATE_NO_WINDOW,
+    )
+
+
+class NetshSession:
+    """
+    常驻的交互式netsh进程，命令经标准输入逐条送入，并以分隔标记切分每条命令的输出
+    进程退出或响应超时后会在下一次调用时自动重启，空闲较久的进程在复用前先检查能否响应
+    """
+
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self.restarts = 0
+        self._proc = None
+        self._lines = None
+        self._counter = 0
+        self._used = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self):
+        self._proc = start_netsh()
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self._proc, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        # 进程结束，通知等待中的调用
+        lines.put(None)
+
+    def _kill(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+            except OSError:
+                pass
+            self._proc = None
+
+    def _ensure_started(self):
+        if self.alive and time.monotonic() - self._used > IDLE_CHECK:
+            # 只发送分隔标记，无响应的进程在_roundtrip中被终止，随后重启
+            self._roundtrip("", HEALTH_CHECK_TIMEOUT)
+        if not self.alive:
+            if self._counter:
+                self.restarts += 1
+            self._kill()
+            self._start()
+
+    def _roundtrip(self, command, timeout):
+        """发送命令和分隔标记，读取到标记为止的输出，超时或进程退出时返回None"""
+        self._counter += 1
+        mark = MARK_TEMPLATE.format(self._counter)
+        text = f"{command}\n{mark}\n" if command else f"{mark}\n"
+        try:
+            self._proc.stdin.write(text)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self._kill()
+            return None
+        buffer = []
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                line = None
+            if line is None:
+                self._kill()
+                return None
+            match = MARK_PATTERN.search(line)
+            if match and int(match.group(1)) == self._counter:
+                self._used = time.monotonic()
+                return "\n".join(buffer).strip("\n")
+            if match:
+                # 之前超时命令遗留的标记
+                buffer = []
+                continue
+            buffer.append(PROMPT_PATTERN.sub("", line.rstrip("\r\n")))
+
+    def execute(self, command, timeout=None):
+        """
+        在会话中执行一条netsh子命令
+        :return: (输出, 是否成功)
+        :raises RuntimeError: 会话无响应，进程已被终止，下一次调用时重启
+        """
+        with self._lock:
+            self._ensure_started()
+            output = self._roundtrip(command, timeout or self.timeout)
+            if output is None:
+                raise RuntimeError("netsh会话无响应")
+            return output, is_success_output(output)
+
+    def execute_many(self, commands, on_output=None, cancel_event=None):
+        """
+        在会话中按顺序执行一组netsh子命令，上一条命令完成后才送入下一条
+        :param on_output: 每条命令完成时的回调，参数为(序号, 输出)
+        :param cancel_event: threading.Event，置位后不再送入新命令
+        :return: 已执行命令的输出列表，取消时只包含已执行的部分
+        :raises RuntimeError: 会话无响应，之前完成的命令已通过on_output报告，
+                              进程已被终止，下一次调用时重启
+        """
+        outputs = []
+        with self._lock:
+            self._ensure_started()
+            for index, command in enumerate(commands):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                output = self._roundtrip(command, self.timeout)
+                if output is None:
+                    raise RuntimeError("netsh会话无响应")
+                outputs.append(output)
+                if on_output:
+                    on_output(index, output)
+        return outputs
+
+    def close(self):
+        with self._lock:
+            if self.alive:
+                try:
+                    self._proc.stdin.write("exit\n")
+                    self._proc.stdin.flush()
+                    self._proc.wait(timeout=2)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+
+class NetshSessionPool:
+    """
+    一组常驻netsh会话，并发执行的各网卡批处理分别使用空闲的会话，按需启动，
+    最多size个，全部忙碌时等待其中一个空闲；接口与NetshSession相同
+    """
+
+    def __init__(self, timeout=10.0, size=8):
+        self.timeout = timeout
+        self.size = size
+        self._sessions = []
+        self._idle = []
+        self._cond = threading.Condition()
+
+    @property
+    def restarts(self):
+        return sum(session.restarts for session in self._sessions)
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and len(self._sessions) >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            session = NetshSession(self.timeout)
+            self._sessions.append(session)
+            return session
+
+    def _release(self, session):
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    def execute(self, command, timeout=None):
+        session = self._acquire()
+        try:
+            return session.execute(command, timeout)
+        finally:
+            self._release(session)
+
+    def execute_many(self, commands, on_output=None, cancel_event=None):
+        session = self._acquire()
+        try:
+            return session.execute_many(commands, on_output, cancel_event)
+        finally:
+            self._release(session)
+
+    def close(self):
+        with self._cond:
+            sessions, self._sessions, self._idle = self._sessions, [], []
+        for session in sessions:
+            session.close()
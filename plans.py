@@ -0,0 +1,260 @@
+# plans.py - 配置的预编译执行计划
+# 配置在加载和保存时校验并编译为不可变的执行计划，按配置内容的哈希缓存，
+# 应用时直接执行已生成的命令，无效的配置在执行任何命令之前就被拒绝
+#
+# 一个配置可以只设置一个网卡: {"interface": ..., "dhcp": ..., "ip": ..., ...}
+# 也可以同时设置多个网卡: {"adapters": [{"interface": ..., "dhcp": ...}, ...]}，每个网卡各自为静态或DHCP
+# 每个网卡可以带静态路由表 "routes": ["10.0.0.0/8", "172.16.0.0/12 10.1.1.254 20", ...]，
+# 每条为 "前缀 [下一跳] [跃点数]"，省略下一跳时使用该网卡的默认网关
+import hashlib
+import ipaddress
+import json
+import threading
+from collections import OrderedDict
+
+from endpoints import parse_endpoint
+from netsh_commands import (
+    OP_ENABLE, OP_STATIC_ADDRESS, OP_DNS_RESET, OP_DNS_ADD, OP_DHCP_ADDRESS, OP_DHCP_DNS, OP_ROUTE_ADD,
+    static_address_command, dns_reset_command, dns_add_command, dhcp_address_command,
+    dhcp_dns_command, enable_command, route_add_command, parse_dns_list
+)
+
+# 未指定跃点数的路由使用Windows的默认值
+DEFAULT_ROUTE_METRIC = 256
+
+
+class ProfileError(ValueError):
+    """配置内容无效"""
+
+
+class ProfilePlan:
+    """
+    一个网卡的执行计划，创建后不可修改
+    enable/address/dns 为 ((说明, netsh命令, 操作元组), ...)，可直接加入NetshBatch
+    checks 为切换后需要检查的HTTP/TCP地址
+    routes 为静态路由((前缀, 下一跳, 跃点数), ...)，route_steps 为与之一一对应的添加命令，在网卡就绪后按差异执行
+    """
+    __slots__ = ("digest", "interface", "dhcp", "ip", "mask", "gateway", "dns", "checks", "routes",
+                 "enable", "address", "dns_steps", "route_steps")
+
+    def __init__(self, digest, interface, dhcp, ip='', mask='', gateway='', dns=(), checks=(), routes=()):
+        values = {
+            "digest": digest,
+            "interface": interface,
+            "dhcp": dhcp,
+            "ip": ip,
+            "mask": mask,
+            "gateway": gateway,
+            "dns": tuple(dns),
+            "checks": tuple(checks),
+            "routes": tuple(routes),
+            "route_steps": tuple(
+                (f"添加路由 {prefix}", route_add_command(interface, prefix, next_hop, metric),
+                 (OP_ROUTE_ADD, interface, prefix, next_hop, metric))
+                for prefix, next_hop, metric in routes
+            ),
+            "enable": ((f"启用 {interface}", enable_command(interface), (OP_ENABLE, interface)),),
+        }
+        if dhcp:
+            values["address"] = ((f"DHCP {interface}", dhcp_address_command(interface),
+                                  (OP_DHCP_ADDRESS, interface)),)
+            values["dns_steps"] = ((f"DHCP DNS {interface}", dhcp_dns_command(interface),
+                                    (OP_DHCP_DNS, interface)),)
+        else:
+            values["address"] = ((f"设置地址 {interface}", static_address_command(interface, ip, mask, gateway),
+                                  (OP_STATIC_ADDRESS, interface, ip, mask, gateway)),)
+            label = f"设置DNS {interface}"
+            values["dns_steps"] = ((label, dns_reset_command(interface), (OP_DNS_RESET, interface)),) + tuple(
+                (label, dns_add_command(interface, d, i), (OP_DNS_ADD, interface, d, i))
+                for i, d in enumerate(dns)
+            )
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ProfilePlan不可修改")
+
+    @property
+    def steps(self):
+        """按顺序执行的全部命令：启用网卡、设置地址、设置DNS"""
+        return self.enable + self.address + self.dns_steps
+
+    def __repr__(self):
+        mode = "dhcp" if self.dhcp else f"{self.ip}/{self.mask}"
+        return f"ProfilePlan({self.interface!r}, {mode}, steps={len(self.steps)}, routes={len(self.routes)})"
+
+
+# 配置中各网卡的设置
+def profile_adapters(config):
+    """
+    :return: 网卡设置列表，单网卡配置返回只含配置本身的列表
+    """
+    if isinstance(config, dict) and 'adapters' in config:
+        return config['adapters']
+    return [config]
+
+
+# 配置涉及的全部网卡名称
+def profile_interfaces(config):
+    if not isinstance(config, dict):
+        return []
+    return [adapter.get('interface') for adapter in profile_adapters(config)
+            if isinstance(adapter, dict) and adapter.get('interface')]
+
+
+# 绑定的网卡名称列表，绑定值可以是一个网卡名称或名称列表
+def binding_interfaces(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+# 计算配置内容的哈希
+def profile_digest(config):
+    text = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _ipv4(value, field):
+    try:
+        return ipaddress.IPv4Address(str(value).strip())
+    except ValueError:
+        raise ProfileError(f"{field}格式不正确: {value}")
+
+
+# 校验静态路由表
+def _parse_routes(routes, gateway, network):
+    """
+    :param gateway: 默认下一跳，DHCP网卡为None
+    :param network: 网卡所在子网，下一跳必须在其中；DHCP网卡为None
+    :return: ((前缀, 下一跳, 跃点数), ...)
+    """
+    if not isinstance(routes, list):
+        raise ProfileError("路由表格式不正确")
+    parsed = []
+    seen = set()
+    for route in routes:
+        parts = str(route).split()
+        if not 1 <= len(parts) <= 3:
+            raise ProfileError(f"路由格式不正确: {route}")
+        try:
+            prefix = ipaddress.IPv4Network(parts[0], strict=False)
+        except ValueError:
+            raise ProfileError(f"路由前缀格式不正确: {parts[0]}")
+        if len(parts) > 1:
+            next_hop = _ipv4(parts[1], "路由下一跳")
+        elif gateway is not None:
+            next_hop = gateway
+        else:
+            raise ProfileError(f"DHCP网卡的路由需要指定下一跳: {route}")
+        if network is not None and next_hop not in network:
+            raise ProfileError(f"路由下一跳 {next_hop} 不在子网 {network} 内")
+        metric = parts[2] if len(parts) > 2 else DEFAULT_ROUTE_METRIC
+        if not str(metric).isdigit() or not 1 <= int(metric) <= 9999:
+            raise ProfileError(f"路由跃点数不正确: {route}")
+        key = (str(prefix), str(next_hop))
+        if key in seen:
+            raise ProfileError(f"路由重复: {prefix} {next_hop}")
+        seen.add(key)
+        parsed.append(key + (int(metric),))
+    return parsed
+
+
+# 校验配置内容并生成执行计划
+def _build(config, digest):
+    if not isinstance(config, dict):
+        raise ProfileError("配置格式不正确")
+    interface = str(config.get('interface') or '').strip()
+    if not interface:
+        raise ProfileError("未绑定网卡")
+    # 名称中的引号或换行会破坏netsh命令和批处理的分隔
+    if any(c in interface for c in '"\r\n'):
+        raise ProfileError(f"网卡名称包含无效字符: {interface}")
+    checks = config.get('checks') or []
+    if not isinstance(checks, list):
+        raise ProfileError("检查地址格式不正确")
+    for url in checks:
+        try:
+            parse_endpoint(str(url))
+        except ValueError as e:
+            raise ProfileError(str(e))
+    if config.get('dhcp'):
+        routes = _parse_routes(config.get('routes') or [], None, None)
+        return ProfilePlan(digest, interface, True, checks=checks, routes=routes)
+
+    ip = _ipv4(config.get('ip', ''), "IP地址")
+    mask = _ipv4(config.get('mask', ''), "子网掩码")
+    try:
+        network = ipaddress.IPv4Network(f"{ip}/{mask}", strict=False)
+    except ValueError:
+        raise ProfileError(f"子网掩码不连续: {mask}")
+    # ipaddress也接受0.0.0.255这样的反掩码，netsh只接受子网掩码
+    if network.netmask != mask:
+        raise ProfileError(f"子网掩码不正确: {mask}")
+    if network.prefixlen == 0 or (network.prefixlen < 31 and ip in (network.network_address,
+                                                                    network.broadcast_address)):
+        raise ProfileError(f"IP地址 {ip} 不能用于子网 {network}")
+    gateway = _ipv4(config.get('gateway', ''), "默认网关")
+    if gateway not in network or gateway == ip:
+        raise ProfileError(f"默认网关 {gateway} 不在子网 {network} 内或与IP地址相同")
+    dns = [str(_ipv4(d, "DNS服务器")) for d in parse_dns_list(str(config.get('dns') or ''))]
+    if not dns:
+        raise ProfileError("至少需要一个DNS服务器")
+    routes = _parse_routes(config.get('routes') or [], gateway, network)
+    return ProfilePlan(digest, interface, False, str(ip), str(mask), str(gateway), dns, checks, routes)
+
+
+# 最多缓存的执行计划数，超过时丢弃最久未使用的
+CACHE_SIZE = 1024
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# 校验多网卡配置并生成各网卡的执行计划
+def _build_all(config, digest):
+    adapters = profile_adapters(config)
+    if not isinstance(adapters, list) or not adapters:
+        raise ProfileError("至少需要设置一个网卡")
+    plans = tuple(_build(adapter, profile_digest(adapter)) for adapter in adapters)
+    seen = set()
+    for plan in plans:
+        if plan.interface in seen:
+            raise ProfileError(f"网卡 {plan.interface} 重复设置")
+        seen.add(plan.interface)
+    return plans
+
+
+# 编译单个配置，相同内容的配置只编译一次
+def compile_profile(config):
+    """
+    :return: 各网卡的ProfilePlan元组，按配置中的顺序排列
+    :raises ProfileError: 配置内容无效
+    """
+    digest = profile_digest(config)
+    with _cache_lock:
+        cached = _cache.get(digest)
+        if cached is not None:
+            _cache.move_to_end(digest)
+    if cached is None:
+        cached = _build_all(config, digest)
+        with _cache_lock:
+            _cache[digest] = cached
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return cached
+
+
+# 编译全部配置
+def compile_profiles(configs):
+    """
+    :return: ({配置名称: ProfilePlan元组}, {配置名称: 错误说明})
+    """
+    plans, errors = {}, {}
+    for name, config in configs.items():
+        try:
+            plans[name] = compile_profile(config)
+        except ProfileError as e:
+            errors[name] = str(e)
+    return plans, errors
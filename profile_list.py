@@ -0,0 +1,119 @@
+# profile_list.py - 配置列表控件
+# 只为可见的行创建按钮，滚动或过滤时更新这些按钮的文字和样式，配置数量再多也不会增加控件数量
+from tkinter import ttk
+
+ROW_HEIGHT = 34
+
+
+class ProfileListView(ttk.Frame):
+    """
+    可滚动的配置列表，行数随控件高度变化
+    :param on_select: 点击一行时调用，参数为配置名称
+    """
+
+    def __init__(self, parent, on_select, rows=5):
+        super().__init__(parent)
+        self.on_select = on_select
+        self.items = []
+        self.selected = None
+        self.top = 0
+        self.buttons = []
+
+        self.body = ttk.Frame(self, height=rows * ROW_HEIGHT)
+        self.body.pack(side='left', fill='both', expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.on_scroll)
+        self.scrollbar.pack(side='right', fill='y')
+        self.empty_label = ttk.Label(self.body, text="没有匹配的配置", foreground='gray')
+
+        self.body.bind("<Configure>", self.on_resize)
+        for widget in (self.body, self.empty_label):
+            widget.bind("<MouseWheel>", self.on_wheel)
+        self.resize_rows(rows)
+
+    @property
+    def rows(self):
+        return len(self.buttons)
+
+    # 按可见行数增减按钮
+    def resize_rows(self, count):
+        count = max(1, count)
+        while len(self.buttons) < count:
+            index = len(self.buttons)
+            b = ttk.Button(self.body, style="Profile.TButton", command=lambda i=index: self.on_click(i))
+            b.bind("<MouseWheel>", self.on_wheel)
+            self.buttons.append(b)
+        while len(self.buttons) > count:
+            self.buttons.pop().destroy()
+        self.render()
+
+    def on_resize(self, event):
+        count = max(1, event.height // ROW_HEIGHT)
+        if count != self.rows:
+            self.resize_rows(count)
+
+    def set_items(self, names):
+        """显示新的配置列表，如过滤结果"""
+        self.items = list(names)
+        self.top = 0
+        if self.selected in self.items:
+            self.scroll_to(self.items.index(self.selected))
+        self.render()
+
+    def select(self, name):
+        """标记选中的配置并滚动到该行，name为None时取消选中"""
+        self.selected = name
+        if name in self.items:
+            self.scroll_to(self.items.index(name))
+        self.render()
+
+    def move(self, delta):
+        """在当前列表中选中上一个或下一个配置"""
+        if not self.items:
+            return
+        if self.selected in self.items:
+            index = min(max(self.items.index(self.selected) + delta, 0), len(self.items) - 1)
+        else:
+            index = 0
+        self.on_select(self.items[index])
+
+    def scroll_to(self, index):
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.rows:
+            self.top = index - self.rows + 1
+
+    def render(self):
+        """只更新可见的行"""
+        self.top = max(0, min(self.top, len(self.items) - self.rows))
+        for i, b in enumerate(self.buttons):
+            index = self.top + i
+            if index < len(self.items):
+                name = self.items[index]
+                b.configure(text=name, style="Selected.TButton" if name == self.selected else "Profile.TButton")
+                b.place(x=0, y=i * ROW_HEIGHT, relwidth=1, height=ROW_HEIGHT - 4)
+            else:
+                b.place_forget()
+        if self.items:
+            self.empty_label.place_forget()
+            self.scrollbar.set(self.top / len(self.items), min(1.0, (self.top + self.rows) / len(self.items)))
+        else:
+            self.empty_label.place(x=5, y=5)
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_click(self, row):
+        index = self.top + row
+        if index < len(self.items):
+            self.on_select(self.items[index])
+
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.top = int(float(value) * len(self.items))
+        elif action == "scroll":
+            self.top += int(value) * (self.rows if unit == "pages" else 1)
+        self.render()
+
+    def on_wheel(self, event):
+        # Windows下每格滚轮的delta为120
+        step = max(1, abs(event.delta) // 120)
+        self.top += -step if event.delta > 0 else step
+        self.render()
@@ -0,0 +1,60 @@
+# profile_search.py - 配置名称的查找，不依赖图形界面
+# 按名称前缀查找使用排序后的名称列表二分查找，其次是包含查询内容的名称，
+# 最后是按顺序包含查询中每个字符的名称(模糊匹配)；输入时在上一次结果中继续过滤
+import bisect
+import re
+
+
+class ProfileIndex:
+    """
+    配置名称索引，查找时不区分大小写，结果中前缀匹配在前、包含匹配其次、模糊匹配最后，
+    同一类中保持配置原来的顺序
+    """
+
+    def __init__(self, names=()):
+        self.rebuild(names)
+
+    def rebuild(self, names):
+        """配置增删或改名后重新建立索引"""
+        self.names = list(names)
+        self._order = {name: i for i, name in enumerate(self.names)}
+        self._folded = {name: name.casefold() for name in self.names}
+        self._keys = sorted((key, name) for name, key in self._folded.items())
+        # 上一次查询及其模糊匹配结果，输入更多字符时只在其中继续过滤
+        self._last_query = None
+        self._last_matches = self.names
+
+    def prefix(self, query):
+        """:return: 以query开头的配置名称，按原来的顺序"""
+        query = query.casefold()
+        start = bisect.bisect_left(self._keys, (query,))
+        found = []
+        for key, name in self._keys[start:]:
+            if not key.startswith(query):
+                break
+            found.append(name)
+        found.sort(key=self._order.__getitem__)
+        return found
+
+    def search(self, query):
+        """
+        :param query: 输入的内容，为空时返回全部配置
+        :return: 匹配的配置名称列表
+        """
+        query = query.strip().casefold()
+        if not query:
+            return list(self.names)
+        if self._last_query is not None and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            candidates = self.names
+        pattern = re.compile(".*?".join(re.escape(c) for c in query))
+        folded = self._folded
+        matches = [name for name in candidates if pattern.search(folded[name])]
+        self._last_query, self._last_matches = query, matches
+
+        prefix = self.prefix(query)
+        seen = set(prefix)
+        contains = [name for name in matches if name not in seen and query in folded[name]]
+        seen.update(contains)
+        return prefix + contains + [name for name in matches if name not in seen]
@@ -0,0 +1,533 @@
+# profile_store.py - 可容纳大量配置的配置库
+# 每个配置的内容单独保存为一个JSON文件，另有一个只追加的索引文件记录每个配置的文件名、绑定网卡、
+# 网卡名称、子网和静态路由；打开配置库时只读取索引，配置内容在第一次使用时才读取
+#
+# 静态路由表可能很长，索引中只记录路由条数，需要时再读取有路由的配置
+#
+# 保存一个配置时只写入该配置的文件并在索引末尾追加一行：
+#   1. 配置内容写入以(名称, 内容)的哈希命名的新文件，不覆盖任何已有文件
+#   2. 在索引末尾追加一行并刷新到磁盘，这一行写完即视为保存成功
+#   3. 删除该配置的旧文件
+# 任何一步中途退出都只会留下未被引用的文件或不完整的最后一行，读取索引时忽略它们
+# 索引中失效的行超过一定数量后，整体重写一次索引并清理未被引用的文件
+#
+# 多个进程可能同时保存，每次保存和重写索引都持有配置库目录中的锁文件，
+# 持锁后先读入其他进程追加的内容再写入，重写索引时也不会删除其他进程正在保存的文件
+import hashlib
+import ipaddress
+import json
+import os
+import secrets
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+from plans import ProfileError, compile_profile, profile_adapters, profile_interfaces, binding_interfaces
+
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "index.lock"
+PROFILE_DIR = "profiles"
+STORE_VERSION = 1
+# 索引中的行数超过有效配置数的两倍再加上该值时重写索引
+COMPACT_SLACK = 100
+
+
+class ProfileEntry:
+    """
+    索引中的一个配置
+    file为配置内容所在的文件名，binding为绑定的网卡(名称或名称列表)，
+    interfaces/subnets 为配置中的网卡名称和静态IP所在子网，routes为静态路由的条数
+    """
+    __slots__ = ("name", "file", "binding", "interfaces", "subnets", "routes")
+
+    def __init__(self, name, file, binding=None, interfaces=(), subnets=(), routes=0):
+        self.name = name
+        self.file = file
+        self.binding = binding
+        self.interfaces = list(interfaces)
+        self.subnets = list(subnets)
+        self.routes = routes
+
+    def encode(self):
+        return {"name": self.name, "file": self.file, "binding": self.binding,
+                "interfaces": self.interfaces, "subnets": self.subnets, "routes": self.routes}
+
+    @classmethod
+    def decode(cls, item):
+        # 读取索引时直接使用解析出的列表，不再复制
+        entry = cls.__new__(cls)
+        entry.name = item["name"]
+        entry.file = item["file"]
+        entry.binding = item.get("binding")
+        entry.interfaces = item.get("interfaces", [])
+        entry.subnets = item.get("subnets", [])
+        entry.routes = item.get("routes", 0)
+        return entry
+
+    def __repr__(self):
+        return f"ProfileEntry({self.name!r}, interfaces={list(self.interfaces)})"
+
+
+# 配置内容所在的文件名，名称或内容改变后使用新文件
+def profile_file(name, config):
+    text = json.dumps([name, config], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:20] + ".json"
+
+
+# 生成配置的索引项
+def _make_entry(name, config, binding):
+    subnets = []
+    for adapter in profile_adapters(config):
+        if not isinstance(adapter, dict) or adapter.get('dhcp'):
+            continue
+        try:
+            subnets.append(str(ipaddress.IPv4Network(f"{adapter.get('ip')}/{adapter.get('mask')}", strict=False)))
+        except ValueError:
+            pass
+    try:
+        routes = sum(len(plan.routes) for plan in compile_profile(config))
+    except ProfileError:
+        # 无效的配置也可以保存，应用时才会报错
+        routes = 0
+    return ProfileEntry(name, profile_file(name, config), binding or None,
+                        profile_interfaces(config), dict.fromkeys(subnets), routes)
+
+
+def _encode_line(item):
+    return json.dumps(item, ensure_ascii=False).encode('utf-8') + b"\n"
+
+
+def _new_header():
+    return _encode_line({"version": STORE_VERSION, "id": secrets.token_hex(8)})
+
+
+# 持有跨进程的文件锁，同一时间只有一个进程修改配置库
+@contextmanager
+def _file_lock(path):
+    with open(path, 'a+b') as f:
+        if msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK重试约10秒后仍未取得锁时抛出OSError，继续等待
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# 先写临时文件并刷新到磁盘，再替换目标文件
+def _write_file(path, data):
+    temp = path + ".tmp"
+    with open(temp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def _unindex(index, key, name):
+    names = index.get(key)
+    if names is not None:
+        names.pop(name, None)
+        if not names:
+            del index[key]
+
+
+class ProfileStore(Mapping):
+    """
+    配置库，按名称可以像字典一样读取配置内容(store[name])，遍历时按保存顺序返回配置名称
+    按名称、绑定网卡和子网查找只使用内存中的索引，不读取配置内容
+    可在多个线程中同时使用，读取与refresh()互斥，不会读到重新读取索引过程中的状态；
+    多个进程同时读取时用refresh()读取其他进程追加的内容
+    """
+
+    def __init__(self, path):
+        """:param path: 配置库目录，不存在时在第一次保存时创建"""
+        self.path = path
+        self.index_path = os.path.join(path, INDEX_FILE)
+        self.lock_path = os.path.join(path, LOCK_FILE)
+        self.profile_dir = os.path.join(path, PROFILE_DIR)
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._entries = {}
+        self._contents = {}
+        # 按网卡和子网查找的索引在第一次查找时才建立
+        self._by_interface = None
+        self._by_subnet = None
+        self._header = None
+        # 已读取的索引字节数(以完整的行为准)和行数
+        self._offset = 0
+        self._lines = 0
+
+    # 读取索引
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return
+                data = json.loads(header)
+                if data.get("version") != STORE_VERSION:
+                    raise ValueError(f"不支持的配置库版本: {data.get('version')}")
+                self._header = header
+                self._offset = len(header)
+                self._read_lines(f)
+        except FileNotFoundError:
+            pass
+
+    def _read_lines(self, f):
+        data = f.read()
+        # 没有换行符的最后一行是中途退出时留下的，下次追加前截断
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return
+        self._offset += len(data)
+        lines = data[:-1].split(b"\n")
+        self._lines += len(lines)
+        try:
+            # JSON编码后的行内不含换行符，全部行一次解析
+            items = json.loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            items = []
+            for line in lines:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    pass
+        for item in items:
+            if item.get("deleted"):
+                self._remove_entry(item["name"])
+            else:
+                self._add_entry(ProfileEntry.decode(item))
+
+    def refresh(self):
+        """
+        读取其他进程追加到索引中的内容，索引被重写过时重新读取
+        :return: 是否有变化
+        """
+        with self._lock:
+            try:
+                with open(self.index_path, 'rb') as f:
+                    header = f.readline()
+                    if header != self._header:
+                        self._reset()
+                        self._load()
+                        return True
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() == self._offset:
+                        return False
+                    f.seek(self._offset)
+                    self._read_lines(f)
+                    return True
+            except FileNotFoundError:
+                changed = self._header is not None
+                if changed:
+                    self._reset()
+                return changed
+
+    # 内存中的索引
+
+    def _add_entry(self, entry):
+        if entry.name in self._entries:
+            self._remove_entry(entry.name)
+        self._entries[entry.name] = entry
+        if self._by_interface is not None:
+            self._index_entry(entry)
+
+    def _remove_entry(self, name):
+        entry = self._entries.pop(name, None)
+        self._contents.pop(name, None)
+        if entry is None or self._by_interface is None:
+            return entry
+        for iface in set(entry.interfaces) | set(binding_interfaces(entry.binding)):
+            _unindex(self._by_interface, iface, name)
+        for subnet in entry.subnets:
+            _unindex(self._by_subnet, subnet, name)
+        return entry
+
+    def _index_entry(self, entry):
+        for iface in set(entry.interfaces) | set(binding_interfaces(entry.binding)):
+            self._by_interface.setdefault(iface, {})[entry.name] = None
+        for subnet in entry.subnets:
+            self._by_subnet.setdefault(subnet, {})[entry.name] = None
+
+    def _ensure_index(self):
+        if self._by_interface is None:
+            self._by_interface, self._by_subnet = {}, {}
+            for entry in self._entries.values():
+                self._index_entry(entry)
+
+    # 读取配置
+
+    def __getitem__(self, name):
+        """
+        :return: 配置内容，调用方不应修改
+        :raises KeyError: 没有该配置
+        :raises ValueError: 配置文件已损坏或丢失
+        """
+        with self._lock:
+            content = self._contents.get(name)
+            if content is not None:
+                return content
+            entry = self._entries[name]
+            try:
+                with open(os.path.join(self.profile_dir, entry.file), 'r', encoding='utf-8') as f:
+                    content = json.load(f)["config"]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"无法读取 {name} 配置: {e}")
+            self._contents[name] = content
+            return content
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._entries
+
+    @property
+    def revision(self):
+        """索引的版本，任何保存都会改变它，可用于判断缓存是否过期"""
+        with self._lock:
+            header = hashlib.sha1(self._header or b"").hexdigest()[:12]
+            return f"{header}:{self._offset}"
+
+    def entry(self, name):
+        """:return: ProfileEntry，没有该配置时返回None"""
+        with self._lock:
+            return self._entries.get(name)
+
+    def binding(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry.binding if entry is not None else None
+
+    def bindings(self):
+        """:return: {配置名称: 网卡名称或网卡名称列表}，只包含已绑定网卡的配置"""
+        with self._lock:
+            return {name: entry.binding for name, entry in self._entries.items() if entry.binding}
+
+    def interfaces_of(self, name):
+        """:return: 配置中设置的网卡名称，不读取配置内容"""
+        with self._lock:
+            entry = self._entries.get(name)
+        return list(entry.interfaces) if entry is not None else []
+
+    def route_keys(self):
+        """:return: 全部配置中的静态路由{(前缀, 下一跳)}"""
+        with self._lock:
+            names = [name for name, entry in self._entries.items() if entry.routes]
+        keys = set()
+        for name in names:
+            try:
+                plans = compile_profile(self[name])
+            except (KeyError, ValueError):
+                continue
+            for plan in plans:
+                keys.update((prefix, next_hop) for prefix, next_hop, _ in plan.routes)
+        return keys
+
+    def interfaces(self):
+        """:return: 全部配置设置或绑定的网卡名称"""
+        with self._lock:
+            self._ensure_index()
+            return list(self._by_interface)
+
+    # 查找
+
+    def find_by_interface(self, interface):
+        """:return: 设置或绑定了该网卡的配置名称列表"""
+        with self._lock:
+            self._ensure_index()
+            return list(self._by_interface.get(interface, ()))
+
+    def find_by_subnet(self, value):
+        """
+        :param value: IP地址或子网，如 10.1.2.3、10.1.0.0/16
+        :return: 静态IP所在子网与之重叠(包含或被包含)的配置名称列表
+        :raises ValueError: 地址格式不正确
+        """
+        network = ipaddress.IPv4Network(str(value).strip(), strict=False)
+        found = {}
+        with self._lock:
+            self._ensure_index()
+            # 包含该子网的子网：逐个前缀长度直接查找
+            for prefixlen in range(network.prefixlen, -1, -1):
+                for name in self._by_subnet.get(str(network.supernet(new_prefix=prefixlen)), ()):
+                    found[name] = None
+            # 被该子网包含的更小的子网
+            for subnet, names in (self._by_subnet.items() if network.prefixlen < 32 else ()):
+                candidate = ipaddress.IPv4Network(subnet)
+                if candidate.prefixlen > network.prefixlen and candidate.subnet_of(network):
+                    found.update(names)
+        return list(found)
+
+    # 保存
+
+    @contextmanager
+    def _writing(self):
+        """
+        持有线程锁和跨进程的文件锁，并读入其他进程已保存的内容
+        保存和重写索引都在其中进行
+        """
+        with self._lock:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            with _file_lock(self.lock_path):
+                self.refresh()
+                yield
+
+    def _append(self, items):
+        """把索引行追加到索引末尾并刷新到磁盘，需在_writing()中调用"""
+        # 截断前再读一次索引，已读到的位置之后只可能是中途退出时留下的不完整的行
+        self.refresh()
+        if self._header is None:
+            header = _new_header()
+            _write_file(self.index_path, header)
+            self._header = header
+            self._offset = len(header)
+        data = b"".join(_encode_line(item) for item in items)
+        with open(self.index_path, 'r+b') as f:
+            # 截断中途退出时留下的不完整的行
+            f.truncate(self._offset)
+            f.seek(self._offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._offset += len(data)
+        self._lines += len(items)
+
+    # 文件名包含配置名称，不会被其他配置引用
+    def _remove_file(self, file):
+        if file:
+            try:
+                os.remove(os.path.join(self.profile_dir, file))
+            except OSError:
+                pass
+
+    def put(self, name, config, binding=None):
+        """
+        保存一个配置，只写入该配置的文件和一行索引
+        :param binding: 绑定的网卡名称或名称列表
+        """
+        with self._writing():
+            entry = _make_entry(name, config, binding)
+            old = self._entries.get(name)
+            if old is not None and old.encode() == entry.encode():
+                return
+            path = os.path.join(self.profile_dir, entry.file)
+            if not os.path.exists(path):
+                _write_file(path, _encode_line({"name": name, "config": config}))
+            self._append([entry.encode()])
+            self._add_entry(entry)
+            self._contents[name] = config
+            if old is not None and old.file != entry.file:
+                self._remove_file(old.file)
+            self._maybe_compact()
+
+    def delete(self, name):
+        """删除配置，没有该配置时不做任何事"""
+        with self._writing():
+            if name not in self._entries:
+                return
+            self._append([{"name": name, "deleted": True}])
+            entry = self._remove_entry(name)
+            self._remove_file(entry.file)
+            self._maybe_compact()
+
+    def rename(self, old_name, new_name):
+        """
+        重命名配置，绑定关系随之改变
+        :raises KeyError: 没有该配置
+        :raises ValueError: 新名称已被使用
+        """
+        with self._writing():
+            if new_name in self._entries:
+                raise ValueError(f"名称 '{new_name}' 已被使用")
+            config = self[old_name]
+            entry = _make_entry(new_name, config, self._entries[old_name].binding)
+            _write_file(os.path.join(self.profile_dir, entry.file), _encode_line({"name": new_name, "config": config}))
+            # 新名称和删除旧名称写在同一次追加中
+            self._append([entry.encode(), {"name": old_name, "deleted": True}])
+            old = self._remove_entry(old_name)
+            self._add_entry(entry)
+            self._contents[new_name] = config
+            self._remove_file(old.file)
+            self._maybe_compact()
+
+    def import_profiles(self, configs, bindings=None):
+        """
+        批量保存配置，如从旧的配置文件迁移，全部配置只追加一次索引
+        :param configs: {配置名称: 配置内容}
+        :param bindings: {配置名称: 网卡名称或网卡名称列表}
+        """
+        bindings = bindings or {}
+        with self._writing():
+            entries = [_make_entry(name, config, bindings.get(name)) for name, config in configs.items()]
+            for entry in entries:
+                path = os.path.join(self.profile_dir, entry.file)
+                if not os.path.exists(path):
+                    _write_file(path, _encode_line({"name": entry.name, "config": configs[entry.name]}))
+            self._append([entry.encode() for entry in entries])
+            for entry in entries:
+                old = self._entries.get(entry.name)
+                self._add_entry(entry)
+                if old is not None and old.file != entry.file:
+                    self._remove_file(old.file)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._lines > 2 * len(self._entries) + COMPACT_SLACK:
+            self._compact()
+
+    def compact(self):
+        """重写索引，每个配置只保留一行，并删除未被引用的配置文件"""
+        with self._writing():
+            self._compact()
+
+    def _compact(self):
+        # 持有文件锁，其他进程保存的文件都已写入索引并在refresh()中读入，未被引用的只有中途退出时留下的文件
+        header = _new_header()
+        lines = [_encode_line(entry.encode()) for entry in self._entries.values()]
+        _write_file(self.index_path, header + b"".join(lines))
+        self._header = header
+        self._offset = len(header) + sum(len(line) for line in lines)
+        self._lines = len(lines)
+        used = {entry.file for entry in self._entries.values()}
+        try:
+            names = os.listdir(self.profile_dir)
+        except OSError:
+            names = []
+        for file in names:
+            if file not in used:
+                try:
+                    os.remove(os.path.join(self.profile_dir, file))
+                except OSError:
+                    pass
+
@@ -0,0 +1,55 @@
+# profiles.py - 网络配置文件的读写，不依赖图形界面
+import json
+import os
+
+from backends import SimulatedBackend
+from profile_store import ProfileStore
+
+# 旧版本的配置文件，现在只用于第一次启动时导入配置库，备份和快照文件也放在它旁边
+CONFIG_FILE = "network_config.json"
+STORE_DIR = "network_profiles"
+# 模拟后端使用的典型延迟(秒)
+SIMULATED_LATENCY = {"spawn": 0.15, "read": 0.1, "enable": 0.3, "disable": 0.3,
+                     "address": 0.2, "dns": 0.05, "up": 0.4, "link": 1.0}
+
+
+# 读取旧的配置文件
+def load_config(path=CONFIG_FILE):
+    """
+    :return: 配置文件内容，文件不存在时返回空字典
+    :raises ValueError: 文件内容不是有效的JSON
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# 配置库目录与配置文件放在同一目录
+def store_path(config_file=CONFIG_FILE):
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), STORE_DIR)
+
+
+# 打开配置库，第一次打开时导入旧的配置文件(旧文件保持不变)
+def open_store(config_file=CONFIG_FILE):
+    """
+    :return: ProfileStore
+    :raises ValueError: 配置库或旧的配置文件已损坏
+    """
+    store = ProfileStore(store_path(config_file))
+    if not os.path.exists(store.index_path):
+        data = load_config(config_file)
+        if data.get("configs"):
+            store.import_profiles(data["configs"], data.get("bindings", {}))
+    return store
+
+
+# 配置库中出现的全部网卡名称(去重，保持顺序)
+def config_interfaces(store):
+    return [name for name in store.interfaces() if name]
+
+
+# 根据配置文件中出现的网卡创建模拟后端
+def create_simulated_backend(path=CONFIG_FILE):
+    names = config_interfaces(open_store(path)) or ["以太网", "WLAN"]
+    return SimulatedBackend(names, latency=SIMULATED_LATENCY)
@@ -44,20 +44,21 @@ class RenameDialog(tk.Toplevel):
         
         # 标题部分
         ttk.Label(main_frame, 
-                 text="重命名网络配置",
+                 text=title,
                  font=self.header_font,
                  foreground=self.accent_color).pack(pady=(0, 15))
         
-        # 当前名称显示
-        name_frame = ttk.Frame(main_frame)
-        name_frame.pack(fill='x', pady=5)
-        ttk.Label(name_frame, text="当前名称:").pack(side='left')
-        ttk.Label(name_frame, text=old_name, foreground='blue', font=('Microsoft YaHei UI', 9, 'bold')).pack(side='left', padx=5)
+        # 当前名称显示，新建配置时没有当前名称
+        if old_name:
+            name_frame = ttk.Frame(main_frame)
+            name_frame.pack(fill='x', pady=5)
+            ttk.Label(name_frame, text="当前名称:").pack(side='left')
+            ttk.Label(name_frame, text=old_name, foreground='blue', font=('Microsoft YaHei UI', 9, 'bold')).pack(side='left', padx=5)
         
         # 新名称输入
         input_frame = ttk.Frame(main_frame)
         input_frame.pack(fill='x', pady=10)
-        ttk.Label(input_frame, text="新名称:").pack(side='left')
+        ttk.Label(input_frame, text="新名称:" if old_name else "名称:").pack(side='left')
         
         self.entry = ttk.Entry(input_frame, width=25)
         self.entry.pack(side='left', padx=5, fill='x', expand=True)
@@ -80,7 +81,7 @@ class RenameDialog(tk.Toplevel):
         self.wait_window(self)
     
     def ok(self):
-        self.result = self.entry.get()
+        self.result = self.entry.get().strip()
         self.destroy()
         
     def cancel(self):
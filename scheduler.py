@@ -0,0 +1,109 @@
+# scheduler.py - 切换请求调度
+import json
+import threading
+from concurrent.futures import Future
+
+from switcher import SwitchReport, apply_profile
+
+
+class SwitchRequest:
+    """一次切换请求"""
+    __slots__ = ("name", "configs", "options", "on_progress", "future", "cancel_event", "key")
+
+    def __init__(self, name, configs, options, on_progress):
+        self.name = name
+        self.configs = configs
+        self.options = options
+        self.on_progress = on_progress
+        self.future = Future()
+        self.cancel_event = threading.Event()
+        # 目标配置和选项都相同的请求视为重复请求
+        self.key = json.dumps([name, configs.get(name), options], ensure_ascii=False, sort_keys=True)
+
+
+# 被更新请求取代、未执行的请求的结果
+def _superseded_report():
+    report = SwitchReport(None)
+    report.superseded = True
+    return report
+
+
+class SwitchScheduler:
+    """
+    以最后一次请求为准的切换调度器：同一时间最多执行一个切换，另有一个等待中的请求
+    新请求到达时取消正在执行的切换中尚未开始的命令，并取代等待中的请求；
+    与正在执行或等待中的请求相同的请求直接合并，返回同一个Future
+    :param lock: 执行切换时持有的锁，与其他修改网络配置的操作共用，使它们不与切换同时执行
+    """
+
+    def __init__(self, executor, apply=apply_profile, lock=None):
+        self.executor = executor
+        self.apply = apply
+        self.run_lock = lock if lock is not None else threading.Lock()
+        self._lock = threading.Lock()
+        self._current = None
+        self._pending = None
+        self._running = False
+
+    def submit(self, name, configs, on_progress=None, **options):
+        """
+        提交切换请求
+        :param configs: 全部网络配置，{配置名称: 配置内容}或ProfileStore，执行期间不应修改字典
+        :param options: 传给apply_profile的选项(disable_others/reconcile/make_before_break)
+        :return: concurrent.futures.Future，结果为SwitchReport；被取代时superseded为True
+        """
+        # 配置库按需读取配置内容，不复制全部配置
+        request = SwitchRequest(name, configs, options, on_progress)
+        with self._lock:
+            if self._pending is not None:
+                if self._pending.key == request.key:
+                    return self._pending.future
+                self._pending.future.set_result(_superseded_report())
+                self._pending = None
+            current = self._current
+            if current is not None and not current.cancel_event.is_set():
+                if current.key == request.key:
+                    return current.future
+                current.cancel_event.set()
+            self._pending = request
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._loop, name="switch-scheduler", daemon=True).start()
+        return request.future
+
+    def cancel(self, future=None):
+        """
+        取消正在执行和等待中的请求
+        :param future: 只取消submit()返回该Future的请求，为None时全部取消
+        """
+        with self._lock:
+            pending, current = self._pending, self._current
+            if pending is not None and future in (None, pending.future):
+                pending.future.set_result(_superseded_report())
+                self._pending = None
+            if current is not None and future in (None, current.future):
+                current.cancel_event.set()
+
+    @property
+    def busy(self):
+        return self._running
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                request, self._pending = self._pending, None
+                self._current = request
+                if request is None:
+                    self._running = False
+                    return
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self.run_lock:
+                    report = self.apply(request.name, request.configs, self.executor,
+                                        on_progress=request.on_progress, cancel_event=request.cancel_event,
+                                        **request.options)
+                report.superseded = request.cancel_event.is_set()
+                request.future.set_result(report)
+            except BaseException as e:
+                request.future.set_exception(e)
@@ -0,0 +1,102 @@
+# snapshot.py - 启动快照
+# 把上次读取到的网卡清单、各网卡IP配置和当前配置名称保存在配置文件旁，
+# 下次启动时先用快照绘制界面，再在后台重新读取并只更新有变化的部分
+import json
+import os
+import time
+
+from netsh_parser import AdapterConfig, InterfaceState
+
+SNAPSHOT_FILE = "network_snapshot.json"
+SNAPSHOT_VERSION = 1
+# 超过该时长(秒)的快照视为无效
+MAX_AGE = 7 * 24 * 3600
+
+
+# 快照文件与配置文件放在同一目录
+def snapshot_path(config_file):
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), SNAPSHOT_FILE)
+
+
+class StartupSnapshot:
+    """一次完整读取得到的网卡状态、IP配置和当前配置名称"""
+    __slots__ = ("config_hash", "saved_at", "states", "configs", "active_profile")
+
+    def __init__(self, config_hash, states, configs, active_profile=None, saved_at=None):
+        self.config_hash = config_hash
+        self.saved_at = time.time() if saved_at is None else saved_at
+        self.states = list(states)
+        self.configs = dict(configs)
+        self.active_profile = active_profile
+
+    def names(self):
+        return [state.name for state in self.states]
+
+    @property
+    def age(self):
+        return time.time() - self.saved_at
+
+
+# 网卡状态和IP配置与JSON之间的转换
+def encode_network_state(states, configs):
+    """:param configs: {网卡名称: AdapterConfig}"""
+    return {
+        "states": [[getattr(state, slot) for slot in InterfaceState.__slots__] for state in states],
+        "configs": [{slot: getattr(adapter, slot) for slot in AdapterConfig.__slots__}
+                    for adapter in configs.values()],
+    }
+
+
+def _decode_adapter(item):
+    adapter = AdapterConfig(item["name"])
+    for slot in AdapterConfig.__slots__:
+        if slot in item:
+            setattr(adapter, slot, item[slot])
+    return adapter
+
+
+def decode_network_state(data):
+    """:return: (InterfaceState列表, {网卡名称: AdapterConfig})"""
+    states = [InterfaceState(*item) for item in data["states"]]
+    configs = {item["name"]: _decode_adapter(item) for item in data["configs"]}
+    return states, configs
+
+
+def _encode(snapshot):
+    data = encode_network_state(snapshot.states, snapshot.configs)
+    data["active_profile"] = snapshot.active_profile
+    return data
+
+
+# 读取快照
+def load_snapshot(path, expected_hash, max_age=MAX_AGE):
+    """
+    :param expected_hash: 当前配置的哈希
+    :return: StartupSnapshot，文件不存在、已损坏、配置已改变或已过期时返回None
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_VERSION or data.get("config_hash") != expected_hash:
+            return None
+        states, configs = decode_network_state(data)
+        snapshot = StartupSnapshot(expected_hash, states, configs, data.get("active_profile"), data["saved_at"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not 0 <= snapshot.age < max_age:
+        return None
+    return snapshot
+
+
+# 保存快照，先写临时文件再替换，避免中途退出留下不完整的文件
+def save_snapshot(path, snapshot):
+    data = {"version": SNAPSHOT_VERSION, "config_hash": snapshot.config_hash, "saved_at": snapshot.saved_at}
+    data.update(_encode(snapshot))
+    temp = path + ".tmp"
+    try:
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp, path)
+        return True
+    except OSError:
+        return False
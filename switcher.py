@@ -0,0 +1,596 @@
+# switcher.py - 网络切换流程
+import threading
+import time
+from functools import partial
+
+import tracing
+from netsh_batch import NetshBatch, read_network_state, read_network_state_and_routes, read_routes
+from plans import ProfileError, compile_profile, profile_interfaces, binding_interfaces
+from snapshot import StartupSnapshot
+from backends import get_backend
+from netsh_commands import OP_DISABLE, OP_STATIC_ADDRESS, OP_DHCP_ADDRESS
+from utils import inventory, wait_until
+from verify import verify_connectivity
+
+# 使网卡断开连接的操作：禁用网卡或更改地址，只更改DNS不会断网
+DISRUPTIVE_OPS = (OP_DISABLE, OP_STATIC_ADDRESS, OP_DHCP_ADDRESS)
+
+
+# 获取指定网卡的批处理，不存在时创建
+def _batch_for(batches, interface):
+    batch = batches.get(interface)
+    if batch is None:
+        batch = batches[interface] = NetshBatch()
+    return batch
+
+
+# 配置设置的网卡，配置库直接从索引中读取，不读取配置内容
+def _interfaces_of(configs, profile):
+    lookup = getattr(configs, "interfaces_of", None)
+    if lookup is not None:
+        return lookup(profile)
+    return profile_interfaces(configs[profile])
+
+
+# 生成切换到指定配置所需的全部netsh操作
+def build_switch_batches(name, configs, disable_others=True, bounce=True):
+    """
+    把一次切换(禁用其他网卡、启用目标网卡、设置地址和DNS)按网卡分组为批处理
+    :param name: 目标配置名称
+    :param configs: 全部网络配置，{配置名称: 配置内容}或ProfileStore
+    :param disable_others: 是否禁用其他配置绑定的网卡
+    :param bounce: 其他配置与目标共用网卡时，是否先禁用再启用该网卡
+    :return: {网卡名称: NetshBatch}，同一网卡的操作保持先后顺序
+    :raises ProfileError: 目标配置无效
+    """
+    plans = compile_profile(configs[name])
+    targets = {plan.interface for plan in plans}
+    batches = {}
+    if disable_others:
+        for profile in configs:
+            if profile == name:
+                continue
+            for iface in _interfaces_of(configs, profile):
+                if not bounce and iface in targets:
+                    continue
+                if iface not in batches:
+                    _batch_for(batches, iface).disable(iface)
+
+    for plan in plans:
+        _batch_for(batches, plan.interface).extend(plan.steps)
+    return batches
+
+
+# 判断网卡当前的地址是否与目标一致
+def _address_matches(adapter, plan):
+    if plan.dhcp:
+        return adapter.dhcp
+    return (
+        not adapter.dhcp
+        and adapter.ip == plan.ip
+        and adapter.mask == plan.mask
+        and adapter.gateway == plan.gateway
+    )
+
+
+# 判断网卡当前的DNS是否与目标一致(静态DNS包括顺序)
+def _dns_matches(adapter, plan):
+    if plan.dhcp:
+        return adapter.dns_dhcp
+    return not adapter.dns_dhcp and tuple(adapter.dns) == plan.dns
+
+
+# 对比当前状态与目标配置，只生成收敛所需的最少操作
+def build_reconcile_batches(name, configs, disable_others, states, adapters):
+    """
+    :param name: 目标配置名称
+    :param configs: 全部网络配置，{配置名称: 配置内容}或ProfileStore
+    :param disable_others: 是否禁用其他配置绑定的网卡
+    :param states: 当前网卡状态(InterfaceState列表)
+    :param adapters: 当前IP配置({网卡名称: AdapterConfig})
+    :return: {网卡名称: NetshBatch}，已是目标状态时为空
+    :raises ProfileError: 目标配置无效
+    """
+    plans = compile_profile(configs[name])
+    targets = {plan.interface for plan in plans}
+    enabled = {state.name: state.admin_enabled for state in states}
+    batches = {}
+    if disable_others:
+        for profile in configs:
+            if profile == name:
+                continue
+            for iface in _interfaces_of(configs, profile):
+                if iface not in targets and iface not in batches and enabled.get(iface, False):
+                    _batch_for(batches, iface).disable(iface)
+
+    for plan in plans:
+        target = plan.interface
+        adapter = adapters.get(target)
+        if not enabled.get(target, False):
+            _batch_for(batches, target).extend(plan.enable)
+            # 已禁用的网卡读不到IP配置，需要完整设置
+            adapter = None
+
+        if adapter is None or not _address_matches(adapter, plan):
+            _batch_for(batches, target).extend(plan.address)
+        if adapter is None or not _dns_matches(adapter, plan):
+            _batch_for(batches, target).extend(plan.dns_steps)
+    return batches
+
+
+# 全部配置中出现的静态路由
+def managed_routes(configs):
+    """
+    切换时只删除这些路由中不属于目标配置的部分，不触碰手动或其他程序添加的路由
+    :return: {(前缀, 下一跳)}
+    """
+    lookup = getattr(configs, "route_keys", None)
+    if lookup is not None:
+        return lookup()
+    keys = set()
+    for cfg in configs.values():
+        try:
+            plans = compile_profile(cfg)
+        except ProfileError:
+            continue
+        for plan in plans:
+            keys.update((prefix, next_hop) for prefix, next_hop, _ in plan.routes)
+    return keys
+
+
+# 对比当前路由表与目标配置的路由，生成添加缺少的路由、删除过时路由的操作
+def build_route_batches(plans, table, managed):
+    """
+    :param plans: 目标配置各网卡的ProfilePlan
+    :param table: 当前路由表(RouteEntry列表)
+    :param managed: managed_routes()的结果
+    :return: {网卡名称: NetshBatch}，每个网卡的路由由一个netsh进程执行，已一致时为空
+    """
+    present = {entry.key: entry for entry in table if entry.manual}
+    wanted = {(prefix, next_hop) for plan in plans for prefix, next_hop, _ in plan.routes}
+    batches = {}
+    for key, entry in present.items():
+        if key in managed and key not in wanted:
+            # 按网卡索引删除，与所在网卡无关，放在第一个目标网卡的批处理中先于添加执行
+            _batch_for(batches, plans[0].interface).delete_route(entry.index, *key)
+    for plan in plans:
+        missing = [step for (prefix, next_hop, _), step in zip(plan.routes, plan.route_steps)
+                   if (prefix, next_hop) not in present]
+        if missing:
+            _batch_for(batches, plan.interface).extend(missing)
+    return batches
+
+
+# 判断两份IP配置的地址是否相同
+def _same_address(saved, current):
+    if saved.dhcp or current.dhcp:
+        return saved.dhcp == current.dhcp
+    return saved.ips == current.ips and saved.masks == current.masks and saved.gateways == current.gateways
+
+
+# 判断两份IP配置的DNS是否相同
+def _same_dns(saved, current):
+    if saved.dns_dhcp or current.dns_dhcp:
+        return saved.dns_dhcp == current.dns_dhcp
+    return saved.dns == current.dns
+
+
+# 生成恢复到备份时状态的操作
+def build_restore_batches(backup, states, adapters):
+    """
+    只处理与当前状态不同的网卡：先启用，再恢复地址和DNS；备份时已禁用的网卡直接禁用
+    :param backup: NetworkBackup
+    :param states: 当前网卡状态(InterfaceState列表)
+    :param adapters: 当前IP配置({网卡名称: AdapterConfig})
+    :return: {网卡名称: NetshBatch}，已与备份一致时为空
+    """
+    enabled = {state.name: state.admin_enabled for state in states}
+    batches = {}
+    for state in backup.states:
+        name = state.name
+        if name not in enabled:
+            # 网卡已不存在
+            continue
+        if not state.admin_enabled:
+            if enabled[name]:
+                _batch_for(batches, name).disable(name)
+            continue
+        current = adapters.get(name) if enabled[name] else None
+        if not enabled[name]:
+            _batch_for(batches, name).enable(name)
+        saved = backup.configs.get(name)
+        if saved is None:
+            # 备份时网卡尚未启用完成，读不到IP配置，只恢复启用状态
+            continue
+        if (saved.dhcp or saved.ip) and (current is None or not _same_address(saved, current)):
+            if saved.dhcp:
+                _batch_for(batches, name).set_dhcp_address(name)
+            else:
+                _batch_for(batches, name).set_static_address(name, saved.ip, saved.mask, saved.gateway)
+        if current is None or not _same_dns(saved, current):
+            if saved.dns_dhcp:
+                _batch_for(batches, name).set_dhcp_dns(name)
+            else:
+                _batch_for(batches, name).set_static_dns(name, saved.dns_string())
+    return batches
+
+
+# 生成所有网卡启用并自动获取IP的操作
+def build_dhcp_all_batches(interfaces):
+    batches = {}
+    for iface in interfaces:
+        batch = _batch_for(batches, iface)
+        batch.enable(iface)
+        batch.set_dhcp(iface)
+    return batches
+
+
+# 按网卡并发执行批处理
+def run_batches(batches, executor, on_result=None, cancel_event=None, states=None, on_command=None):
+    """
+    每个网卡的批处理由一个netsh进程执行，不同网卡之间并发
+    :param batches: {网卡名称: NetshBatch}
+    :param executor: InterfaceExecutor实例
+    :param on_result: 每条命令完成时的回调，参数为(已完成数, 总数, CommandResult)，可能在工作线程中调用
+    :param cancel_event: threading.Event，置位后终止所有批处理
+    :param states: 开始时读取的网卡状态，已启用的网卡执行启用命令后无需等待就绪
+    :param on_command: 每条命令完成时的回调，参数为(网卡名称, 操作元组, CommandResult)，可能在工作线程中调用
+    :return: 全部CommandResult，按网卡顺序排列
+    """
+    total = sum(len(batch) for batch in batches.values())
+    finished = [0]
+    lock = threading.Lock()
+
+    def report(iface, index, result):
+        with lock:
+            finished[0] += 1
+            done = finished[0]
+        if on_command:
+            on_command(iface, batches[iface].commands[index][2], result)
+        if on_result:
+            on_result(done, total, result)
+
+    futures = [
+        executor.submit(iface, batch.run, partial(report, iface), cancel_event, states)
+        for iface, batch in batches.items()
+    ]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+
+class SwitchReport:
+    """
+    一次切换的执行结果和耗时
+    enable_wait为启用网卡后等待其可以设置地址的时长，ready_wait为配置完成后等待连接的时长，
+    superseded表示被更新的切换请求取代，
+    connectivity为切换后的连通性检查结果(ConnectivityReport)，time_to_connectivity为从开始切换到检查通过的时长
+    """
+    __slots__ = ("strategy", "results", "ready", "enable_wait", "ready_wait", "gap", "elapsed", "superseded",
+                 "connectivity", "time_to_connectivity")
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.results = []
+        self.ready = None
+        self.enable_wait = 0.0
+        self.ready_wait = 0.0
+        self.gap = 0.0
+        self.elapsed = 0.0
+        self.superseded = False
+        self.connectivity = None
+        self.time_to_connectivity = None
+
+    @property
+    def changed(self):
+        return bool(self.results)
+
+
+# 判断目标网卡是否都已连接并获得预期地址
+def is_ready(states, adapters, plans):
+    """:param plans: 各目标网卡的ProfilePlan"""
+    connected = {state.name for state in states if state.connected}
+    for plan in plans:
+        adapter = adapters.get(plan.interface)
+        if plan.interface not in connected or adapter is None:
+            return False
+        if plan.dhcp:
+            if not any(not ip.startswith("169.254.") for ip in adapter.ips):
+                return False
+        elif plan.ip not in adapter.ips:
+            return False
+    return True
+
+
+# 轮询直到全部目标网卡就绪或超时，轮询间隔从initial开始按指数增长，最长max_interval
+def wait_for_ready(plans, timeout=15.0, initial=0.1, max_interval=1.0, cancel_event=None):
+    """
+    每次轮询读取一次全部网卡的状态，等待时长取决于最慢的网卡
+    :return: (是否在超时前就绪, 已等待的秒数)
+    """
+    def check():
+        states, adapters = read_network_state()
+        return is_ready(states, adapters, plans)
+
+    return wait_until(check, timeout, initial, max_interval, cancel_event=cancel_event)
+
+
+# 检查目标网卡切换后的连通性
+def verify_targets(plans):
+    """
+    静态配置检查配置中的网关和DNS，DHCP配置检查网卡实际获得的网关和DNS，全部网卡的检查并发执行
+    :return: ConnectivityReport
+    """
+    gateways, dns, endpoints = [], [], []
+    adapters = inventory.adapter_configs(refresh=True) if any(plan.dhcp for plan in plans) else {}
+    for plan in plans:
+        if plan.dhcp:
+            adapter = adapters.get(plan.interface)
+            if adapter is not None:
+                gateways.append(adapter.gateway)
+                dns.extend(adapter.dns)
+        else:
+            gateways.append(plan.gateway)
+            dns.extend(plan.dns)
+        endpoints.extend(plan.checks)
+    return verify_connectivity(gateways, dns, endpoints)
+
+
+# 应用指定配置
+def apply_profile(name, configs, executor, disable_others=True, reconcile=False,
+                  make_before_break=True, on_progress=None, cancel_event=None, verify=False, backups=None):
+    """
+    :param reconcile: 为True时只执行与当前状态不一致的部分
+    :param make_before_break: 为True时先配置目标网卡并等待其就绪，再禁用其他网卡；
+                              目标网卡未能就绪时保留其他网卡，避免断网
+                              配置包含多个网卡时，各网卡的命令和就绪等待并发进行
+                              配置了静态路由时，目标网卡就绪后读取一次路由表，只添加缺少的路由、删除过时的路由
+    :param on_progress: 进度回调，参数为(说明, 已完成数, 总数)
+    :param verify: 为True时在目标网卡就绪后检查网关、DNS和配置中的检查地址
+    :param backups: BackupHistory，需要执行命令时先用切换开始时读取的状态记录一份备份
+    :return: SwitchReport，gap为切换期间没有任何可用网络的时长，断网后目标网卡未能就绪时为None
+    :raises ProfileError: 目标配置无效，此时不执行任何命令
+    """
+    with tracing.span("apply_profile", "switch", profile=name) as s:
+        report = _apply_profile(name, configs, executor, disable_others, reconcile,
+                                make_before_break, on_progress, cancel_event, verify, backups)
+        s.set(strategy=report.strategy, commands=len(report.results), ready=report.ready,
+              gap_ms=round(report.gap * 1000, 1) if report.gap is not None else None)
+        return report
+
+
+def _apply_profile(name, configs, executor, disable_others, reconcile,
+                   make_before_break, on_progress, cancel_event, verify, backups):
+    # 无效配置在执行任何命令之前拒绝
+    plans = compile_profile(configs[name])
+    report = SwitchReport("make-before-break" if make_before_break else "break-before-make")
+    start = time.perf_counter()
+    targets = [plan.interface for plan in plans]
+    target = "、".join(targets)
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    managed = managed_routes(configs)
+    # 按差异切换时可能无需任何操作，此时直接使用与状态一起读取的路由表
+    start_table = None
+    if on_progress:
+        on_progress("读取当前状态", None, None)
+    with tracing.span("read_state", "switch"):
+        if reconcile and managed:
+            states, adapters, start_table = read_network_state_and_routes()
+        else:
+            states, adapters = read_network_state()
+    connected = {state.name for state in states if state.connected}
+    if reconcile:
+        batches = build_reconcile_batches(name, configs, disable_others, states, adapters)
+    else:
+        batches = build_switch_batches(name, configs, disable_others, bounce=not make_before_break)
+
+    total = [sum(len(batch) for batch in batches.values())]
+    finished = [0]
+
+    def on_result(done, phase_total, result):
+        finished[0] += 1
+        if on_progress:
+            on_progress(result.label, finished[0], total[0])
+
+    def install_routes(table=None):
+        if not managed or cancelled():
+            return
+        if table is None:
+            if on_progress:
+                on_progress("读取路由表", finished[0], total[0])
+            with tracing.span("read_routes", "switch"):
+                table = read_routes()
+        route_batches = build_route_batches(plans, table, managed)
+        total[0] += sum(len(batch) for batch in route_batches.values())
+        with tracing.span("install_routes", "switch", commands=total[0] - finished[0]):
+            report.results += run_batches(route_batches, executor, on_result, cancel_event)
+
+    if batches and backups is not None and not cancelled():
+        with tracing.span("backup", "switch"):
+            backups.record(name, states, adapters)
+    if not batches or cancelled():
+        report.ready = is_ready(states, adapters, plans)
+        if report.ready:
+            install_routes(start_table)
+        _verify(report, plans, verify and not cancelled(), on_progress, start)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    target_batches = {iface: batches.pop(iface) for iface in targets if iface in batches}
+
+    def record_enable_wait():
+        if target_batches:
+            # 各网卡并发等待启用，取最长的一个
+            report.enable_wait = max(batch.ready_wait for batch in target_batches.values())
+
+    # 目标网卡就绪之前执行的批处理会断开哪些已连接的网卡，全部断开时才开始计算断网时长，
+    # 起点为最后一个已连接的网卡被禁用或更改地址的时刻
+    before_ready = target_batches if make_before_break else {**batches, **target_batches}
+    going_down = {iface for iface, batch in before_ready.items()
+                  if iface in connected and any(op[0] in DISRUPTIVE_OPS for _, _, op in batch.commands)}
+    still_up = set(going_down) if connected and going_down == connected else None
+    gap_start = None
+    gap_lock = threading.Lock()
+
+    def on_command(iface, op, result):
+        nonlocal gap_start
+        if still_up is None or op[0] not in DISRUPTIVE_OPS:
+            return
+        with gap_lock:
+            if iface in still_up:
+                still_up.discard(iface)
+                if not still_up:
+                    gap_start = time.perf_counter()
+
+    if make_before_break:
+        # 其他网卡仍保持连接时，重新配置目标网卡不会造成断网
+        if target_batches:
+            # 各目标网卡的批处理并发执行
+            with tracing.span("configure_target", "switch", interface=target):
+                report.results += run_batches(target_batches, executor, on_result, cancel_event, states,
+                                              on_command)
+            record_enable_wait()
+        if cancelled():
+            # 取消时目标网卡的启用等待已经发生，同样计入报告；已断网时无法确定何时恢复
+            if gap_start is not None:
+                report.gap = None
+            report.elapsed = time.perf_counter() - start
+            return report
+        if on_progress:
+            on_progress(f"等待 {target} 就绪", finished[0], total[0])
+        with tracing.span("wait_ready", "switch", interface=target):
+            report.ready, report.ready_wait = wait_for_ready(plans, cancel_event=cancel_event)
+        ready_time = time.perf_counter()
+        if report.ready:
+            install_routes()
+        if report.ready and batches and not cancelled():
+            with tracing.span("disable_others", "switch", interfaces=len(batches)):
+                report.results += run_batches(batches, executor, on_result, cancel_event)
+    else:
+        batches.update(target_batches)
+        with tracing.span("run_batches", "switch", interfaces=len(batches)):
+            report.results += run_batches(batches, executor, on_result, cancel_event, states, on_command)
+        record_enable_wait()
+        if on_progress:
+            on_progress(f"等待 {target} 就绪", finished[0], total[0])
+        with tracing.span("wait_ready", "switch", interface=target):
+            report.ready, report.ready_wait = wait_for_ready(plans, cancel_event=cancel_event)
+        ready_time = time.perf_counter()
+        if report.ready:
+            install_routes()
+
+    if gap_start is not None:
+        report.gap = ready_time - gap_start if report.ready else None
+    _verify(report, plans, verify and not cancelled(), on_progress, start)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _verify(report, plans, enabled, on_progress, start):
+    if not enabled or not report.ready or not get_backend().live:
+        return
+    if on_progress:
+        on_progress("检查网络连通性", None, None)
+    with tracing.span("verify", "switch", interfaces=len(plans)) as s:
+        report.connectivity = verify_targets(plans)
+        s.set(ok=report.connectivity.ok, attempts=report.connectivity.attempts)
+    if report.connectivity.ok:
+        report.time_to_connectivity = time.perf_counter() - start
+
+
+# 一次批量恢复到备份时的网络状态
+def restore_backup(backup, executor, on_progress=None, cancel_event=None):
+    """
+    读取一次当前状态，只恢复与备份不同的网卡，各网卡的命令并发执行
+    :param backup: NetworkBackup
+    :return: SwitchReport，elapsed为恢复的总耗时
+    """
+    with tracing.span("restore_backup", "switch", profile=backup.profile) as s:
+        report = SwitchReport("restore")
+        start = time.perf_counter()
+        if on_progress:
+            on_progress("读取当前状态", None, None)
+        with tracing.span("read_state", "switch"):
+            states, adapters = read_network_state()
+        batches = build_restore_batches(backup, states, adapters)
+        if batches and not (cancel_event is not None and cancel_event.is_set()):
+            def on_result(done, total, result):
+                if on_progress:
+                    on_progress(result.label, done, total)
+
+            with tracing.span("run_batches", "switch", interfaces=len(batches)):
+                report.results = run_batches(batches, executor, on_result, cancel_event, states)
+        report.elapsed = time.perf_counter() - start
+        s.set(commands=len(report.results))
+        return report
+
+
+# 所有网卡启用并自动获取IP
+def set_dhcp_all(executor, on_progress=None, cancel_event=None):
+    """
+    :return: 全部CommandResult
+    """
+    if on_progress:
+        on_progress("读取网卡列表", None, None)
+    with tracing.span("dhcp_all.read_interfaces", "switch"):
+        states = inventory.interface_states()
+        batches = build_dhcp_all_batches([state.name for state in states])
+    if cancel_event is not None and cancel_event.is_set():
+        return []
+
+    def on_result(done, total, result):
+        if on_progress:
+            on_progress(result.label, done, total)
+
+    with tracing.span("dhcp_all.run_batches", "switch", interfaces=len(batches)):
+        return run_batches(batches, executor, on_result, cancel_event, states)
+
+
+# 根据当前活动网卡找出对应的配置
+def detect_active_profile(bindings, refresh=False):
+    """
+    :param bindings: {配置名称: 网卡名称或网卡名称列表}
+    :return: 绑定网卡全部处于活动状态的配置名称，没有时返回None
+    """
+    return match_active_profile(bindings, inventory.adapter_configs(refresh))
+
+
+# 根据已读取的IP配置找出当前配置，不执行任何命令
+def match_active_profile(bindings, adapters):
+    """
+    :param adapters: {网卡名称: AdapterConfig}
+    :return: 绑定网卡全部已获得IP的配置名称，有多个时取绑定网卡最多的第一个，没有时返回None
+    """
+    best, best_count = None, 0
+    for profile, value in bindings.items():
+        ifaces = binding_interfaces(value)
+        if len(ifaces) <= best_count:
+            continue
+        if all(adapters.get(iface) is not None and adapters[iface].ips for iface in ifaces):
+            best, best_count = profile, len(ifaces)
+    return best
+
+
+# 读取一次完整的网络状态，生成启动快照
+def read_startup_snapshot(bindings, config_hash):
+    """
+    :param bindings: {配置名称: 网卡名称或网卡名称列表}
+    :param config_hash: 当前配置的哈希
+    :return: StartupSnapshot
+    """
+    states, adapters = read_network_state()
+    return StartupSnapshot(config_hash, states, adapters, detect_active_profile(bindings))
+
+
+# 断网时长的说明，gap为None表示断网后未恢复
+def format_gap(gap):
+    return "断网未恢复" if gap is None else f"断网 {gap:.1f} 秒"
+
+
+# 汇总执行失败的命令
+def format_failures(results):
+    return "\n".join(f"{r.label}: {r.output}" for r in results if not r.ok)
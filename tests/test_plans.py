@@ -0,0 +1,62 @@
+# test_plans.py - 配置编译的测试
+import unittest
+
+import plans
+from plans import ProfileError, compile_profile
+
+
+def static_config(**values):
+    config = {"interface": "以太网", "dhcp": False, "ip": "192.168.1.10", "mask": "255.255.255.0",
+              "gateway": "192.168.1.1", "dns": "192.168.1.1"}
+    config.update(values)
+    return config
+
+
+class MaskTest(unittest.TestCase):
+    def test_netmask_accepted(self):
+        for mask in ("255.255.255.0", "255.255.0.0", "255.255.255.128"):
+            plan, = compile_profile(static_config(mask=mask))
+            self.assertEqual(plan.mask, mask)
+
+    def test_hostmask_rejected(self):
+        # ipaddress把0.0.0.255解释为/24的反掩码
+        with self.assertRaises(ProfileError):
+            compile_profile(static_config(mask="0.0.0.255"))
+
+    def test_non_contiguous_mask_rejected(self):
+        with self.assertRaises(ProfileError):
+            compile_profile(static_config(mask="255.0.255.0"))
+
+
+class CacheTest(unittest.TestCase):
+    def test_cache_is_bounded(self):
+        size = plans.CACHE_SIZE
+        plans.CACHE_SIZE = 8
+        try:
+            first = compile_profile(static_config(ip="10.0.0.2", mask="255.255.255.0", gateway="10.0.0.1"))
+            for i in range(3, 20):
+                compile_profile(static_config(ip=f"10.0.0.{i}", mask="255.255.255.0", gateway="10.0.0.1"))
+            self.assertLessEqual(len(plans._cache), 8)
+            again = compile_profile(static_config(ip="10.0.0.2", mask="255.255.255.0", gateway="10.0.0.1"))
+            # 被丢弃的计划重新编译，内容相同
+            self.assertIsNot(first, again)
+            self.assertEqual(first[0].address, again[0].address)
+        finally:
+            plans.CACHE_SIZE = size
+
+    def test_recently_used_kept(self):
+        size = plans.CACHE_SIZE
+        plans.CACHE_SIZE = 4
+        try:
+            kept = static_config(ip="10.0.1.2", mask="255.255.255.0", gateway="10.0.1.1")
+            first = compile_profile(kept)
+            for i in range(3, 10):
+                compile_profile(kept)
+                compile_profile(static_config(ip=f"10.0.1.{i}", mask="255.255.255.0", gateway="10.0.1.1"))
+            self.assertIs(compile_profile(kept), first)
+        finally:
+            plans.CACHE_SIZE = size
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# test_profile_store.py - 配置库多进程同时保存的测试
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from profile_store import ProfileStore
+
+
+def dhcp_config(i):
+    return {"interface": f"以太网 {i}", "dhcp": True}
+
+
+# 在子进程中反复保存和改名，索引行数很快超过阈值而触发重写
+def _writer(path, worker, count):
+    store = ProfileStore(path)
+    for i in range(count):
+        store.put(f"w{worker}-{i % 20}", dhcp_config(i))
+        if i % 7 == 0:
+            store.put(f"t{worker}", dhcp_config(i))
+            store.rename(f"t{worker}", f"t{worker}-{i}")
+            store.delete(f"t{worker}-{i}")
+
+
+class ConcurrentWriteTest(unittest.TestCase):
+    def test_processes_do_not_lose_profiles(self):
+        with tempfile.TemporaryDirectory() as path:
+            workers = [multiprocessing.Process(target=_writer, args=(path, worker, 300)) for worker in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+                self.assertEqual(worker.exitcode, 0)
+
+            store = ProfileStore(path)
+            expected = {f"w{worker}-{i}" for worker in range(4) for i in range(20)}
+            self.assertEqual(set(store), expected)
+            for name in store:
+                # 每个配置的文件都存在，没有被其他进程重写索引时删除
+                self.assertEqual(store[name]["interface"].split()[0], "以太网")
+            # 重写过索引，未被引用的文件已被清理
+            self.assertLess(store._lines, 300 * 4)
+            self.assertEqual(len(os.listdir(store.profile_dir)), len(expected))
+
+    def test_rename_compacts(self):
+        with tempfile.TemporaryDirectory() as path:
+            store = ProfileStore(path)
+            store.put("a", dhcp_config(0))
+            for i in range(150):
+                store.rename("a" if i % 2 == 0 else "b", "b" if i % 2 == 0 else "a")
+            self.assertLessEqual(store._lines, 2 + 100)
+            self.assertEqual(list(ProfileStore(path)), ["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# test_switcher.py - 在模拟后端上测试切换的断网时长
+import unittest
+from functools import partial
+from unittest import mock
+
+import switcher
+import utils
+from backends import SimulatedBackend
+from interface_executor import InterfaceExecutor
+from switcher import apply_profile
+
+LATENCY = {"enable": 0.02, "disable": 0.02, "address": 0.02, "dns": 0.01, "up": 0.02, "link": 0.05}
+CONFIGS = {
+    "有线": {"interface": "eth0", "dhcp": False, "ip": "10.0.0.5", "mask": "255.255.255.0",
+             "gateway": "10.0.0.1", "dns": "10.0.0.53"},
+    "无线": {"interface": "wlan", "dhcp": True},
+}
+
+
+class GapTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = SimulatedBackend(latency=LATENCY)
+        self.backend.add_adapter("eth0")
+        self.previous = utils.use_backend(self.backend)
+        utils.inventory.invalidate()
+        self.executor = InterfaceExecutor()
+
+    def tearDown(self):
+        self.executor.shutdown()
+        utils.use_backend(self.previous)
+        utils.inventory.invalidate()
+
+    def apply(self, **options):
+        return apply_profile("有线", CONFIGS, self.executor, **options)
+
+    def test_make_before_break_single_adapter(self):
+        # 唯一连接的网卡就是目标网卡，重新设置地址期间断网
+        report = self.apply(make_before_break=True)
+        self.assertTrue(report.ready)
+        self.assertGreater(report.gap, 0.0)
+        self.assertLess(report.gap, report.elapsed)
+
+    def test_make_before_break_keeps_other_adapter(self):
+        self.backend.add_adapter("wlan")
+        report = self.apply(make_before_break=True)
+        self.assertTrue(report.ready)
+        self.assertEqual(report.gap, 0.0)
+
+    def test_untouched_adapter_keeps_connection(self):
+        # 不禁用其他网卡时无线网卡一直保持连接
+        self.backend.add_adapter("wlan")
+        report = self.apply(make_before_break=False, disable_others=False)
+        self.assertTrue(report.ready)
+        self.assertEqual(report.gap, 0.0)
+
+    def test_break_before_make_counts_from_last_disconnect(self):
+        self.backend.add_adapter("wlan")
+        report = self.apply(make_before_break=False)
+        self.assertTrue(report.ready)
+        self.assertGreater(report.gap, 0.0)
+        self.assertLess(report.gap, report.elapsed)
+
+    def test_not_ready_leaves_gap_unset(self):
+        self.backend.inject_failure("address")
+        with mock.patch.object(switcher, "wait_for_ready", partial(switcher.wait_for_ready, timeout=0.3)):
+            report = self.apply(make_before_break=True)
+        self.assertFalse(report.ready)
+        self.assertIsNone(report.gap)
+        self.assertEqual(switcher.format_gap(report.gap), "断网未恢复")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# test_verify.py - 用本机的TCP/UDP监听端口测试连通性检查
+import socket
+import socketserver
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from verify import verify_connectivity
+
+
+class _DnsResponder(socketserver.BaseRequestHandler):
+    """原样返回查询并置位应答标志"""
+
+    def handle(self):
+        data, sock = self.request
+        sock.sendto(data[:2] + bytes([data[2] | 0x80]) + data[3:], self.client_address)
+
+
+class _HeadHandler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# 取一个当前没有监听的端口，连接时会被拒绝
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class VerifyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tcp = _serve(socketserver.TCPServer(("127.0.0.1", 0), socketserver.BaseRequestHandler))
+        cls.dns = _serve(socketserver.UDPServer(("127.0.0.1", 0), _DnsResponder))
+        cls.http = _serve(HTTPServer(("127.0.0.1", 0), _HeadHandler))
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in (cls.tcp, cls.dns, cls.http):
+            server.shutdown()
+            server.server_close()
+
+    def port(self, server):
+        return server.server_address[1]
+
+    def test_all_checks_pass(self):
+        report = verify_connectivity(
+            gateways=["127.0.0.1"], dns_servers=["127.0.0.1"],
+            endpoints=[f"tcp://127.0.0.1:{self.port(self.tcp)}", f"http://127.0.0.1:{self.port(self.http)}/"],
+            timeout=1.0, deadline=2.0, dns_port=self.port(self.dns), gateway_ports=(self.port(self.tcp),))
+        self.assertTrue(report.ok, report.failures())
+        self.assertEqual([check.kind for check in report.checks], ["gateway", "dns", "endpoint", "endpoint"])
+        self.assertEqual(report.attempts, 1)
+
+    def test_refused_gateway_is_reachable(self):
+        # 连接被拒绝同样说明网关可达
+        report = verify_connectivity(gateways=["127.0.0.1"], timeout=1.0, deadline=1.0,
+                                     gateway_ports=(_closed_port(),))
+        self.assertTrue(report.ok, report.failures())
+
+    def test_failures_reported(self):
+        port = _closed_port()
+        # 没有应答的DNS端口和拒绝连接的TCP地址
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+            silent.bind(("127.0.0.1", 0))
+            report = verify_connectivity(
+                dns_servers=["127.0.0.1"], endpoints=[f"tcp://127.0.0.1:{port}", "ftp://127.0.0.1/"],
+                timeout=0.2, deadline=0.5, dns_port=silent.getsockname()[1])
+        self.assertFalse(report.ok)
+        self.assertEqual(len(report.failures()), 3)
+        self.assertGreater(report.attempts, 1)
+        dns, tcp, unsupported = report.checks
+        self.assertEqual(dns.error, "超时")
+        self.assertIn("不支持", unsupported.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
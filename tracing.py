@@ -0,0 +1,127 @@
+# tracing.py - 轻量级耗时追踪
+# 关闭时span()返回同一个空对象，几乎没有额外开销；开启后记录到固定容量的环形缓冲区，
+# 可导出为Chrome trace-event JSON，在 chrome://tracing 或 Perfetto 中查看
+import json
+import os
+import threading
+import time
+from collections import deque
+
+_enabled = False
+_buffer = deque(maxlen=10000)
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+class _NullSpan:
+    """追踪关闭时使用的空span"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一段计时区间，退出时写入缓冲区"""
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        record_span(self.name, self.category, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+    def set(self, **args):
+        """补充记录信息，如退出码、输出大小"""
+        self.args.update(args)
+
+
+def is_enabled():
+    return _enabled
+
+
+# 开启追踪
+def enable_tracing(capacity=10000):
+    global _enabled, _buffer
+    with _lock:
+        if _buffer.maxlen != capacity:
+            _buffer = deque(_buffer, maxlen=capacity)
+        _enabled = True
+
+
+# 关闭追踪，已记录的span保留
+def disable_tracing():
+    global _enabled
+    _enabled = False
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+
+# 创建一个span，用法: with span("名称", command=...) as s: ...; s.set(exit_code=0)
+def span(name, category="app", **args):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, category, args)
+
+
+# 直接记录一个已知起止时间(perf_counter_ns)的span
+def record_span(name, category, start, end, args=None):
+    if not _enabled:
+        return
+    event = (name, category, start, end, threading.get_ident(), args or {})
+    with _lock:
+        _buffer.append(event)
+
+
+def get_spans():
+    """:return: [(名称, 类别, 开始ns, 结束ns, 线程ID, 参数)]"""
+    with _lock:
+        return list(_buffer)
+
+
+# 导出为Chrome trace-event格式
+def export_chrome_trace(path=None):
+    """
+    :param path: 写入的文件路径，为None时只返回数据
+    :return: trace-event JSON对象
+    """
+    events = [
+        {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": (end - start) / 1000,
+            "pid": _pid,
+            "tid": tid,
+            "args": args,
+        }
+        for name, category, start, end, tid, args in get_spans()
+    ]
+    trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False)
+    return trace
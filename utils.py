@@ -1,63 +1,166 @@
 # utils.py - 实用功能模块
-import subprocess
-import ctypes
-import re
+import threading
+import time
+
+import tracing
+from backends import get_backend, set_backend
 
 # 检查管理员权限
 def is_admin():
+    # 仅在需要时加载ctypes，缩短命令行启动时间
+    import ctypes
     try:
         return ctypes.windll.shell32.IsUserAnAdmin()
     except:
         return False
     
+# 启用或关闭常驻netsh会话(仅netsh后端)
+def use_netsh_session(enabled=True, timeout=10.0):
+    return get_backend().use_session(enabled, timeout)
+
+# 执行一条netsh子命令
+def run_netsh(command, capture=False):
+    return get_backend().run(command, capture)
+
 # 返回当前活动网卡名称
 def get_active_interfaces():
-    result = subprocess.run("netsh interface ip show config", capture_output=True, text=True, shell=True)
-    interfaces = []
-    current_name = None
-    for line in result.stdout.splitlines():
-        if "配置接口" in line or "Configuration for interface" in line:
-            current_name = line.split('"')[1]
-        elif "IP 地址" in line and current_name:
-            interfaces.append(current_name)
-            current_name = None
-    return interfaces
+    with tracing.span("utils.get_active_interfaces", "utils"):
+        return [adapter.name for adapter in get_backend().adapter_configs() if adapter.ips]
+
+# 获取所有网卡的状态
+def get_interface_states():
+    with tracing.span("utils.get_interface_states", "utils"):
+        return get_backend().interface_states()
 
 # 获取所有网卡名称
 def get_network_interfaces():
-    result = subprocess.run("netsh interface show interface", capture_output=True, text=True, shell=True)
-    interfaces = []
-    for line in result.stdout.splitlines():
-        if "已连接" in line or "已断开" in line:
-            parts = line.split()
-            name = " ".join(parts[3:])
-            interfaces.append(name)
-    return interfaces
+    return [state.name for state in get_interface_states()]
+
+class InterfaceInventory:
+    """
+    网卡清单缓存：缓存网卡列表、状态和解析后的IP配置，超过ttl秒后自动重新读取
+    任何修改网络配置的操作都会调用invalidate()使缓存失效
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._states = None
+        self._states_time = 0.0
+        self._configs = None
+        self._configs_time = 0.0
+
+    def _fresh(self, stamp):
+        return time.monotonic() - stamp < self.ttl
+
+    def invalidate(self):
+        with self._lock:
+            self._states = None
+            self._configs = None
+
+    def interface_states(self, refresh=False):
+        with self._lock:
+            if refresh or self._states is None or not self._fresh(self._states_time):
+                self._states = get_interface_states()
+                self._states_time = time.monotonic()
+            return list(self._states)
+
+    def names(self, refresh=False):
+        return [state.name for state in self.interface_states(refresh)]
+
+    def adapter_configs(self, refresh=False):
+        """返回{网卡名称: AdapterConfig}，由一次show config输出解析得到"""
+        with self._lock:
+            if refresh or self._configs is None or not self._fresh(self._configs_time):
+                with tracing.span("inventory.adapter_configs", "utils"):
+                    self._configs = {adapter.name: adapter for adapter in get_backend().adapter_configs()}
+                self._configs_time = time.monotonic()
+            return dict(self._configs)
+
+    def interface_config(self, interface, refresh=False):
+        return self.adapter_configs(refresh).get(interface)
+
+    def update(self, states, configs):
+        """写入一次完整读取得到的网卡状态和IP配置"""
+        with self._lock:
+            now = time.monotonic()
+            self._states = list(states)
+            self._states_time = now
+            self._configs = {adapter.name: adapter for adapter in configs}
+            self._configs_time = now
+
+    def cached_states(self):
+        """返回未过期的网卡状态，没有时返回None，不执行任何命令"""
+        with self._lock:
+            if self._states is None or not self._fresh(self._states_time):
+                return None
+            return list(self._states)
+
+# 全局共享的网卡清单
+inventory = InterfaceInventory()
+
+# 轮询直到条件满足或超时，轮询间隔按指数增长
+def wait_until(check, timeout, initial=0.05, max_interval=1.0, backoff=2.0, cancel_event=None):
+    """
+    :param check: 无参数函数，返回True表示条件已满足
+    :param timeout: 最长等待时间(秒)
+    :param cancel_event: threading.Event，置位后立即停止等待
+    :return: (是否满足, 已等待的秒数)
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = initial
+    while True:
+        if check():
+            return True, time.monotonic() - start
+        now = time.monotonic()
+        if now >= deadline:
+            return False, now - start
+        delay = min(interval, deadline - now)
+        if cancel_event is not None:
+            if cancel_event.wait(delay):
+                return False, time.monotonic() - start
+        else:
+            time.sleep(delay)
+        interval = min(interval * backoff, max_interval)
+
+# 判断网卡是否已启用并出现在IP配置中(可以接受地址设置)
+def is_interface_up(interface):
+    return any(adapter.name == interface for adapter in get_backend().adapter_configs())
+
+# 切换网络操作后端，并清空网卡清单缓存
+def use_backend(backend):
+    previous = set_backend(backend)
+    inventory.invalidate()
+    return previous
 
 # 设置静态IP地址、子网掩码、网关和DNS
 def set_static_ip(interface, ip, mask, gateway, dns):
-    subprocess.run(f"netsh interface ip set address name=\"{interface}\" static {ip} {mask} {gateway}", shell=True)
-    subprocess.run(f"netsh interface ip set dns name=\"{interface}\" source=static addr=none register=none", shell=True)
-    dns_list = [d.strip() for d in dns.split(",") if d.strip()]
-    for i, d in enumerate(dns_list):
-        subprocess.run(f"netsh interface ip add dns name=\"{interface}\" addr={d} {'index=1' if i == 0 else ''}", shell=True)
+    with tracing.span("utils.set_static_ip", "utils", interface=interface):
+        get_backend().set_static_ip(interface, ip, mask, gateway, dns)
+    inventory.invalidate()
 
 # 设置为自动获取IP和DNS
 def set_dhcp(interface):
-    subprocess.run(f"netsh interface ip set address name=\"{interface}\" source=dhcp", shell=True)
-    subprocess.run(f"netsh interface ip set dnsservers name=\"{interface}\" source=dhcp", shell=True)
+    with tracing.span("utils.set_dhcp", "utils", interface=interface):
+        get_backend().set_dhcp(interface)
+    inventory.invalidate()
 
 # 启用网卡
 def enable_interface(interface):
-    subprocess.run(f"netsh interface set interface name=\"{interface}\" admin=enable", shell=True)
+    with tracing.span("utils.enable_interface", "utils", interface=interface):
+        get_backend().enable_interface(interface)
+    inventory.invalidate()
 
 # 禁用网卡
 def disable_interface(interface):
-    subprocess.run(f"netsh interface set interface name=\"{interface}\" admin=disable", shell=True)
+    with tracing.span("utils.disable_interface", "utils", interface=interface):
+        get_backend().disable_interface(interface)
+    inventory.invalidate()
 
 # 获取当前IP配置
 def get_interface_ip(interface):
-    result = subprocess.run(f"netsh interface ip show config name=\"{interface}\"", capture_output=True, text=True, shell=True)
+    result = run_netsh(f"interface ip show config name=\"{interface}\"", capture=True)
     return result.stdout
 
 # 计算居中位置的坐标
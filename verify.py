@@ -0,0 +1,208 @@
+# verify.py - 切换后的连通性检查
+# 切换完成后并发检查网关是否可达、DNS服务器是否应答以及配置中指定的HTTP/TCP地址是否响应，
+# 每项检查都有较短的超时，失败的检查在截止时间内按指数退避重试
+import asyncio
+import random
+import ssl
+import struct
+import time
+
+from endpoints import parse_endpoint
+
+# 探测网关时尝试连接的端口，连接被拒绝同样说明网关可达
+GATEWAY_PORTS = (53, 80, 443)
+# 用于检查DNS服务器的查询名称，只要服务器返回应答(包括域名不存在)即视为可用
+DNS_QUERY_NAME = "www.msftconnecttest.com"
+DNS_PORT = 53
+
+
+class CheckResult:
+    """单项检查的结果"""
+    __slots__ = ("kind", "target", "ok", "latency", "error")
+
+    def __init__(self, kind, target, ok, latency, error=""):
+        self.kind = kind
+        self.target = target
+        self.ok = ok
+        self.latency = latency
+        self.error = error
+
+    def __repr__(self):
+        return f"CheckResult({self.kind}, {self.target!r}, ok={self.ok})"
+
+
+class ConnectivityReport:
+    """
+    一次连通性检查的结果
+    elapsed为从开始检查到全部通过(或截止)的时长
+    """
+    __slots__ = ("checks", "elapsed", "attempts")
+
+    def __init__(self):
+        self.checks = []
+        self.elapsed = 0.0
+        self.attempts = 0
+
+    @property
+    def ok(self):
+        return all(check.ok for check in self.checks)
+
+    def failures(self):
+        return [check for check in self.checks if not check.ok]
+
+
+# 检查结果的说明文字
+def format_check(check):
+    kind = {"gateway": "网关", "dns": "DNS", "endpoint": "地址"}.get(check.kind, check.kind)
+    return f"{kind} {check.target}: {check.error or '通过'}"
+
+
+async def _timed(coro, timeout):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(coro, timeout)
+        return True, time.perf_counter() - start, ""
+    except asyncio.TimeoutError:
+        return False, time.perf_counter() - start, "超时"
+    except (OSError, ValueError, EOFError, ssl.SSLError) as e:
+        return False, time.perf_counter() - start, str(e) or type(e).__name__
+
+
+async def _tcp_connect(host, port, refused_ok=False):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except ConnectionRefusedError:
+        if refused_ok:
+            return
+        raise
+    writer.close()
+
+
+# 检查网关：同时尝试几个常用端口，任一端口连接成功或被拒绝都说明网关可达
+async def check_gateway(gateway, timeout, ports=GATEWAY_PORTS):
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(_tcp_connect(gateway, port, refused_ok=True)) for port in ports]
+    error = "超时"
+    try:
+        for future in asyncio.as_completed(tasks, timeout=timeout):
+            try:
+                await future
+                return CheckResult("gateway", gateway, True, time.perf_counter() - start)
+            except OSError as e:
+                error = str(e) or type(e).__name__
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+    return CheckResult("gateway", gateway, False, time.perf_counter() - start, error)
+
+
+def _dns_query(query_id, name):
+    header = struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(bytes([len(part)]) + part.encode('ascii') for part in name.split(".") if part)
+    return header + labels + b"\x00" + struct.pack(">HH", 1, 1)
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+    def __init__(self, query_id, future):
+        self.query_id = query_id
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        # 只接受ID匹配的应答，不关心应答码
+        if len(data) >= 12 and struct.unpack(">H", data[:2])[0] == self.query_id and data[2] & 0x80:
+            if not self.future.done():
+                self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def _dns_roundtrip(server, port, name):
+    loop = asyncio.get_running_loop()
+    query_id = random.randrange(0x10000)
+    future = loop.create_future()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _DnsProtocol(query_id, future), remote_addr=(server, port))
+    try:
+        transport.sendto(_dns_query(query_id, name))
+        await future
+    finally:
+        transport.close()
+
+
+# 检查DNS服务器：发送一个A记录查询，收到应答即视为可用
+async def check_dns(server, timeout, port=DNS_PORT, name=DNS_QUERY_NAME):
+    ok, latency, error = await _timed(_dns_roundtrip(server, port, name), timeout)
+    return CheckResult("dns", server, ok, latency, error)
+
+
+async def _http_head(scheme, host, port, path):
+    reader, writer = await asyncio.open_connection(host, port, ssl=scheme == "https" or None)
+    try:
+        writer.write(f"HEAD {path} HTTP/1.0\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('ascii'))
+        await writer.drain()
+        line = await reader.readline()
+        if not line.startswith(b"HTTP/"):
+            raise ValueError("不是HTTP响应")
+    finally:
+        writer.close()
+
+
+# 检查配置中指定的地址：TCP只要求能建立连接，HTTP要求返回状态行
+async def check_endpoint(url, timeout):
+    try:
+        scheme, host, port, path = parse_endpoint(url)
+    except ValueError as e:
+        return CheckResult("endpoint", url, False, 0.0, str(e))
+    if scheme == "tcp":
+        coro = _tcp_connect(host, port)
+    else:
+        coro = _http_head(scheme, host, port, path)
+    ok, latency, error = await _timed(coro, timeout)
+    return CheckResult("endpoint", url, ok, latency, error)
+
+
+async def verify_async(gateways=(), dns_servers=(), endpoints=(), timeout=1.0, deadline=5.0,
+                       dns_port=DNS_PORT, gateway_ports=GATEWAY_PORTS):
+    """
+    并发执行全部检查，失败的检查按指数退避重试，直到全部通过或超过deadline秒
+    重复的网关、DNS服务器和地址只检查一次
+    :param timeout: 单项检查的超时(秒)
+    :return: ConnectivityReport
+    """
+    checks = []
+    for gateway in dict.fromkeys(g for g in gateways if g):
+        checks.append(lambda gateway=gateway: check_gateway(gateway, timeout, gateway_ports))
+    for server in dict.fromkeys(dns_servers):
+        checks.append(lambda server=server: check_dns(server, timeout, dns_port))
+    for url in dict.fromkeys(endpoints):
+        checks.append(lambda url=url: check_endpoint(url, timeout))
+
+    report = ConnectivityReport()
+    start = time.perf_counter()
+    results = [None] * len(checks)
+    pending = list(range(len(checks)))
+    delay = 0.1
+    while pending:
+        report.attempts += 1
+        outcomes = await asyncio.gather(*(checks[i]() for i in pending))
+        for i, result in zip(pending, outcomes):
+            results[i] = result
+        pending = [i for i in pending if not results[i].ok]
+        remaining = deadline - (time.perf_counter() - start)
+        if not pending or remaining <= 0:
+            break
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1.0)
+    report.checks = results
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+# 同步入口，可在工作线程中调用
+def verify_connectivity(gateways=(), dns_servers=(), endpoints=(), timeout=1.0, deadline=5.0, **kwargs):
+    """:return: ConnectivityReport"""
+    return asyncio.run(verify_async(gateways, dns_servers, endpoints, timeout, deadline, **kwargs))
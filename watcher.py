@@ -0,0 +1,84 @@
+# watcher.py - 网络变化监视
+import hashlib
+import threading
+
+import tracing
+from backends import get_backend
+from utils import inventory
+
+
+class NetworkWatcher:
+    """
+    在后台线程中定期读取网卡状态，只有原始输出的哈希改变时才解析并发布变化
+    每次检测到变化或调用resume()后从min_interval开始轮询，之后每次未变化时间隔乘以backoff，
+    最长max_interval秒，空闲时几乎不占用CPU
+    :param on_change: 变化回调，参数为(InterfaceState列表, {网卡名称: AdapterConfig})，在监视线程中调用
+    """
+
+    def __init__(self, on_change, min_interval=1.0, max_interval=30.0, backoff=2.0):
+        self.on_change = on_change
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.polls = 0
+        self.changes = 0
+        self._digest = None
+        self._paused = False
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="network-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def pause(self):
+        """暂停轮询，如切换网络期间"""
+        self._paused = True
+
+    def resume(self):
+        """恢复轮询并立即读取一次，之后重新从最短间隔开始退避"""
+        self._paused = False
+        self.interval = self.min_interval
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            if not self._paused:
+                try:
+                    changed = self.poll()
+                except Exception:
+                    # 读取失败时按未变化处理，继续退避
+                    changed = False
+                if changed:
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(self.interval * self.backoff, self.max_interval)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll(self):
+        """
+        读取一次网卡状态
+        :return: 是否发生变化
+        """
+        with tracing.span("watcher.poll", "watcher") as s:
+            self.polls += 1
+            text, parse = get_backend().read_state_raw()
+            digest = hashlib.sha1(text.encode('utf-8')).digest()
+            changed = digest != self._digest
+            s.set(changed=changed)
+            if not changed:
+                return False
+            self._digest = digest
+            states, configs = parse()
+        inventory.update(states, configs)
+        self.changes += 1
+        self.on_change(states, {adapter.name: adapter for adapter in configs})
+        return True
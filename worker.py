@@ -0,0 +1,97 @@
+# worker.py - 后台任务执行模块
+import queue
+import threading
+
+
+class Task:
+    """后台任务句柄，供任务函数汇报进度和检查取消状态"""
+
+    def __init__(self, name, results):
+        self.name = name
+        self.cancel_event = threading.Event()
+        self._results = results
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def progress(self, text, done=None, total=None):
+        """汇报进度，可在后台线程中调用"""
+        self._results.put((self, "progress", (text, done, total)))
+
+
+class BackgroundWorker:
+    """
+    在后台线程执行耗时操作，结果经队列返回，由Tk主循环通过after()定时取出
+    回调(on_progress/on_done/on_error)始终在Tk线程中执行
+    """
+
+    def __init__(self, widget, interval=50):
+        self.widget = widget
+        self.interval = interval
+        self.current = None
+        self._results = queue.Queue()
+        self._callbacks = {}
+        self._polling = False
+
+    @property
+    def busy(self):
+        return self.current is not None
+
+    def submit(self, name, func, on_progress=None, on_done=None, on_error=None):
+        """
+        提交任务
+        :param name: 任务名称
+        :param func: 任务函数，参数为Task实例，返回值传给on_done
+        :return: Task实例
+        """
+        task = Task(name, self._results)
+        self._callbacks[task] = (on_progress, on_done, on_error)
+        self.current = task
+        threading.Thread(target=self._run, args=(task, func), daemon=True).start()
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.interval, self._poll)
+        return task
+
+    def cancel(self):
+        if self.current is not None:
+            self.current.cancel()
+
+    def _run(self, task, func):
+        try:
+            self._results.put((task, "done", func(task)))
+        except Exception as e:
+            self._results.put((task, "error", e))
+
+    def _poll(self):
+        try:
+            # 每次最多处理有限条消息，保证主循环不被长时间占用
+            for _ in range(100):
+                try:
+                    task, kind, payload = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._dispatch(task, kind, payload)
+        finally:
+            if self._callbacks:
+                self.widget.after(self.interval, self._poll)
+            else:
+                self._polling = False
+
+    def _dispatch(self, task, kind, payload):
+        on_progress, on_done, on_error = self._callbacks.get(task, (None, None, None))
+        if kind == "progress":
+            if on_progress:
+                on_progress(*payload)
+            return
+        self._callbacks.pop(task, None)
+        if task is self.current:
+            self.current = None
+        if kind == "done" and on_done:
+            on_done(payload)
+        elif kind == "error" and on_error:
+            on_error(payload)